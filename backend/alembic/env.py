@@ -16,6 +16,7 @@ if str(BASE_DIR) not in sys.path:
 
 from app.core.config import get_settings  # noqa: E402
 from app.db.base import Base  # noqa: E402
+from app.db.partitions import PARTITION_NAME_RE  # noqa: E402
 
 # Это объект конфигурации Alembic, предоставляемый CLI.
 config = context.config
@@ -28,13 +29,23 @@ if config.config_file_name is not None:
 target_metadata = Base.metadata
 
 
+def include_name(name: str | None, type_: str, parent_names: Any) -> bool:
+    """
+    Партиции prompt_history создаются и удаляются приложением (app.db.partitions),
+    моделей у них нет — autogenerate не должен предлагать их удалить.
+    """
+    if type_ == "table" and name is not None:
+        return PARTITION_NAME_RE.match(name) is None
+    return True
+
+
 def get_url() -> str:
     """
     Берём URL подключения к БД из Settings (DATABASE_URL),
     а не из alembic.ini напрямую.
     """
     settings = get_settings()
-    return settings.database_url
+    return settings.require_database_url()
 
 
 def run_migrations_offline() -> None:
@@ -45,6 +56,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         compare_type=True,
+        include_name=include_name,
     )
 
     with context.begin_transaction():
@@ -67,6 +79,7 @@ def run_migrations_online() -> None:
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
+            include_name=include_name,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,41 @@
+"""enhancement results store
+
+Revision ID: 3f8d2b9c51e7
+Revises: 6c247431a726
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8d2b9c51e7'
+down_revision: Union[str, None] = '6c247431a726'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'enhancement_results',
+        sa.Column('fingerprint', sa.String(length=64), nullable=False),
+        sa.Column('model_name', sa.String(length=100), nullable=False),
+        sa.Column('enhanced_prompt', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('fingerprint'),
+    )
+    op.create_index(
+        op.f('ix_enhancement_results_expires_at'),
+        'enhancement_results',
+        ['expires_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_enhancement_results_expires_at'), table_name='enhancement_results')
+    op.drop_table('enhancement_results')
@@ -0,0 +1,51 @@
+"""prompt history full text search
+
+Revision ID: 6c247431a726
+Revises: 89c21af60251
+Create Date: 2026-10-18 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c247431a726'
+down_revision: Union[str, None] = '89c21af60251'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Конфигурация 'simple' без стемминга: промпты бывают на разных языках (en/ru/fr/...).
+# Исходный промпт весит больше (A), улучшенный — меньше (B).
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(input_prompt, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(enhanced_prompt, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    op.add_column(
+        'prompt_history',
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'ix_prompt_history_search_vector',
+        'prompt_history',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_prompt_history_search_vector', table_name='prompt_history')
+    op.drop_column('prompt_history', 'search_vector')
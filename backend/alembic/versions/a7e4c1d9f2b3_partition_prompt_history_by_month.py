@@ -0,0 +1,156 @@
+"""partition prompt_history by month
+
+Revision ID: a7e4c1d9f2b3
+Revises: 3f8d2b9c51e7
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e4c1d9f2b3'
+down_revision: Union[str, None] = '3f8d2b9c51e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Та же формула, что и в 6c247431a726 (копия, чтобы миграция не зависела от кода приложения).
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(input_prompt, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(enhanced_prompt, '')), 'B')"
+)
+
+# Сколько месяцев вперёд создать сразу; дальше партиции создаёт приложение (app.db.partitions).
+MONTHS_AHEAD = 3
+
+COLUMNS = "id, user_id, model_id, provider, input_prompt, enhanced_prompt, params_json, created_at"
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes() -> None:
+    # ix_prompt_history_user_id не создаём: его покрывает (user_id, created_at DESC).
+    op.create_index('ix_prompt_history_created_at', 'prompt_history', ['created_at'], unique=False)
+    op.create_index('ix_prompt_history_model_id', 'prompt_history', ['model_id'], unique=False)
+    op.create_index(
+        'ix_prompt_history_user_created_at',
+        'prompt_history',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'ix_prompt_history_search_vector',
+        'prompt_history',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+
+    op.execute('ALTER TABLE prompt_history RENAME TO prompt_history_unpartitioned')
+    op.execute('ALTER TABLE prompt_history_unpartitioned RENAME CONSTRAINT prompt_history_pkey TO prompt_history_unpartitioned_pkey')
+    op.execute(
+        'ALTER TABLE prompt_history_unpartitioned '
+        'RENAME CONSTRAINT prompt_history_user_id_fkey TO prompt_history_unpartitioned_user_id_fkey'
+    )
+    for index in (
+        'ix_prompt_history_created_at',
+        'ix_prompt_history_model_id',
+        'ix_prompt_history_user_created_at',
+        'ix_prompt_history_user_id',
+        'ix_prompt_history_search_vector',
+    ):
+        op.execute(f'DROP INDEX {index}')
+
+    # Ключ партиционирования обязан входить в первичный ключ.
+    op.execute(
+        f"""
+        CREATE TABLE prompt_history (
+            id UUID NOT NULL,
+            user_id UUID,
+            model_id VARCHAR(100) NOT NULL,
+            provider VARCHAR(50) NOT NULL,
+            input_prompt TEXT NOT NULL,
+            enhanced_prompt TEXT NOT NULL,
+            params_json JSON NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            search_vector TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED,
+            CONSTRAINT prompt_history_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT prompt_history_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE SET NULL
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute('CREATE TABLE prompt_history_default PARTITION OF prompt_history DEFAULT')
+
+    # Месячные партиции: от самой старой записи до MONTHS_AHEAD месяцев вперёд.
+    oldest = connection.execute(sa.text('SELECT min(created_at) FROM prompt_history_unpartitioned')).scalar()
+    today = datetime.now(timezone.utc).date()
+    month = date((oldest or today).year, (oldest or today).month, 1)
+    last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f'CREATE TABLE prompt_history_y{month.year:04d}m{month.month:02d} PARTITION OF prompt_history '
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{following.isoformat()} 00:00:00+00')"
+        )
+        month = following
+
+    # Индексы создаём после копирования: одна сборка вместо обновления на каждую строку.
+    op.execute(f'INSERT INTO prompt_history ({COLUMNS}) SELECT {COLUMNS} FROM prompt_history_unpartitioned')
+    _create_indexes()
+    op.execute('DROP TABLE prompt_history_unpartitioned')
+
+
+def downgrade() -> None:
+    op.execute('ALTER TABLE prompt_history RENAME TO prompt_history_partitioned')
+    op.execute('ALTER TABLE prompt_history_partitioned RENAME CONSTRAINT prompt_history_pkey TO prompt_history_partitioned_pkey')
+    op.execute(
+        'ALTER TABLE prompt_history_partitioned '
+        'RENAME CONSTRAINT prompt_history_user_id_fkey TO prompt_history_partitioned_user_id_fkey'
+    )
+    for index in (
+        'ix_prompt_history_created_at',
+        'ix_prompt_history_model_id',
+        'ix_prompt_history_user_created_at',
+        'ix_prompt_history_search_vector',
+    ):
+        op.execute(f'DROP INDEX {index}')
+
+    op.create_table(
+        'prompt_history',
+        sa.Column('id', sa.UUID(), nullable=False),
+        sa.Column('user_id', sa.UUID(), nullable=True),
+        sa.Column('model_id', sa.String(length=100), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('input_prompt', sa.Text(), nullable=False),
+        sa.Column('enhanced_prompt', sa.Text(), nullable=False),
+        sa.Column('params_json', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column(
+            'search_vector',
+            postgresql.TSVECTOR(),
+            sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+            nullable=True,
+        ),
+        # Имя задаём явно: у ещё существующих партиций FK называется так же, и автоимя получило бы суффикс.
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], name='prompt_history_user_id_fkey', ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # Отсоединённые на момент отката партиции остаются отдельными таблицами и не переносятся.
+    op.execute(f'INSERT INTO prompt_history ({COLUMNS}) SELECT {COLUMNS} FROM prompt_history_partitioned')
+    _create_indexes()
+    op.create_index('ix_prompt_history_user_id', 'prompt_history', ['user_id'], unique=False)
+    # DROP родителя удаляет и все подключённые партиции.
+    op.execute('DROP TABLE prompt_history_partitioned')
@@ -0,0 +1,184 @@
+"""deduplicate prompt_history params
+
+Revision ID: d5b8e2f4a6c1
+Revises: a7e4c1d9f2b3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import hashlib
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5b8e2f4a6c1'
+down_revision: Union[str, None] = 'a7e4c1d9f2b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Поля, которые уже хранятся в самой строке истории (input_prompt, model_id).
+ROW_FIELDS_SQL = "- 'initialPrompt' - 'targetAiModel'"
+
+BATCH_SIZE = 1000
+
+# Та же формула, что и в 6c247431a726 (копия, чтобы миграция не зависела от кода приложения).
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(input_prompt, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(enhanced_prompt, '')), 'B')"
+)
+
+COLUMNS = "id, user_id, model_id, provider, input_prompt, enhanced_prompt, created_at"
+
+INDEXES = (
+    'ix_prompt_history_created_at',
+    'ix_prompt_history_model_id',
+    'ix_prompt_history_user_created_at',
+    'ix_prompt_history_search_vector',
+)
+
+
+def _hash_params(stored: dict) -> str:
+    # Должно совпадать с app.services.params_store.hash_params: иначе запись истории
+    # не найдёт перенесённые наборы и создаст дубликаты.
+    canonical = json.dumps(stored, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _rename_to_inline(connection) -> list:
+    """
+    Переименовывает prompt_history и её партиции в *_inline, освобождая имена таблиц,
+    ограничений и индексов для новой таблицы. Возвращает [(имя партиции, её границы)].
+    """
+    partitions = connection.execute(
+        sa.text(
+            'SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits AS i '
+            "JOIN pg_class AS c ON c.oid = i.inhrelid WHERE i.inhparent = 'prompt_history'::regclass "
+            'ORDER BY c.relname'
+        )
+    ).all()
+
+    for index in INDEXES:
+        # Удаление индекса партиционированной таблицы удаляет и индексы партиций.
+        op.execute(f'DROP INDEX {index}')
+    op.execute('ALTER TABLE prompt_history RENAME TO prompt_history_inline')
+    op.execute('ALTER TABLE prompt_history_inline RENAME CONSTRAINT prompt_history_pkey TO prompt_history_inline_pkey')
+    op.execute(
+        'ALTER TABLE prompt_history_inline '
+        'RENAME CONSTRAINT prompt_history_user_id_fkey TO prompt_history_inline_user_id_fkey'
+    )
+    for name, _ in partitions:
+        op.execute(f'ALTER TABLE "{name}" RENAME TO "{name}_inline"')
+        # Индекс первичного ключа партиции назван по её имени; без переименования
+        # индекс новой партиции получил бы имя с суффиксом.
+        primary_key = connection.execute(
+            sa.text("SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'p'"),
+            {'table': f'{name}_inline'},
+        ).scalar_one()
+        op.execute(f'ALTER TABLE "{name}_inline" RENAME CONSTRAINT "{primary_key}" TO "{name}_inline_pkey"')
+
+    return list(partitions)
+
+
+def _create_indexes() -> None:
+    # Те же индексы, что и в a7e4c1d9f2b3.
+    op.create_index('ix_prompt_history_created_at', 'prompt_history', ['created_at'], unique=False)
+    op.create_index('ix_prompt_history_model_id', 'prompt_history', ['model_id'], unique=False)
+    op.create_index(
+        'ix_prompt_history_user_created_at',
+        'prompt_history',
+        ['user_id', sa.text('created_at DESC')],
+        unique=False,
+    )
+    op.create_index(
+        'ix_prompt_history_search_vector',
+        'prompt_history',
+        ['search_vector'],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'prompt_params',
+        sa.Column('id', sa.BigInteger(), sa.Identity(always=False), nullable=False),
+        sa.Column('params_hash', sa.String(length=64), nullable=False),
+        sa.Column('params_json', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('params_hash'),
+    )
+
+    # Уникальные наборы параметров: дедупликация на стороне БД (jsonb сравнивается по значению),
+    # хеш канонической формы — в Python, тем же способом, что и в приложении.
+    connection = op.get_bind()
+    prompt_params = sa.table(
+        'prompt_params',
+        sa.column('params_hash', sa.String),
+        sa.column('params_json', sa.JSON),
+    )
+    distinct_sets = connection.execute(
+        sa.text(f'SELECT DISTINCT params_json::jsonb {ROW_FIELDS_SQL} AS stored FROM prompt_history')
+    ).scalars()
+    batch = []
+    for stored in distinct_sets:
+        batch.append({'params_hash': _hash_params(stored), 'params_json': stored})
+        if len(batch) >= BATCH_SIZE:
+            connection.execute(prompt_params.insert(), batch)
+            batch = []
+    if batch:
+        connection.execute(prompt_params.insert(), batch)
+
+    # Таблицу переписываем копированием, а не UPDATE + DROP COLUMN: UPDATE создал бы новую
+    # версию каждой строки (со всё ещё встроенным params_json), а DROP COLUMN в Postgres
+    # меняет только метаданные — куча выросла бы вдвое до VACUUM FULL.
+    partitions = _rename_to_inline(connection)
+
+    op.execute(
+        f"""
+        CREATE TABLE prompt_history (
+            id UUID NOT NULL,
+            user_id UUID,
+            model_id VARCHAR(100) NOT NULL,
+            provider VARCHAR(50) NOT NULL,
+            input_prompt TEXT NOT NULL,
+            enhanced_prompt TEXT NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            search_vector TSVECTOR GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED,
+            params_id BIGINT NOT NULL,
+            CONSTRAINT prompt_history_pkey PRIMARY KEY (id, created_at),
+            CONSTRAINT prompt_history_user_id_fkey FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE SET NULL,
+            CONSTRAINT prompt_history_params_id_fkey FOREIGN KEY (params_id) REFERENCES prompt_params (id)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    for name, bound in partitions:
+        op.execute(f'CREATE TABLE "{name}" PARTITION OF prompt_history {bound}')
+
+    # Индексы создаём после копирования: одна сборка вместо обновления на каждую строку.
+    op.execute(
+        f'INSERT INTO prompt_history ({COLUMNS}, params_id) '
+        f'SELECT {", ".join(f"h.{column}" for column in COLUMNS.split(", "))}, p.id '
+        'FROM prompt_history_inline AS h JOIN prompt_params AS p '
+        f'ON p.params_json::jsonb = (h.params_json::jsonb {ROW_FIELDS_SQL})'
+    )
+    _create_indexes()
+    # DROP родителя удаляет и все его партиции.
+    op.execute('DROP TABLE prompt_history_inline')
+
+
+def downgrade() -> None:
+    op.add_column('prompt_history', sa.Column('params_json', sa.JSON(), nullable=True))
+    op.execute(
+        'UPDATE prompt_history AS h SET params_json = (p.params_json::jsonb || jsonb_build_object('
+        "'initialPrompt', h.input_prompt, 'targetAiModel', h.model_id))::json "
+        'FROM prompt_params AS p WHERE p.id = h.params_id'
+    )
+    op.alter_column('prompt_history', 'params_json', nullable=False)
+    op.drop_constraint('prompt_history_params_id_fkey', 'prompt_history', type_='foreignkey')
+    op.drop_column('prompt_history', 'params_id')
+    op.drop_table('prompt_params')
@@ -0,0 +1,44 @@
+"""record the gemini model in prompt_history
+
+Revision ID: e1c7a3f5b9d2
+Revises: d5b8e2f4a6c1
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1c7a3f5b9d2'
+down_revision: Union[str, None] = 'd5b8e2f4a6c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Отсоединённые партиции (см. app.db.partitions): столбец нужен и им, иначе их не выгрузить
+# архиватором и не подключить обратно.
+DETACHED_PARTITIONS_SQL = (
+    "SELECT c.relname FROM pg_class c "
+    "WHERE c.relkind = 'r' AND NOT c.relispartition AND c.relname ~ '^prompt_history_y[0-9]{4}m[0-9]{2}$'"
+)
+
+
+def _detached_partitions() -> list:
+    return list(op.get_bind().execute(sa.text(DETACHED_PARTITIONS_SQL)).scalars())
+
+
+def upgrade() -> None:
+    # У существующих строк модель неизвестна (NULL): прогрев кэша результатов их не использует.
+    # ADD COLUMN у партиционированной таблицы добавляет столбец и во все её партиции.
+    op.add_column('prompt_history', sa.Column('gemini_model', sa.String(length=100), nullable=True))
+    for name in _detached_partitions():
+        op.add_column(name, sa.Column('gemini_model', sa.String(length=100), nullable=True))
+
+
+def downgrade() -> None:
+    for name in _detached_partitions():
+        op.drop_column(name, 'gemini_model')
+    op.drop_column('prompt_history', 'gemini_model')
@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from typing import Any, Mapping, Optional
+
+import pydantic_core
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON-ответ, сериализуемый pydantic-core (Rust) вместо json.dumps.
+
+    Pydantic-модель пишется в JSON напрямую, без промежуточного dict и без повторной
+    валидации по response_model: эндпоинты возвращают FastJSONResponse(model), а
+    response_model остаётся только для OpenAPI. Прочее содержимое (dict/list, которое
+    FastAPI уже привёл к JSON-совместимому виду) тоже сериализуется pydantic-core.
+    Это класс ответа по умолчанию для всего приложения.
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+        *,
+        exclude_none: bool = False,
+    ) -> None:
+        self.exclude_none = exclude_none
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content, exclude_none=self.exclude_none)
+        return pydantic_core.to_json(content, exclude_none=self.exclude_none)
@@ -1,11 +1,31 @@
-from fastapi import APIRouter
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
 
-from app.schemas.enhancement import EnhanceRequest, EnhanceResponse
-from app.services.gemini_client import enhance_prompt_with_gemini
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import StreamingResponse
+
+from app.api.responses import FastJSONResponse
+from app.core.config import get_settings
+from app.schemas.enhancement import (
+    BatchEnhanceItemResult,
+    BatchEnhanceRequest,
+    BatchEnhanceResponse,
+    EnhanceRequest,
+    EnhanceResponse,
+)
+from app.services.gemini_client import enhance_prompt_with_gemini_async, generated_by, open_enhancement_stream
+from app.services.history_writer import record_enhancement
+from app.services.resilience import apply_request_deadline
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/api/v1",
     tags=["enhancement"],
+    # Дедлайн запроса (UPSTREAM_DEADLINE_SECONDS или X-Request-Timeout) для всех вызовов Gemini.
+    dependencies=[Depends(apply_request_deadline)],
 )
 
 
@@ -18,9 +38,136 @@ router = APIRouter(
         "полученный от Gemini через Google Gen AI SDK."
     ),
 )
-async def enhance_prompt(request: EnhanceRequest) -> EnhanceResponse:
+async def enhance_prompt(
+    request: EnhanceRequest,
+    cache_bypass: bool = Header(
+        default=False,
+        alias="X-Cache-Bypass",
+        description="true — не брать результат из кэша, а заново сходить в Gemini.",
+    ),
+) -> FastJSONResponse:
     """
     Реализация эндпоинта улучшения промпта через Gemini.
+
+    Вызов идёт через async-клиент SDK, поэтому event loop не блокируется.
+    Одинаковые запросы обслуживаются из кэша результатов, если не передан X-Cache-Bypass.
+    """
+    enhanced = await enhance_prompt_with_gemini_async(request, use_cache=not cache_bypass)
+    record_enhancement(request, enhanced, generated_by())
+    return FastJSONResponse(EnhanceResponse(enhancedPrompt=enhanced))
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Форматирует одно событие Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _sse_stream(request: EnhanceRequest, chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield _sse_event("chunk", {"text": chunk})
+    except HTTPException as exc:
+        # Статус ответа уже отправлен (200), поэтому ошибку передаём отдельным событием.
+        yield _sse_event("error", {"status": exc.status_code, "detail": exc.detail})
+        return
+
+    enhanced = "".join(parts)
+    record_enhancement(request, enhanced, generated_by())
+    yield _sse_event("done", {"enhancedPrompt": enhanced})
+
+
+@router.post(
+    "/enhance/stream",
+    summary="Enhance prompt (streaming)",
+    description=(
+        "То же, что /enhance, но улучшенный промпт отдаётся по мере генерации "
+        "в формате Server-Sent Events: события chunk ({\"text\": ...}), "
+        "затем done ({\"enhancedPrompt\": ...}) или error ({\"status\": ..., \"detail\": ...})."
+    ),
+    response_class=StreamingResponse,
+)
+async def enhance_prompt_stream(
+    request: EnhanceRequest,
+    cache_bypass: bool = Header(
+        default=False,
+        alias="X-Cache-Bypass",
+        description="true — не брать результат из кэша, а заново сходить в Gemini.",
+    ),
+) -> StreamingResponse:
+    """
+    Потоковый эндпоинт улучшения промпта.
+
+    Ошибки валидации (400/500) возвращаются обычным HTTP-ответом до начала стрима.
     """
-    enhanced = enhance_prompt_with_gemini(request)
-    return EnhanceResponse(enhancedPrompt=enhanced)
+    chunks = open_enhancement_stream(request, use_cache=not cache_bypass)
+    return StreamingResponse(
+        _sse_stream(request, chunks),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _enhance_batch_item(
+    index: int,
+    item: EnhanceRequest,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool,
+) -> BatchEnhanceItemResult:
+    async with semaphore:
+        try:
+            enhanced = await enhance_prompt_with_gemini_async(item, use_cache=use_cache)
+        except HTTPException as exc:
+            return BatchEnhanceItemResult(index=index, status=exc.status_code, detail=str(exc.detail))
+        except Exception:
+            # Неожиданная ошибка одного элемента не должна ронять весь пакет:
+            # элемент получает тот же 500, что вернул бы /enhance.
+            logger.exception("Batch item %d failed", index)
+            return BatchEnhanceItemResult(
+                index=index,
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Internal Server Error",
+            )
+
+    record_enhancement(item, enhanced, generated_by())
+    return BatchEnhanceItemResult(index=index, status=status.HTTP_200_OK, enhancedPrompt=enhanced)
+
+
+@router.post(
+    "/enhance/batch",
+    response_model=BatchEnhanceResponse,
+    summary="Enhance prompts in batch",
+    description=(
+        "Принимает список запросов в формате /enhance и обрабатывает их параллельно "
+        "(не более BATCH_MAX_PARALLELISM одновременно). Каждый элемент завершается "
+        "независимо: его status совпадает с HTTP-статусом, который вернул бы /enhance."
+    ),
+)
+async def enhance_prompt_batch(
+    request: BatchEnhanceRequest,
+    cache_bypass: bool = Header(
+        default=False,
+        alias="X-Cache-Bypass",
+        description="true — не брать результаты из кэша, а заново сходить в Gemini.",
+    ),
+) -> FastJSONResponse:
+    """
+    Пакетное улучшение промптов с ограниченным параллелизмом.
+    """
+    settings = get_settings()
+
+    if len(request.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many items in batch: {len(request.items)} > {settings.batch_max_items}.",
+        )
+
+    semaphore = asyncio.Semaphore(settings.batch_max_parallelism)
+    results = await asyncio.gather(
+        *(
+            _enhance_batch_item(index, item, semaphore, use_cache=not cache_bypass)
+            for index, item in enumerate(request.items)
+        )
+    )
+    return FastJSONResponse(BatchEnhanceResponse(results=list(results)))
@@ -0,0 +1,253 @@
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from sqlalchemy import Float, cast, func, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.responses import FastJSONResponse
+from app.core.config import get_settings
+from app.db.session import get_async_db
+from app.models.prompt_history import PromptHistory
+from app.models.prompt_params import PromptParams
+from app.schemas.history import HistoryItem, HistoryPage, HistorySearchItem, HistorySearchPage
+from app.services.cursor import decode_cursor, encode_cursor
+from app.services.params_store import expand_params
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["history"],
+)
+
+
+async def history_scope(
+    user_id: Optional[uuid.UUID] = Query(
+        default=None,
+        description="Вернуть историю только этого пользователя (для ключа без привязки к пользователю).",
+    ),
+    x_api_key: Optional[str] = Header(default=None, description="Ключ из HISTORY_API_KEYS."),
+) -> Optional[uuid.UUID]:
+    """
+    Dependency: проверяет X-API-Key и возвращает пользователя, которым ограничена выборка.
+
+    Ключ, привязанный к пользователю, видит только его историю: чужой user_id — 403.
+    Ключ без привязки видит всю историю (None) или историю переданного user_id.
+    Если HISTORY_API_KEYS не задан, эндпоинтов истории как будто нет (404).
+    """
+    api_keys = get_settings().history_api_keys
+    if not api_keys:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if x_api_key is None or x_api_key not in api_keys:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing or invalid X-API-Key.",
+        )
+
+    key_user_id = api_keys[x_api_key]
+    if key_user_id is None:
+        return user_id
+    if user_id is not None and user_id != key_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="This API key can only read its own history.",
+        )
+    return key_user_id
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    position = decode_cursor(cursor)
+    try:
+        return datetime.fromisoformat(position["c"]), uuid.UUID(position["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        ) from exc
+
+
+def _decode_search_cursor(cursor: str) -> tuple:
+    position = decode_cursor(cursor)
+    try:
+        return float(position["r"]), datetime.fromisoformat(position["c"]), uuid.UUID(position["i"])
+    except (KeyError, TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        ) from exc
+
+
+# Та же конфигурация, что и в выражении search_vector (см. модель PromptHistory).
+_TS_CONFIG = literal_column("'simple'::regconfig")
+
+# Параметры ts_headline: пара коротких фрагментов вокруг найденных слов.
+_HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5"
+
+
+@router.get(
+    "/history",
+    response_model=HistoryPage,
+    response_model_exclude_none=True,
+    summary="List prompt history",
+    description=(
+        "Возвращает историю улучшений от новых к старым с keyset-пагинацией по (created_at, id): "
+        "передайте nextCursor из предыдущего ответа в параметре cursor. Требует X-API-Key "
+        "из HISTORY_API_KEYS; ключ пользователя видит только его историю."
+    ),
+)
+async def list_history(
+    user_id: Optional[uuid.UUID] = Depends(history_scope),
+    model_id: Optional[str] = Query(default=None, description="Фильтр по модели (value из реестра)."),
+    cursor: Optional[str] = Query(default=None, description="nextCursor из предыдущей страницы."),
+    limit: int = Query(default=20, ge=1, le=100),
+    include_params: bool = Query(default=False, description="Добавить params_json в ответ."),
+    db: AsyncSession = Depends(get_async_db),
+) -> FastJSONResponse:
+    """
+    Страница истории улучшений.
+
+    Выбираем только нужные колонки, без ORM-сущностей, поэтому связь user
+    (lazy="joined") не подтягивает users, а параметры (join с prompt_params)
+    читаются лишь по запросу.
+    Условие (created_at, id) < курсора вместе с ORDER BY created_at DESC, id DESC
+    идёт по индексу ix_prompt_history_user_created_at (или ix_prompt_history_created_at
+    без user_id), поэтому стоимость страницы не зависит от глубины прокрутки.
+    """
+    columns = [
+        PromptHistory.id,
+        PromptHistory.model_id,
+        PromptHistory.provider,
+        PromptHistory.input_prompt,
+        PromptHistory.enhanced_prompt,
+        PromptHistory.created_at,
+    ]
+    if include_params:
+        columns.append(PromptParams.params_json)
+
+    query = select(*columns)
+    if include_params:
+        query = query.join_from(PromptHistory, PromptParams, PromptParams.id == PromptHistory.params_id)
+    if user_id is not None:
+        query = query.where(PromptHistory.user_id == user_id)
+    if model_id is not None:
+        query = query.where(PromptHistory.model_id == model_id)
+    if cursor is not None:
+        created_at, row_id = _decode_history_cursor(cursor)
+        query = query.where(tuple_(PromptHistory.created_at, PromptHistory.id) < (created_at, row_id))
+
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница.
+    query = query.order_by(PromptHistory.created_at.desc(), PromptHistory.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        HistoryItem(
+            id=row.id,
+            modelId=row.model_id,
+            provider=row.provider,
+            inputPrompt=row.input_prompt,
+            enhancedPrompt=row.enhanced_prompt,
+            createdAt=row.created_at,
+            params=expand_params(row.params_json, row.input_prompt, row.model_id) if include_params else None,
+        )
+        for row in rows
+    ]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor({"c": last.created_at.isoformat(), "i": str(last.id)})
+
+    return FastJSONResponse(HistoryPage(items=items, nextCursor=next_cursor), exclude_none=True)
+
+
+@router.get(
+    "/history/search",
+    response_model=HistorySearchPage,
+    response_model_exclude_none=True,
+    summary="Search prompt history",
+    description=(
+        "Полнотекстовый поиск по исходным и улучшенным промптам. Поддерживается синтаксис "
+        "websearch_to_tsquery: \"точная фраза\", OR, -исключение. Результаты отсортированы "
+        "по релевантности; следующая страница — через nextCursor. Доступ — как у /history."
+    ),
+)
+async def search_history(
+    q: str = Query(min_length=1, max_length=500, description="Поисковый запрос."),
+    user_id: Optional[uuid.UUID] = Depends(history_scope),
+    model_id: Optional[str] = Query(default=None, description="Фильтр по модели (value из реестра)."),
+    cursor: Optional[str] = Query(default=None, description="nextCursor из предыдущей страницы."),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db),
+) -> FastJSONResponse:
+    """
+    Поиск по истории через GIN-индекс ix_prompt_history_search_vector.
+
+    Совпадения находятся по индексу, ранжирование (ts_rank_cd) считается только для них,
+    а дорогой ts_headline — только для строк итоговой страницы. Пагинация keyset-ная
+    по (rank, created_at, id).
+    """
+    ts_query = func.websearch_to_tsquery(_TS_CONFIG, q)
+    rank = cast(func.ts_rank_cd(PromptHistory.search_vector, ts_query), Float).label("rank")
+
+    page_query = select(
+        PromptHistory.id,
+        PromptHistory.model_id,
+        PromptHistory.provider,
+        PromptHistory.input_prompt,
+        PromptHistory.enhanced_prompt,
+        PromptHistory.created_at,
+        rank,
+    ).where(PromptHistory.search_vector.op("@@")(ts_query))
+
+    if user_id is not None:
+        page_query = page_query.where(PromptHistory.user_id == user_id)
+    if model_id is not None:
+        page_query = page_query.where(PromptHistory.model_id == model_id)
+    if cursor is not None:
+        cursor_rank, created_at, row_id = _decode_search_cursor(cursor)
+        page_query = page_query.where(
+            tuple_(rank, PromptHistory.created_at, PromptHistory.id) < (cursor_rank, created_at, row_id)
+        )
+
+    page = (
+        page_query.order_by(rank.desc(), PromptHistory.created_at.desc(), PromptHistory.id.desc())
+        .limit(limit + 1)
+        .subquery()
+    )
+
+    query = select(
+        page,
+        func.ts_headline(_TS_CONFIG, page.c.input_prompt, ts_query, _HEADLINE_OPTIONS).label("input_highlight"),
+        func.ts_headline(_TS_CONFIG, page.c.enhanced_prompt, ts_query, _HEADLINE_OPTIONS).label(
+            "enhanced_highlight"
+        ),
+    ).order_by(page.c.rank.desc(), page.c.created_at.desc(), page.c.id.desc())
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        HistorySearchItem(
+            id=row.id,
+            modelId=row.model_id,
+            provider=row.provider,
+            inputPrompt=row.input_prompt,
+            enhancedPrompt=row.enhanced_prompt,
+            createdAt=row.created_at,
+            rank=row.rank,
+            inputHighlight=row.input_highlight,
+            enhancedHighlight=row.enhanced_highlight,
+        )
+        for row in rows
+    ]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor({"r": last.rank, "c": last.created_at.isoformat(), "i": str(last.id)})
+
+    return FastJSONResponse(HistorySearchPage(items=items, nextCursor=next_cursor), exclude_none=True)
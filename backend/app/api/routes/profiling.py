@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import get_settings
+from app.services.profiler import profile_path
+
+router = APIRouter(
+    prefix="/api/v1",
+    tags=["profiling"],
+)
+
+
+@router.get(
+    "/profiles/{profile_id}",
+    summary="Download a request profile",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+)
+async def get_profile(profile_id: str, x_api_key: Optional[str] = Header(default=None)) -> PlainTextResponse:
+    """
+    Отдаёт сохранённый профиль запроса в формате folded stacks (для speedscope / flamegraph.pl).
+
+    Доступно только при PROFILING_ENABLED=true и только клиентам из PROFILING_API_KEYS;
+    остальным эндпоинт отвечает 404, как будто его нет.
+    """
+    settings = get_settings()
+    path = None
+    if settings.profiling_enabled and x_api_key in settings.profiling_api_keys:
+        path = profile_path(settings.profiling_output_dir, profile_id)
+
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found.")
+
+    return PlainTextResponse(path.read_text(encoding="utf-8"))
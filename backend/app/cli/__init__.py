@@ -0,0 +1 @@
+# Package for command-line tools (bulk enhancement, maintenance, etc.).
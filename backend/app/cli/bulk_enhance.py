@@ -0,0 +1,231 @@
+"""
+Офлайн-улучшение промптов пачкой: JSONL на входе, JSONL на выходе.
+
+Каждая строка входа — JSON-объект в формате EnhanceRequest (лишние поля игнорируются,
+поле "id" копируется в результат). Каждая строка выхода:
+
+    {"line": <номер строки входа>, "id": ..., "status": 200, "enhancedPrompt": "...", "detail": null}
+
+status совпадает с HTTP-статусом, который вернул бы /api/v1/enhance; для строк,
+которые не удалось разобрать, — 422.
+
+Запуск (из каталога backend/):
+
+    python -m app.cli.bulk_enhance --input prompts.jsonl --output enhanced.jsonl \\
+        --checkpoint enhanced.ckpt --concurrency 32
+
+Память постоянная: одновременно в работе не больше --concurrency строк, результаты
+пишутся по мере готовности в порядке входа. С --checkpoint после каждых
+--checkpoint-every строк сохраняется позиция; повторный запуск с --resume
+продолжает с неё (выходной файл обрезается до сохранённого размера, так что строки
+не дублируются). Если выходной файл пропал или короче сохранённого размера,
+возобновление отказывается работать: удалите чекпоинт и запустите заново.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Deque, Dict, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from app.core.config import get_settings
+from app.schemas.enhancement import EnhanceRequest
+from app.services.gemini_client import enhance_prompt_with_gemini_async
+
+
+@dataclass
+class Checkpoint:
+    """Позиция обработки: сколько строк входа уже записано и размер выхода в байтах."""
+
+    input_line: int = 0
+    output_bytes: int = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        if not path.is_file():
+            return cls()
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(input_line=int(data["input_line"]), output_bytes=int(data["output_bytes"]))
+
+    def save(self, path: Path) -> None:
+        # Пишем во временный файл и атомарно подменяем, чтобы падение не оставило битый чекпоинт.
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(
+            json.dumps({"input_line": self.input_line, "output_bytes": self.output_bytes}),
+            encoding="utf-8",
+        )
+        os.replace(tmp_path, path)
+
+
+async def _process_line(line_no: int, raw_line: str, use_cache: bool) -> Dict[str, Any]:
+    result: Dict[str, Any] = {"line": line_no}
+
+    try:
+        payload = json.loads(raw_line)
+        if isinstance(payload, dict) and "id" in payload:
+            result["id"] = payload["id"]
+        request = EnhanceRequest.model_validate(payload)
+    except (ValueError, ValidationError) as exc:
+        result.update(status=status.HTTP_422_UNPROCESSABLE_ENTITY, enhancedPrompt=None, detail=str(exc))
+        return result
+
+    try:
+        enhanced = await enhance_prompt_with_gemini_async(request, use_cache=use_cache)
+    except HTTPException as exc:
+        result.update(status=exc.status_code, enhancedPrompt=None, detail=str(exc.detail))
+        return result
+
+    result.update(status=status.HTTP_200_OK, enhancedPrompt=enhanced, detail=None)
+    return result
+
+
+async def run(
+    source: IO[str],
+    sink: IO[bytes],
+    *,
+    concurrency: int,
+    checkpoint: Checkpoint,
+    checkpoint_path: Optional[Path] = None,
+    checkpoint_every: int = 100,
+    use_cache: bool = True,
+) -> Checkpoint:
+    """
+    Основной цикл: читает строки source, держит в работе не больше concurrency задач
+    и пишет результаты в sink в порядке входа.
+    """
+    pending: Deque["asyncio.Task[Dict[str, Any]]"] = deque()
+    written_since_checkpoint = 0
+
+    async def write_oldest() -> None:
+        nonlocal written_since_checkpoint
+
+        result = await pending.popleft()
+        data = json.dumps(result, ensure_ascii=False).encode("utf-8") + b"\n"
+        sink.write(data)
+        checkpoint.input_line = result["line"]
+        checkpoint.output_bytes += len(data)
+        written_since_checkpoint += 1
+
+        if checkpoint_path is not None and written_since_checkpoint >= checkpoint_every:
+            sink.flush()
+            os.fsync(sink.fileno())
+            checkpoint.save(checkpoint_path)
+            written_since_checkpoint = 0
+
+    for line_no, raw_line in enumerate(source, start=1):
+        if line_no <= checkpoint.input_line:
+            continue
+        if not raw_line.strip():
+            continue
+
+        pending.append(asyncio.ensure_future(_process_line(line_no, raw_line, use_cache)))
+        if len(pending) >= concurrency:
+            await write_oldest()
+
+    while pending:
+        await write_oldest()
+
+    sink.flush()
+    if checkpoint_path is not None:
+        os.fsync(sink.fileno())
+        checkpoint.save(checkpoint_path)
+
+    return checkpoint
+
+
+def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli.bulk_enhance",
+        description="Bulk prompt enhancement: EnhanceRequest JSONL in, results JSONL out.",
+    )
+    parser.add_argument("--input", "-i", default="-", help="Входной JSONL (по умолчанию stdin).")
+    parser.add_argument("--output", "-o", default="-", help="Выходной JSONL (по умолчанию stdout).")
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        type=int,
+        default=None,
+        help="Сколько строк обрабатывается одновременно (по умолчанию GEMINI_MAX_CONCURRENCY).",
+    )
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Файл чекпоинта для возобновления.")
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=100,
+        help="Как часто (в строках) сохранять чекпоинт.",
+    )
+    parser.add_argument("--resume", action="store_true", help="Продолжить с позиции из --checkpoint.")
+    parser.add_argument("--no-cache", action="store_true", help="Не брать результаты из кэша.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = _parse_args(argv)
+
+    if args.resume and args.checkpoint is None:
+        print("--resume requires --checkpoint", file=sys.stderr)
+        return 2
+    if args.checkpoint is not None and args.output == "-":
+        print("--checkpoint requires --output to be a file", file=sys.stderr)
+        return 2
+
+    concurrency = args.concurrency or get_settings().gemini_max_concurrency
+    checkpoint = Checkpoint.load(args.checkpoint) if args.resume else Checkpoint()
+    if args.resume:
+        output_path = Path(args.output)
+        output_size = output_path.stat().st_size if output_path.is_file() else 0
+        if output_size < checkpoint.output_bytes:
+            # Выход удалён или обрезан: строки до чекпоинта потеряны, а смещения указывали бы
+            # за конец файла. Продолжать нельзя — только начать заново.
+            print(
+                f"Cannot resume: {args.output} has {output_size} bytes, but the checkpoint expects "
+                f"{checkpoint.output_bytes}. Delete {args.checkpoint} to start over.",
+                file=sys.stderr,
+            )
+            return 2
+
+    source: IO[str] = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    if args.output == "-":
+        sink: IO[bytes] = sys.stdout.buffer
+    else:
+        output_path = Path(args.output)
+        if args.resume and output_path.exists():
+            sink = open(output_path, "r+b")
+            sink.truncate(checkpoint.output_bytes)
+            sink.seek(checkpoint.output_bytes)
+        else:
+            sink = open(output_path, "wb")
+
+    try:
+        final = asyncio.run(
+            run(
+                source,
+                sink,
+                concurrency=max(1, concurrency),
+                checkpoint=checkpoint,
+                checkpoint_path=args.checkpoint,
+                checkpoint_every=max(1, args.checkpoint_every),
+                use_cache=not args.no_cache,
+            )
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout.buffer:
+            sink.close()
+
+    print(f"Processed up to input line {final.input_line}.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Обслуживание помесячных партиций prompt_history: создание, архивация и удаление старых.
+
+Запуск (из каталога backend/):
+
+    # список партиций (подключённые и отсоединённые)
+    python -m app.cli.history_partitions list
+
+    # создать партиции на HISTORY_PARTITIONS_AHEAD_MONTHS месяцев вперёд
+    python -m app.cli.history_partitions ensure
+
+    # выгрузить партиции за месяцы раньше 2026-01 в сжатый JSONL
+    python -m app.cli.history_partitions archive --before 2026-01 --archive-dir /backups/history
+
+    # хранение: всё старше HISTORY_RETENTION_MONTHS месяцев выгрузить и отсоединить (или удалить)
+    python -m app.cli.history_partitions retain --keep-months 12 --mode drop --archive-dir /backups/history
+
+Архив — <archive-dir>/<партиция>.jsonl.gz, по строке JSON на запись prompt_history
+(без search_vector). Строки читаются курсором на стороне сервера, так что память
+не зависит от размера партиции. Партиция удаляется, только если число выгруженных
+строк совпало с числом строк в ней.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, List, Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+from app.db.partitions import (
+    PARTITION_COLUMNS,
+    PartitionInfo,
+    add_months,
+    current_month,
+    detach_partition,
+    drop_partition,
+    ensure_partitions,
+    expired_partitions,
+    list_partitions,
+    parse_month,
+)
+from app.db.session import get_engine
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def archive_partition(engine: Engine, name: str, archive_dir: Path, batch_size: int = 1000) -> int:
+    """
+    Выгружает партицию (подключённую или отсоединённую) в <archive_dir>/<name>.jsonl.gz.
+
+    Файл пишется во временный и атомарно подменяется; число строк сверяется с count(*)
+    в том же снимке данных (REPEATABLE READ). Возвращает число выгруженных строк.
+    """
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    target = archive_dir / f"{name}.jsonl.gz"
+    tmp_path = target.with_name(target.name + ".partial")
+
+    written = 0
+    with engine.connect().execution_options(isolation_level="REPEATABLE READ") as connection:
+        with connection.begin():
+            # Выгрузка большой партиции может идти дольше DB_STATEMENT_TIMEOUT_MS.
+            connection.execute(text("SET LOCAL statement_timeout = 0"))
+            expected = connection.execute(text(f'SELECT count(*) FROM "{name}"')).scalar_one()
+            # Архив самодостаточен: вместо params_id — полный набор параметров, как в запросе.
+            columns = ", ".join(f"h.{column}" for column in PARTITION_COLUMNS if column != "params_id")
+            rows = connection.execution_options(stream_results=True, yield_per=batch_size).execute(
+                text(
+                    f"SELECT {columns}, p.params_json::jsonb || jsonb_build_object("
+                    "'initialPrompt', h.input_prompt, 'targetAiModel', h.model_id) AS params_json "
+                    f'FROM "{name}" h JOIN prompt_params p ON p.id = h.params_id '
+                    "ORDER BY h.created_at, h.id"
+                )
+            )
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as archive:
+                for row in rows:
+                    archive.write(json.dumps(row._asdict(), ensure_ascii=False, default=_json_default))
+                    archive.write("\n")
+                    written += 1
+
+    if written != expected:
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"{name}: archived {written} rows, expected {expected}")
+
+    os.replace(tmp_path, target)
+    return written
+
+
+def _partitions_before(engine: Engine, before: date) -> List[PartitionInfo]:
+    with engine.connect() as connection:
+        return [p for p in list_partitions(connection) if p.month is not None and p.month < before]
+
+
+def _cmd_list(engine: Engine, args: argparse.Namespace) -> int:
+    with engine.connect() as connection:
+        partitions = list_partitions(connection)
+        for partition in partitions:
+            rows = connection.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :name"), {"name": partition.name}
+            ).scalar()
+            state = "attached" if partition.attached else "detached"
+            print(f"{partition.name}\t{state}\t~{max(rows or 0, 0)} rows")
+    return 0
+
+
+def _cmd_ensure(engine: Engine, args: argparse.Namespace) -> int:
+    with engine.begin() as connection:
+        created = ensure_partitions(connection, args.months_ahead)
+    print(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+    return 0
+
+
+def _cmd_archive(engine: Engine, args: argparse.Namespace) -> int:
+    names = args.partitions or [p.name for p in _partitions_before(engine, parse_month(args.before))]
+    for name in names:
+        rows = archive_partition(engine, name, args.archive_dir)
+        print(f"{name}: archived {rows} rows")
+    return 0
+
+
+def _cmd_retain(engine: Engine, args: argparse.Namespace) -> int:
+    if args.keep_months <= 0:
+        print("Retention is disabled: set HISTORY_RETENTION_MONTHS or --keep-months.", file=sys.stderr)
+        return 1
+    archive_dir = None if args.no_archive else args.archive_dir
+    if args.mode == "drop" and archive_dir is None and not args.no_archive:
+        print("Refusing to drop partitions without --archive-dir (use --no-archive to skip the archive).", file=sys.stderr)
+        return 1
+
+    with engine.connect() as connection:
+        partitions = expired_partitions(connection, args.keep_months)
+    cutoff = add_months(current_month(), -(args.keep_months - 1))
+    print(f"Keeping partitions from {cutoff.isoformat()}; {len(partitions)} older.")
+
+    for partition in partitions:
+        # В режиме detach уже отсоединённые таблицы оставляем как есть.
+        if args.mode == "detach" and not partition.attached:
+            continue
+        if args.dry_run:
+            print(f"{partition.name}: would {args.mode}")
+            continue
+
+        if archive_dir is not None:
+            rows = archive_partition(engine, partition.name, archive_dir)
+            print(f"{partition.name}: archived {rows} rows")
+        with engine.begin() as connection:
+            if partition.attached:
+                detach_partition(connection, partition.name)
+            if args.mode == "drop":
+                drop_partition(connection, partition.name)
+        print(f"{partition.name}: {'dropped' if args.mode == 'drop' else 'detached'}")
+    return 0
+
+
+def _parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    settings = get_settings()
+    default_archive_dir = Path(settings.history_archive_dir) if settings.history_archive_dir else None
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="Показать партиции prompt_history.")
+
+    ensure = commands.add_parser("ensure", help="Создать партиции на ближайшие месяцы.")
+    ensure.add_argument(
+        "--months-ahead",
+        type=int,
+        default=settings.history_partitions_ahead_months,
+        help="Сколько месяцев вперёд (по умолчанию HISTORY_PARTITIONS_AHEAD_MONTHS).",
+    )
+
+    archive = commands.add_parser("archive", help="Выгрузить партиции в сжатый JSONL.")
+    selection = archive.add_mutually_exclusive_group(required=True)
+    selection.add_argument("--before", help="Все месячные партиции раньше месяца YYYY-MM.")
+    selection.add_argument("--partition", dest="partitions", action="append", help="Имя партиции (можно повторять).")
+    archive.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=default_archive_dir,
+        required=default_archive_dir is None,
+        help="Каталог для архивов (по умолчанию HISTORY_ARCHIVE_DIR).",
+    )
+
+    retain = commands.add_parser("retain", help="Отсоединить или удалить партиции старше окна хранения.")
+    retain.add_argument(
+        "--keep-months",
+        type=int,
+        default=settings.history_retention_months,
+        help="Сколько месяцев хранить, включая текущий (по умолчанию HISTORY_RETENTION_MONTHS).",
+    )
+    retain.add_argument(
+        "--mode",
+        choices=("detach", "drop"),
+        default=settings.history_retention_mode,
+        help="detach — оставить таблицу отдельно, drop — удалить (по умолчанию HISTORY_RETENTION_MODE).",
+    )
+    retain.add_argument(
+        "--archive-dir",
+        type=Path,
+        default=default_archive_dir,
+        help="Перед отсоединением выгрузить партицию сюда (по умолчанию HISTORY_ARCHIVE_DIR).",
+    )
+    retain.add_argument("--no-archive", action="store_true", help="Разрешить drop без архива.")
+    retain.add_argument("--dry-run", action="store_true", help="Только показать, что будет сделано.")
+
+    return parser.parse_args(argv)
+
+
+_COMMANDS = {"list": _cmd_list, "ensure": _cmd_ensure, "archive": _cmd_archive, "retain": _cmd_retain}
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = _parse_args(argv)
+    engine = get_engine()
+    try:
+        return _COMMANDS[args.command](engine, args)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+"""
+Готовит предсжатые копии собранного фронтенда: рядом с каждым текстовым файлом
+кладёт .br (brotli, если установлен) и .gz с максимальной степенью сжатия.
+Backend отдаёт их по Accept-Encoding без сжатия на лету.
+
+Запуск (из каталога backend/), после `npm run build`:
+
+    python -m app.cli.precompress_static ../dist
+
+Копия сохраняется, только если она меньше исходника; устаревшие копии перезаписываются.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from app.core.config import get_settings
+from app.services.content_encoding import brotli, compress_brotli, compress_gzip
+from app.services.static_assets import COMPRESSIBLE_SUFFIXES, ENCODING_SUFFIXES, is_compressed_copy
+
+_COMPRESSORS = {"br": compress_brotli, "gzip": compress_gzip}
+
+
+def precompress_directory(directory: Path, min_size: int) -> int:
+    """Сжимает файлы каталога; возвращает число записанных копий."""
+    written = 0
+    for path in sorted(directory.rglob("*")):
+        if not path.is_file() or is_compressed_copy(path) or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+            continue
+        stat = path.stat()
+        if stat.st_size < min_size:
+            continue
+
+        data = path.read_bytes()
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            target = path.with_name(path.name + suffix)
+            if target.is_file() and target.stat().st_mtime >= stat.st_mtime:
+                continue
+            compressed = _COMPRESSORS[encoding](data)
+            if compressed is None or len(compressed) >= len(data):
+                continue
+            target.write_bytes(compressed)
+            os.utime(target, (stat.st_atime, max(stat.st_mtime, target.stat().st_mtime)))
+            written += 1
+    return written
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        type=Path,
+        help="Каталог сборки (по умолчанию FRONTEND_DIST_PATH).",
+    )
+    parser.add_argument("--min-size", type=int, default=256, help="Не сжимать файлы меньше N байт (по умолчанию 256).")
+    args = parser.parse_args()
+
+    directory = args.directory or get_settings().frontend_dist_path
+    if not directory.is_dir():
+        print(f"Directory not found: {directory}", file=sys.stderr)
+        return 1
+
+    if brotli is None:
+        print("brotli is not installed: writing gzip copies only.", file=sys.stderr)
+    written = precompress_directory(directory, args.min_size)
+    print(f"Wrote {written} compressed files in {directory}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
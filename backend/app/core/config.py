@@ -1,7 +1,29 @@
 import os
+import tempfile
+import uuid
 from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional
+
+
+def _get_int_env(name: str, default: int) -> int:
+    """Читает целое число из переменной окружения, при пустом значении берёт default."""
+    raw = os.getenv(name, "").strip()
+    return int(raw) if raw else default
+
+
+def _get_float_env(name: str, default: float) -> float:
+    """Читает число с плавающей точкой из переменной окружения."""
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else default
+
+
+def _get_bool_env(name: str, default: bool) -> bool:
+    """Читает флаг из переменной окружения: 1/true/yes/on — True, 0/false/no/off — False."""
+    raw = os.getenv(name, "").strip().lower()
+    if not raw:
+        return default
+    return raw in ("1", "true", "yes", "on")
 
 
 class Settings:
@@ -9,9 +31,79 @@ class Settings:
 
     gemini_api_key: str
     gemini_model_name: str
+    gemini_api_base_url: str
     frontend_dist_path: Path
     cors_allow_origins: List[str]
+    rate_limit_enabled: bool
+    rate_limit_per_second: float
+    rate_limit_burst: float
+    rate_limit_max_clients: int
+    trust_forwarded_for: bool
+    admission_max_in_flight: int
+    admission_max_queue: int
+    admission_queue_timeout_seconds: float
+    server_timing_enabled: bool
+    api_compression_enabled: bool
+    api_compression_min_size: int
+    api_compression_gzip_level: int
+    api_compression_brotli_quality: int
+    startup_prewarm_enabled: bool
+    profiling_enabled: bool
+    profiling_api_keys: List[str]
+    rate_limit_api_keys: List[str]
+    profiling_interval_ms: float
+    profiling_output_dir: Path
     database_url: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_recycle_seconds: int
+    db_pool_timeout_seconds: float
+    db_statement_timeout_ms: int
+    gemini_system_instruction_enabled: bool
+    gemini_prompt_mode: str
+    gemini_prompt_ab_compact_share: float
+    gemini_prompt_token_budget: int
+    gemini_fallback_model_name: str
+    gemini_hedge_enabled: bool
+    gemini_hedge_percentile: float
+    gemini_hedge_initial_delay_seconds: float
+    gemini_hedge_max_rate: float
+    upstream_deadline_seconds: float
+    upstream_retry_max_attempts: int
+    upstream_retry_base_delay_seconds: float
+    upstream_retry_max_delay_seconds: float
+    upstream_circuit_failure_threshold: int
+    upstream_circuit_reset_seconds: float
+    gemini_max_concurrency: int
+    gemini_queue_timeout_seconds: float
+    result_cache_max_entries: int
+    result_cache_ttl_seconds: float
+    result_store_enabled: bool
+    result_store_ttl_seconds: float
+    result_store_lookup_timeout_ms: float
+    result_store_buffer_max_rows: int
+    result_store_flush_batch_size: int
+    result_store_flush_interval_seconds: float
+    result_store_sweep_interval_seconds: float
+    result_store_prewarm_rows: int
+    result_store_prewarm_days: int
+    near_duplicate_enabled: bool
+    near_duplicate_threshold: float
+    near_duplicate_max_entries: int
+    near_duplicate_seed_rows: int
+    batch_max_items: int
+    batch_max_parallelism: int
+    history_enabled: bool
+    history_buffer_max_rows: int
+    history_flush_batch_size: int
+    history_flush_interval_seconds: float
+    history_params_cache_size: int
+    history_partitions_ahead_months: int
+    history_partition_maintenance_interval_seconds: float
+    history_retention_months: int
+    history_retention_mode: str
+    history_archive_dir: str
+    history_api_keys: Dict[str, Optional[uuid.UUID]]
 
     def __init__(self) -> None:
         # Новый SDK умеет автоматически подхватывать ключ из GEMINI_API_KEY или GOOGLE_API_KEY,
@@ -22,6 +114,74 @@ class Settings:
         # В примерах используется строка вида "gemini-2.5-flash".
         self.gemini_model_name = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash")
 
+        # Альтернативный адрес Gemini API (например, локальная заглушка из backend/benchmarks).
+        self.gemini_api_base_url = os.getenv("GEMINI_API_BASE_URL", "").strip()
+
+        # Хеджирование: если основной вызов не ответил за время, равное перцентилю
+        # GEMINI_HEDGE_PERCENTILE его латентности, параллельно отправляем второй запрос
+        # (в GEMINI_FALLBACK_MODEL_NAME, если задана). Доля хеджей ограничена GEMINI_HEDGE_MAX_RATE.
+        self.gemini_fallback_model_name = os.getenv("GEMINI_FALLBACK_MODEL_NAME", "").strip()
+        self.gemini_hedge_enabled = _get_bool_env("GEMINI_HEDGE_ENABLED", False)
+        self.gemini_hedge_percentile = min(0.999, max(0.5, _get_float_env("GEMINI_HEDGE_PERCENTILE", 0.95)))
+        self.gemini_hedge_initial_delay_seconds = _get_float_env("GEMINI_HEDGE_INITIAL_DELAY_SECONDS", 2.0)
+        self.gemini_hedge_max_rate = min(1.0, max(0.0, _get_float_env("GEMINI_HEDGE_MAX_RATE", 0.05)))
+
+        # Статическая часть мета-промпта уходит отдельной system instruction,
+        # в сообщении пользователя остаются только параметры запроса.
+        self.gemini_system_instruction_enabled = _get_bool_env("GEMINI_SYSTEM_INSTRUCTION_ENABLED", True)
+
+        # Режим мета-промпта: verbose — подробный, compact — без параметров по умолчанию,
+        # с дедупликацией инструкций и бюджетом входных токенов (GEMINI_PROMPT_TOKEN_BUDGET,
+        # 0 — без ограничения), ab — compact для доли GEMINI_PROMPT_AB_COMPACT_SHARE запросов.
+        prompt_mode = os.getenv("GEMINI_PROMPT_MODE", "verbose").strip().lower()
+        self.gemini_prompt_mode = prompt_mode if prompt_mode in ("verbose", "compact", "ab") else "verbose"
+        self.gemini_prompt_ab_compact_share = min(1.0, max(0.0, _get_float_env("GEMINI_PROMPT_AB_COMPACT_SHARE", 0.5)))
+        self.gemini_prompt_token_budget = max(0, _get_int_env("GEMINI_PROMPT_TOKEN_BUDGET", 4000))
+
+        # Устойчивость вызовов Gemini: общий дедлайн запроса (клиент может сократить его
+        # заголовком X-Request-Timeout), повторы временных ошибок с экспоненциальной
+        # задержкой и circuit breaker, который размыкается после серии ошибок подряд.
+        self.upstream_deadline_seconds = _get_float_env("UPSTREAM_DEADLINE_SECONDS", 30.0)
+        self.upstream_retry_max_attempts = max(1, _get_int_env("UPSTREAM_RETRY_MAX_ATTEMPTS", 3))
+        self.upstream_retry_base_delay_seconds = _get_float_env("UPSTREAM_RETRY_BASE_DELAY_SECONDS", 0.2)
+        self.upstream_retry_max_delay_seconds = _get_float_env("UPSTREAM_RETRY_MAX_DELAY_SECONDS", 2.0)
+        self.upstream_circuit_failure_threshold = max(1, _get_int_env("UPSTREAM_CIRCUIT_FAILURE_THRESHOLD", 5))
+        self.upstream_circuit_reset_seconds = _get_float_env("UPSTREAM_CIRCUIT_RESET_SECONDS", 30.0)
+
+        # Сколько запросов к Gemini один процесс держит «в полёте» одновременно.
+        # Остальные ждут своей очереди, но не дольше GEMINI_QUEUE_TIMEOUT_SECONDS.
+        self.gemini_max_concurrency = max(1, _get_int_env("GEMINI_MAX_CONCURRENCY", 64))
+        self.gemini_queue_timeout_seconds = _get_float_env("GEMINI_QUEUE_TIMEOUT_SECONDS", 10.0)
+
+        # In-process кэш готовых улучшений: размер (0 — выключен) и время жизни записи.
+        self.result_cache_max_entries = _get_int_env("RESULT_CACHE_MAX_ENTRIES", 1024)
+        self.result_cache_ttl_seconds = _get_float_env("RESULT_CACHE_TTL_SECONDS", 3600.0)
+
+        # Второй уровень кэша — таблица enhancement_results в Postgres, общая для всех реплик.
+        # Поиск перед вызовом Gemini ограничен RESULT_STORE_LOOKUP_TIMEOUT_MS, запись — в фоне пачками.
+        # При старте кэши прогреваются самыми частыми запросами из prompt_history.
+        self.result_store_enabled = _get_bool_env("RESULT_STORE_ENABLED", False)
+        self.result_store_ttl_seconds = max(1.0, _get_float_env("RESULT_STORE_TTL_SECONDS", 7 * 24 * 3600.0))
+        self.result_store_lookup_timeout_ms = max(1.0, _get_float_env("RESULT_STORE_LOOKUP_TIMEOUT_MS", 50.0))
+        self.result_store_buffer_max_rows = max(1, _get_int_env("RESULT_STORE_BUFFER_MAX_ROWS", 10000))
+        self.result_store_flush_batch_size = max(1, _get_int_env("RESULT_STORE_FLUSH_BATCH_SIZE", 500))
+        self.result_store_flush_interval_seconds = _get_float_env("RESULT_STORE_FLUSH_INTERVAL_SECONDS", 1.0)
+        self.result_store_sweep_interval_seconds = _get_float_env("RESULT_STORE_SWEEP_INTERVAL_SECONDS", 600.0)
+        self.result_store_prewarm_rows = max(0, _get_int_env("RESULT_STORE_PREWARM_ROWS", 1000))
+        self.result_store_prewarm_days = max(1, _get_int_env("RESULT_STORE_PREWARM_DAYS", 7))
+
+        # Переиспользование ответов для почти одинаковых промптов (MinHash/LSH).
+        # Выключено по умолчанию: при совпадении отдаётся ответ на *другой*, похожий промпт.
+        self.near_duplicate_enabled = _get_bool_env("NEAR_DUPLICATE_ENABLED", False)
+        self.near_duplicate_threshold = _get_float_env("NEAR_DUPLICATE_THRESHOLD", 0.9)
+        self.near_duplicate_max_entries = max(1, _get_int_env("NEAR_DUPLICATE_MAX_ENTRIES", 10000))
+        self.near_duplicate_seed_rows = max(0, _get_int_env("NEAR_DUPLICATE_SEED_ROWS", 5000))
+
+        # Пакетный эндпоинт: сколько элементов можно прислать за раз
+        # и сколько из них обрабатывается параллельно.
+        self.batch_max_items = max(1, _get_int_env("BATCH_MAX_ITEMS", 50))
+        self.batch_max_parallelism = max(1, _get_int_env("BATCH_MAX_PARALLELISM", 8))
+
         # Путь к собранному фронту (dist). Можно переопределить через переменную окружения.
         dist_env = os.getenv("FRONTEND_DIST_PATH")
         if dist_env:
@@ -32,19 +192,104 @@ class Settings:
             project_root = Path(__file__).resolve().parents[2].parent
             self.frontend_dist_path = (project_root / "dist").resolve()
 
-        db_url = os.getenv("DATABASE_URL")
-        if not db_url:
-            # Жёсткая проверка: без DATABASE_URL backend не стартует,
-            # чтобы мы не забыли настроить Postgres.
-            raise RuntimeError(
-                "DATABASE_URL is not set. Please configure PostgreSQL connection string."
-            )
-        self.database_url = db_url
+        # Строка подключения к PostgreSQL; наличие проверяется при первом обращении к БД
+        # (см. require_database_url).
+        self.database_url = os.getenv("DATABASE_URL", "").strip()
+
+        # Пул соединений (общие значения для sync- и async-engine).
+        self.db_pool_size = max(1, _get_int_env("DB_POOL_SIZE", 5))
+        self.db_max_overflow = max(0, _get_int_env("DB_MAX_OVERFLOW", 10))
+        self.db_pool_recycle_seconds = _get_int_env("DB_POOL_RECYCLE_SECONDS", 1800)
+        self.db_pool_timeout_seconds = _get_float_env("DB_POOL_TIMEOUT_SECONDS", 30.0)
+        # statement_timeout на стороне Postgres для соединений приложения; 0 — без ограничения.
+        self.db_statement_timeout_ms = max(0, _get_int_env("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+        # Запись истории улучшений в prompt_history (write-behind, пачками в фоне).
+        # При переполнении буфера новые записи отбрасываются, а не тормозят запросы.
+        self.history_enabled = _get_bool_env("HISTORY_ENABLED", True)
+        self.history_buffer_max_rows = max(1, _get_int_env("HISTORY_BUFFER_MAX_ROWS", 10000))
+        self.history_flush_batch_size = max(1, _get_int_env("HISTORY_FLUSH_BATCH_SIZE", 500))
+        self.history_flush_interval_seconds = _get_float_env("HISTORY_FLUSH_INTERVAL_SECONDS", 1.0)
+        # Наборы параметров хранятся один раз в prompt_params; кэш hash -> id избавляет
+        # запись истории от лишних запросов за уже известными наборами.
+        self.history_params_cache_size = max(0, _get_int_env("HISTORY_PARAMS_CACHE_SIZE", 10000))
+
+        # prompt_history разбита на помесячные партиции: приложение заранее создаёт партиции
+        # на HISTORY_PARTITIONS_AHEAD_MONTHS вперёд. Хранение (HISTORY_RETENTION_MONTHS, 0 — бессрочно)
+        # применяет `python -m app.cli.history_partitions retain`: партиции старше окна выгружаются
+        # в HISTORY_ARCHIVE_DIR и отсоединяются (detach) или удаляются (drop).
+        self.history_partitions_ahead_months = max(1, _get_int_env("HISTORY_PARTITIONS_AHEAD_MONTHS", 3))
+        self.history_partition_maintenance_interval_seconds = max(
+            60.0, _get_float_env("HISTORY_PARTITION_MAINTENANCE_INTERVAL_SECONDS", 6 * 3600.0)
+        )
+        self.history_retention_months = max(0, _get_int_env("HISTORY_RETENTION_MONTHS", 0))
+        retention_mode = os.getenv("HISTORY_RETENTION_MODE", "detach").strip().lower()
+        self.history_retention_mode = retention_mode if retention_mode in ("detach", "drop") else "detach"
+        self.history_archive_dir = os.getenv("HISTORY_ARCHIVE_DIR", "").strip()
+        # Доступ к /api/v1/history*: X-API-Key из HISTORY_API_KEYS. Запись "ключ=<uuid>"
+        # видит только историю этого пользователя, просто "ключ" — всю (для администрирования).
+        # Без ключей эндпоинты истории выключены.
+        self.history_api_keys = {}
+        for entry in os.getenv("HISTORY_API_KEYS", "").split(","):
+            key, _, user_id = entry.partition("=")
+            if key.strip():
+                self.history_api_keys[key.strip()] = uuid.UUID(user_id.strip()) if user_id.strip() else None
 
         # Разрешённые CORS-источники для браузерных запросов к API.
         cors_origins_env = os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:5173")
         self.cors_allow_origins = [origin.strip() for origin in cors_origins_env.split(",") if origin.strip()]
 
+        # Контроль входящей нагрузки на /api/*: token bucket на клиента и глобальный предел
+        # одновременно обрабатываемых запросов с ограниченной очередью. Клиент — IP, а для
+        # X-API-Key из RATE_LIMIT_API_KEYS — сам ключ (произвольный заголовок лимит не обходит).
+        # Лимит выключен по умолчанию: за reverse proxy без TRUST_FORWARDED_FOR все
+        # пользователи делили бы один bucket с IP прокси.
+        self.rate_limit_enabled = _get_bool_env("RATE_LIMIT_ENABLED", False)
+        self.rate_limit_per_second = max(0.001, _get_float_env("RATE_LIMIT_PER_SECOND", 5.0))
+        self.rate_limit_burst = max(1.0, _get_float_env("RATE_LIMIT_BURST", 20.0))
+        self.rate_limit_max_clients = max(1, _get_int_env("RATE_LIMIT_MAX_CLIENTS", 100000))
+        rate_limit_keys_env = os.getenv("RATE_LIMIT_API_KEYS", "")
+        self.rate_limit_api_keys = [key.strip() for key in rate_limit_keys_env.split(",") if key.strip()]
+        # Брать IP клиента из X-Forwarded-For (только за одним доверенным прокси,
+        # который дописывает адрес клиента в конец заголовка).
+        self.trust_forwarded_for = _get_bool_env("TRUST_FORWARDED_FOR", False)
+        self.admission_max_in_flight = max(1, _get_int_env("ADMISSION_MAX_IN_FLIGHT", 256))
+        self.admission_max_queue = max(0, _get_int_env("ADMISSION_MAX_QUEUE", 512))
+        self.admission_queue_timeout_seconds = _get_float_env("ADMISSION_QUEUE_TIMEOUT_SECONDS", 5.0)
+
+        # Сжатие ответов /api/v1/* (gzip/brotli по Accept-Encoding) от заданного размера.
+        self.api_compression_enabled = _get_bool_env("API_COMPRESSION_ENABLED", True)
+        self.api_compression_min_size = max(0, _get_int_env("API_COMPRESSION_MIN_SIZE", 1024))
+        self.api_compression_gzip_level = min(9, max(1, _get_int_env("API_COMPRESSION_GZIP_LEVEL", 5)))
+        self.api_compression_brotli_quality = min(11, max(0, _get_int_env("API_COMPRESSION_BROTLI_QUALITY", 4)))
+
+        # Прогрев в фоне после старта: импорт google.genai, клиент Gemini и первое соединение с БД.
+        self.startup_prewarm_enabled = _get_bool_env("STARTUP_PREWARM_ENABLED", True)
+
+        # Диагностика медленных запросов: заголовок Server-Timing с этапами обработки
+        # и сэмплирующий профайлер по запросу (X-Profile: 1) для клиентов из PROFILING_API_KEYS.
+        self.server_timing_enabled = _get_bool_env("SERVER_TIMING_ENABLED", True)
+        self.profiling_enabled = _get_bool_env("PROFILING_ENABLED", False)
+        profiling_keys_env = os.getenv("PROFILING_API_KEYS", "")
+        self.profiling_api_keys = [key.strip() for key in profiling_keys_env.split(",") if key.strip()]
+        self.profiling_interval_ms = max(0.5, _get_float_env("PROFILING_INTERVAL_MS", 5.0))
+        self.profiling_output_dir = Path(
+            os.getenv("PROFILING_OUTPUT_DIR", "").strip() or Path(tempfile.gettempdir()) / "prompt-enhancer-profiles"
+        )
+
+    def require_database_url(self) -> str:
+        """
+        DATABASE_URL, без которого нельзя подключиться к Postgres.
+
+        Проверяется при первом обращении к БД, а не при импорте приложения:
+        /health, CLI и бенчмарки работают и без настроенной базы.
+        """
+        if not self.database_url:
+            raise RuntimeError(
+                "DATABASE_URL is not set. Please configure PostgreSQL connection string."
+            )
+        return self.database_url
+
 
 @lru_cache
 def get_settings() -> Settings:
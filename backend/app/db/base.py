@@ -1,14 +1,12 @@
 from __future__ import annotations
 
-from sqlalchemy.orm import DeclarativeBase
-
-
-class Base(DeclarativeBase):
-    """Базовый класс для всех ORM-моделей."""
-    pass
-
+# Base живёт в base_class, чтобы модели могли импортировать его без циклов:
+# этот модуль сам импортирует модели.
+from app.db.base_class import Base  # noqa: F401
 
 # ВАЖНО: эти импорты нужны, чтобы Alembic видел модели в Base.metadata
 # и мог autogenerate миграции.
 from app.models.user import User  # noqa: F401
+from app.models.prompt_params import PromptParams  # noqa: F401
 from app.models.prompt_history import PromptHistory  # noqa: F401
+from app.models.enhancement_result import EnhancementResult  # noqa: F401
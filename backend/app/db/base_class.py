@@ -0,0 +1,8 @@
+from __future__ import annotations
+
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    """Базовый класс для всех ORM-моделей."""
+    pass
@@ -0,0 +1,201 @@
+"""
+Помесячные партиции prompt_history (декларативное RANGE-партиционирование по created_at).
+
+Партиции называются prompt_history_yYYYYmMM и покрывают [1-е число месяца, 1-е число следующего);
+prompt_history_default ловит строки вне созданных диапазонов, чтобы вставка никогда не падала.
+Функции принимают sync-Connection: из async-кода их вызывают через AsyncConnection.run_sync.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE = "prompt_history"
+DEFAULT_PARTITION = f"{PARTITIONED_TABLE}_default"
+
+# Имена партиций (в том числе отсоединённых): их не описывают модели, и autogenerate их пропускает.
+PARTITION_NAME_RE = re.compile(rf"^{PARTITIONED_TABLE}_(?:y(\d{{4}})m(\d{{2}})|default)$")
+
+# Хранимые столбцы prompt_history (search_vector генерируется самой БД).
+PARTITION_COLUMNS = (
+    "id",
+    "user_id",
+    "model_id",
+    "provider",
+    "input_prompt",
+    "enhanced_prompt",
+    "gemini_model",
+    "params_id",
+    "created_at",
+)
+
+
+@dataclass(frozen=True)
+class PartitionInfo:
+    name: str
+    # 1-е число месяца; None для партиции по умолчанию.
+    month: Optional[date]
+    attached: bool
+
+
+def month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    return month_start(datetime.now(timezone.utc).date())
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def parse_month(value: str) -> date:
+    """'YYYY-MM' -> 1-е число месяца (для аргументов CLI)."""
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def create_partition(connection: Connection, month: date) -> bool:
+    """
+    Создаёт партицию на месяц, если её ещё нет. Возвращает True, если партиция создана.
+
+    Если в prompt_history_default уже есть строки этого месяца (обслуживание долго
+    не запускалось), Postgres не даст создать партицию поверх них: тогда партиция
+    создаётся отдельной таблицей, строки переносятся в неё из default и она подключается.
+    """
+    name = partition_name(month)
+    if _table_exists(connection, name):
+        return False
+
+    start = f"{month.isoformat()} 00:00:00+00"
+    end = f"{add_months(month, 1).isoformat()} 00:00:00+00"
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    stray_rows = connection.execute(
+        text(f'SELECT EXISTS (SELECT 1 FROM "{DEFAULT_PARTITION}" WHERE created_at >= :start AND created_at < :end)'),
+        {"start": start, "end": end},
+    ).scalar_one()
+    if not stray_rows:
+        connection.execute(text(f'CREATE TABLE "{name}" PARTITION OF "{PARTITIONED_TABLE}" {bounds}'))
+        return True
+
+    columns = ", ".join(PARTITION_COLUMNS)
+    connection.execute(
+        text(f'CREATE TABLE "{name}" (LIKE "{PARTITIONED_TABLE}" INCLUDING DEFAULTS INCLUDING GENERATED)')
+    )
+    moved = connection.execute(
+        text(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= :start AND created_at < :end '
+            f"RETURNING {columns}) "
+            f'INSERT INTO "{name}" ({columns}) SELECT {columns} FROM moved'
+        ),
+        {"start": start, "end": end},
+    ).rowcount
+    connection.execute(text(f'ALTER TABLE "{PARTITIONED_TABLE}" ATTACH PARTITION "{name}" {bounds}'))
+    logger.warning("Moved %d rows from %s into new partition %s", moved, DEFAULT_PARTITION, name)
+    return True
+
+
+def ensure_partitions(connection: Connection, months_ahead: int) -> List[str]:
+    """
+    Создаёт партиции с текущего месяца на months_ahead месяцев вперёд.
+
+    Каждая партиция создаётся в своей точке сохранения (SAVEPOINT), так что ошибка
+    по одному месяцу не мешает остальным; транзакцию коммитит вызывающий.
+    Возвращает имена созданных партиций.
+    """
+    created: List[str] = []
+    start = current_month()
+    for offset in range(months_ahead + 1):
+        month = add_months(start, offset)
+        try:
+            with connection.begin_nested():
+                if create_partition(connection, month):
+                    created.append(partition_name(month))
+        except Exception:
+            logger.exception("Failed to create partition %s", partition_name(month))
+    return created
+
+
+def list_partitions(connection: Connection) -> List[PartitionInfo]:
+    """Все партиции prompt_history — подключённые и отсоединённые — в порядке месяцев."""
+    attached = set(
+        connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :table"
+            ),
+            {"table": PARTITIONED_TABLE},
+        ).scalars()
+    )
+    names = connection.execute(
+        text(
+            "SELECT tablename FROM pg_tables WHERE schemaname = current_schema() "
+            "AND tablename LIKE :prefix"
+        ),
+        {"prefix": f"{PARTITIONED_TABLE}\\_%"},
+    ).scalars()
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match is None:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1) if match.group(1) else None
+        partitions.append(PartitionInfo(name=name, month=month, attached=name in attached))
+
+    return sorted(partitions, key=lambda item: (item.month is None, item.month or date.min))
+
+
+def expired_partitions(connection: Connection, keep_months: int) -> List[PartitionInfo]:
+    """
+    Месячные партиции, целиком лежащие раньше окна хранения: текущий месяц
+    и keep_months - 1 предыдущих остаются.
+    """
+    cutoff = add_months(current_month(), -(keep_months - 1))
+    return [
+        partition
+        for partition in list_partitions(connection)
+        if partition.month is not None and partition.month < cutoff
+    ]
+
+
+def detach_partition(connection: Connection, name: str) -> None:
+    """
+    Отсоединяет партицию: таблица остаётся (её можно заархивировать или подключить обратно),
+    но больше не видна в prompt_history. Операция только над метаданными, без перезаписи строк.
+    """
+    _check_partition_name(name)
+    connection.execute(text(f'ALTER TABLE "{PARTITIONED_TABLE}" DETACH PARTITION "{name}"'))
+
+
+def drop_partition(connection: Connection, name: str) -> None:
+    """Удаляет партицию целиком (DROP TABLE вместо DELETE: без bloat и долгого VACUUM)."""
+    _check_partition_name(name)
+    connection.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+
+
+def _check_partition_name(name: str) -> None:
+    # Имя подставляется в DDL как идентификатор: принимаем только наши партиции.
+    if PARTITION_NAME_RE.match(name) is None or name == DEFAULT_PARTITION:
+        raise ValueError(f"Not a monthly {PARTITIONED_TABLE} partition: {name}")
+
+
+def _table_exists(connection: Connection, name: str) -> bool:
+    return connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar_one()
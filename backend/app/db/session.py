@@ -1,28 +1,113 @@
 from __future__ import annotations
 
-from typing import Generator
+from typing import Any, AsyncGenerator, Dict, Generator, Optional
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 
-from app.core.config import get_settings
+from app.core.config import Settings, get_settings
 
-settings = get_settings()
+# Engine'ы и фабрики сессий создаются при первом обращении, а не при импорте:
+# импорт приложения не требует DATABASE_URL и не тратит время на настройку пула.
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
 
-# Создаём engine для PostgreSQL
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    future=True,
-)
 
-# Фабрика сессий
-SessionLocal = sessionmaker(
-    autocommit=False,
-    autoflush=False,
-    bind=engine,
-    class_=Session,
-)
+def _engine_kwargs(settings: Settings) -> Dict[str, Any]:
+    """Общие параметры пула и соединений для sync- и async-engine."""
+    connect_args: Dict[str, Any] = {}
+    if settings.db_statement_timeout_ms:
+        connect_args["options"] = f"-c statement_timeout={settings.db_statement_timeout_ms}"
+
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_recycle": settings.db_pool_recycle_seconds,
+        "pool_timeout": settings.db_pool_timeout_seconds,
+        "connect_args": connect_args,
+    }
+
+
+def _async_database_url(url: str) -> str:
+    """
+    Приводит DATABASE_URL к драйверу psycopg (v3), который умеет и sync, и async.
+
+    postgresql://... и postgres://... без явного драйвера превращаем в postgresql+psycopg://...
+    """
+    for prefix in ("postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+psycopg://" + url[len(prefix) :]
+    return url
+
+
+def get_engine() -> Engine:
+    """Sync-engine для PostgreSQL (singleton)."""
+    global _engine
+
+    if _engine is None:
+        settings = get_settings()
+        _engine = create_engine(
+            settings.require_database_url(),
+            future=True,
+            **_engine_kwargs(settings),
+        )
+    return _engine
+
+
+def get_session_factory() -> sessionmaker:
+    """Фабрика sync-сессий."""
+    global _session_factory
+
+    if _session_factory is None:
+        _session_factory = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=get_engine(),
+            class_=Session,
+        )
+    return _session_factory
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Async-engine на том же psycopg (singleton): запросы из async-эндпоинтов
+    не блокируют event loop.
+    """
+    global _async_engine
+
+    if _async_engine is None:
+        settings = get_settings()
+        _async_engine = create_async_engine(
+            _async_database_url(settings.require_database_url()),
+            **_engine_kwargs(settings),
+        )
+    return _async_engine
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    """Фабрика async-сессий."""
+    global _async_session_factory
+
+    if _async_session_factory is None:
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_session_factory
+
+
+async def dispose_engines() -> None:
+    """Закрывает пулы соединений, если engine'ы успели создаться."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -36,8 +121,21 @@ def get_db() -> Generator[Session, None, None]:
 
     Пока не используется, но функция нужна для будущих коммитов.
     """
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async-dependency для FastAPI-эндпоинтов.
+
+    Пример использования:
+
+        async def endpoint(db: AsyncSession = Depends(get_async_db)):
+            ...
+    """
+    async with get_async_session_factory()() as db:
+        yield db
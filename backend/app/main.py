@@ -1,12 +1,106 @@
-from pathlib import Path
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 from app.api.routes.enhancement import router as enhancement_router
-from app.core.config import get_settings
+from app.api.routes.history import router as history_router
+from app.api.routes.profiling import router as profiling_router
+from app.api.responses import FastJSONResponse
+from app.core.config import Settings, get_settings
+from app.db.session import dispose_engines, get_async_engine
+from app.middleware.admission import AdmissionControlMiddleware
+from app.middleware.compression import APICompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.server_timing import ServerTimingMiddleware
+from app.services.gemini_client import warm_up_gemini_client
+from app.services.history_writer import get_history_writer, maintain_history_partitions
+from app.services.metrics import REGISTRY as METRICS_REGISTRY
+from app.services.params_store import get_params_interner
+from app.services.result_cache import get_result_cache
+from app.services.result_store import get_result_store, prewarm_result_store_from_history
+from app.services.similarity_index import get_similarity_index, seed_similarity_index_from_history
+from app.services.static_assets import FrontendStaticFiles
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _prewarm(settings: Settings) -> None:
+    """
+    Прогрев ленивых зависимостей в фоне: импорт google.genai и создание клиента
+    (в отдельном потоке, чтобы не блокировать event loop), затем первое соединение с БД.
+    Ошибки только логируются — всё равно создастся при первом запросе.
+    """
+    try:
+        await asyncio.to_thread(warm_up_gemini_client)
+    except Exception:
+        logger.warning("Failed to pre-warm Gemini client", exc_info=True)
+
+    if not settings.database_url:
+        return
+    try:
+        async with get_async_engine().connect():
+            pass
+    except Exception:
+        logger.warning("Failed to pre-warm database connection pool", exc_info=True)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """
+    Жизненный цикл приложения: фоновые задачи стартуют вместе с сервером
+    и корректно останавливаются при shutdown.
+
+    Старт не ждёт ни Gemini, ни БД: тяжёлые зависимости прогреваются в фоне,
+    и /health отвечает сразу после запуска процесса.
+    """
+    settings = get_settings()
+    history_writer = get_history_writer()
+
+    if settings.history_enabled:
+        # Без базы история бы молча терялась, поэтому без DATABASE_URL сервер не стартует.
+        settings.require_database_url()
+        history_writer.start()
+
+    result_store = get_result_store()
+    if result_store is not None:
+        settings.require_database_url()
+        result_store.start()
+
+    background_tasks = []
+    if settings.history_enabled:
+        background_tasks.append(asyncio.create_task(maintain_history_partitions()))
+    if settings.startup_prewarm_enabled:
+        background_tasks.append(asyncio.create_task(_prewarm(settings)))
+
+    # Индекс почти-дубликатов наполняется из истории в фоне, не задерживая старт.
+    if settings.near_duplicate_enabled:
+        background_tasks.append(asyncio.create_task(seed_similarity_index_from_history()))
+
+    # Самые частые запросы из истории заранее попадают в оба уровня кэша результатов.
+    if result_store is not None:
+        background_tasks.append(asyncio.create_task(prewarm_result_store_from_history()))
+
+    try:
+        yield
+    finally:
+        for task in background_tasks:
+            if not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        # Дописываем в БД всё, что накопилось в буфере истории.
+        await history_writer.stop()
+        if result_store is not None:
+            await result_store.stop()
+        await dispose_engines()
+
 
 app = FastAPI(
     title="Prompt Enhancer Pro API",
@@ -15,16 +109,32 @@ app = FastAPI(
         "Backend API for Prompt Enhancer Pro. "
         "Provides a health-check endpoint and prompt enhancement via Gemini."
     ),
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 settings = get_settings()
 
+# Сжатие — самый внутренний слой: Server-Timing учитывает и его время.
+app.add_middleware(APICompressionMiddleware)
+
+# Server-Timing и профилирование — внутри admission control: профилируются только принятые запросы.
+app.add_middleware(ServerTimingMiddleware)
+
+# Контроль нагрузки добавляем раньше CORS: так CORS остаётся внешним слоем
+# и проставляет заголовки и на ответы 429/503.
+app.add_middleware(AdmissionControlMiddleware)
+
+# Метрики снаружи admission control, чтобы учитывались и отклонённые запросы (429/503).
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_allow_origins,
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Profile-Id"],
 )
 
 
@@ -35,44 +145,34 @@ async def health_check() -> dict:
 
     Возвращает статус сервиса и, при необходимости, простую диагностическую информацию.
     """
+    similarity_index = get_similarity_index()
+    result_store = get_result_store()
+
     return {
         "status": "ok",
         "service": "prompt-enhancer-pro-backend",
+        "result_cache": get_result_cache().snapshot(),
+        "result_store": result_store.snapshot() if result_store else None,
+        "history_writer": get_history_writer().snapshot(),
+        "history_params_cache": get_params_interner().snapshot(),
+        "near_duplicate_index": similarity_index.snapshot() if similarity_index else None,
     }
 
 
-app.include_router(enhancement_router)
-
-# Если dist существует, монтируем его как статические файлы после всех API-роутов,
-# чтобы не перехватывать /api/* и системные эндпоинты.
-if settings.frontend_dist_path.is_dir():
-    app.mount(
-        "/",
-        StaticFiles(directory=str(settings.frontend_dist_path), html=True),
-        name="frontend-static",
-    )
-
-    index_file: Path = settings.frontend_dist_path / "index.html"
-
-    @app.get("/{full_path:path}", include_in_schema=False)
-    async def spa_fallback(full_path: str, request: Request) -> FileResponse:
-        """
-        SPA fallback: для всех путей, которые не начинаются с /api или /health,
-        отдаём index.html, если он существует.
-
-        Это нужно, чтобы фронт на React/Vite мог сам разруливать маршрутизацию.
-        """
-        # Не перехватываем API и health-check
-        if request.url.path.startswith("/api/") or request.url.path == "/health":
-            # FastAPI сюда не должен попадать для существующих роутов,
-            # но на всякий случай вернём 404.
-            from fastapi import HTTPException
-
-            raise HTTPException(status_code=404, detail="Not Found")
+@app.get("/metrics", summary="Prometheus metrics", tags=["system"], include_in_schema=False)
+async def metrics() -> Response:
+    """
+    Метрики в текстовом формате Prometheus: запросы и латентность по маршрутам,
+    длительность этапов улучшения, ошибки Gemini и счётчики кэшей/лимитов.
+    """
+    return Response(generate_latest(METRICS_REGISTRY), media_type=CONTENT_TYPE_LATEST)
 
-        if not index_file.is_file():
-            from fastapi import HTTPException
 
-            raise HTTPException(status_code=404, detail="Frontend is not built (index.html missing)")
+app.include_router(enhancement_router)
+app.include_router(history_router)
+app.include_router(profiling_router)
 
-        return FileResponse(index_file)
+# Если dist существует, монтируем SPA после всех API-роутов, чтобы не перехватывать
+# /api/* и системные эндпоинты. Пути без расширения получают index.html (SPA fallback).
+if settings.frontend_dist_path.is_dir():
+    app.mount("/", FrontendStaticFiles(settings.frontend_dist_path), name="frontend-static")
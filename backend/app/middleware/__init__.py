@@ -0,0 +1 @@
+# Package for ASGI middleware (admission control, timing, etc.).
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import get_settings
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше burst в запасе."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def try_take(self) -> float:
+        """
+        Забирает токен. Возвращает 0.0 при успехе или сколько секунд ждать до следующего токена.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+_active_middleware: Optional["AdmissionControlMiddleware"] = None
+
+
+def get_admission_stats() -> Optional[Dict[str, int]]:
+    """Счётчики middleware приложения (None, пока стек middleware ещё не собран)."""
+    return _active_middleware.snapshot() if _active_middleware is not None else None
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI-middleware контроля входящей нагрузки для /api/*.
+
+    1. Per-client rate limit: token bucket на каждый IP, а для API-ключей из
+       RATE_LIMIT_API_KEYS — на ключ. Превышение — сразу HTTP 429 с Retry-After.
+    2. Глобальный лимит одновременно обрабатываемых запросов и длины очереди к нему.
+       Если очередь полна или место не освободилось за ADMISSION_QUEUE_TIMEOUT_SECONDS —
+       HTTP 503 с Retry-After.
+
+    Отказ стоит микросекунды, поэтому при перегрузке принятые запросы обслуживаются
+    с прежней латентностью, а не деградируют все вместе.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        settings = get_settings()
+        self.rate_limit_enabled = settings.rate_limit_enabled
+        self.rate = settings.rate_limit_per_second
+        self.burst = settings.rate_limit_burst
+        self.max_clients = settings.rate_limit_max_clients
+        self.api_keys = frozenset(settings.rate_limit_api_keys)
+        self.trust_forwarded_for = settings.trust_forwarded_for
+        self.max_in_flight = settings.admission_max_in_flight
+        self.max_queue = settings.admission_max_queue
+        self.queue_timeout = settings.admission_queue_timeout_seconds
+        self.stats: Dict[str, int] = {"admitted": 0, "rate_limited": 0, "shed": 0}
+        self.in_flight = 0
+        self.waiting = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        global _active_middleware
+        _active_middleware = self
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        if self.rate_limit_enabled:
+            retry_after = self._bucket_for(self._client_key(scope)).try_take()
+            if retry_after > 0:
+                self.stats["rate_limited"] += 1
+                await self._reject(send, 429, "Rate limit exceeded.", retry_after)
+                return
+
+        if not await self._acquire_slot():
+            self.stats["shed"] += 1
+            await self._reject(send, 503, "Server is overloaded, please retry later.", 1.0)
+            return
+
+        self.stats["admitted"] += 1
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+            assert self._semaphore is not None
+            self._semaphore.release()
+
+    def _client_key(self, scope: Scope) -> str:
+        """
+        Ключ bucket'а. Заголовки, которые клиент может менять на каждом запросе, ключом
+        не становятся: X-API-Key учитывается, только если он есть в RATE_LIMIT_API_KEYS,
+        а из X-Forwarded-For берётся последний адрес — его дописал доверенный прокси.
+        """
+        headers = dict(scope.get("headers") or [])
+        api_key = headers.get(b"x-api-key")
+        if api_key:
+            key = api_key.decode("latin-1")
+            if key in self.api_keys:
+                return "key:" + key
+
+        if self.trust_forwarded_for:
+            forwarded = headers.get(b"x-forwarded-for")
+            if forwarded:
+                return "ip:" + forwarded.decode("latin-1").split(",")[-1].strip()
+
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    def _bucket_for(self, key: str) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets[key] = bucket
+            # Ограничиваем память: забываем клиентов, которые дольше всех не приходили.
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def _acquire_slot(self) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+            return True
+
+        if self.waiting >= self.max_queue:
+            return False
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        return True
+
+    @staticmethod
+    async def _reject(send: Send, status_code: int, detail: str, retry_after: float) -> None:
+        body = json.dumps({"detail": detail}).encode("utf-8")
+        headers: List[Tuple[bytes, bytes]] = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("ascii")),
+        ]
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "in_flight": self.in_flight, "waiting": self.waiting}
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.services.content_encoding import choose_encoding, compress_brotli, compress_gzip
+
+# Форматы, которые имеет смысл сжимать; SSE не трогаем, чтобы не задерживать фрагменты.
+_COMPRESSIBLE_TYPES = ("application/json", "text/plain", "text/html")
+
+
+class APICompressionMiddleware:
+    """
+    ASGI-middleware: gzip/brotli-сжатие ответов /api/v1/* по Accept-Encoding.
+
+    Сжимаются только ответы, отданные одним куском (обычные JSON-ответы), не меньше
+    API_COMPRESSION_MIN_SIZE байт; потоковые ответы (SSE) и уже сжатые проходят как есть.
+    Vary: Accept-Encoding получают все ответы сжимаемых типов, в том числе несжатые.
+    Уровни сжатия невысокие: ответ сжимается на каждый запрос, и важнее CPU, чем
+    последние проценты размера.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        settings = get_settings()
+        self.enabled = settings.api_compression_enabled
+        self.min_size = settings.api_compression_min_size
+        self.gzip_level = settings.api_compression_gzip_level
+        self.brotli_quality = settings.api_compression_brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http" or not scope["path"].startswith("/api/v1/"):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                # Заголовки придержим до первого куска тела: от него зависит, сжимать ли ответ.
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            assert start_message is not None
+            body = message.get("body", b"")
+            headers = MutableHeaders(scope=start_message)
+
+            if message.get("more_body", False) or not self._is_compressible(headers):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            # Представление зависит от Accept-Encoding, даже если именно этот ответ не сжат
+            # (клиент без сжатия или тело меньше порога): иначе общий кэш отдал бы
+            # несжатое тело клиентам, просившим br/gzip.
+            headers.add_vary_header("Accept-Encoding")
+            if encoding == "identity" or len(body) < self.min_size:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _is_compressible(headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        return headers.get("content-type", "").startswith(_COMPRESSIBLE_TYPES)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            compressed = compress_brotli(body, self.brotli_quality)
+            if compressed is not None:
+                return compressed
+        return compress_gzip(body, self.gzip_level)
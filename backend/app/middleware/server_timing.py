@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import get_settings
+from app.services.profiler import SamplingProfiler, finish_profile, try_start_profiler
+from app.services.request_timing import begin_request_timings, format_server_timing
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI-middleware для /api/v1/*: заголовок Server-Timing с длительностями этапов
+    (build_meta_prompt, upstream_call, clean_output, other, total) и, по запросу
+    разрешённых клиентов, сэмплирующее профилирование запроса.
+
+    Этапы, закончившиеся после отправки заголовков (например, upstream_call у SSE-стрима),
+    в Server-Timing не попадают. Профиль включается заголовком X-Profile: 1 от клиента
+    с X-API-Key из PROFILING_API_KEYS (при PROFILING_ENABLED=true); id сохранённого
+    профиля отдаётся в X-Profile-Id.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        settings = get_settings()
+        self.server_timing_enabled = settings.server_timing_enabled
+        self.profiling_enabled = settings.profiling_enabled
+        self.profiling_api_keys = frozenset(settings.profiling_api_keys)
+        self.profiling_interval = settings.profiling_interval_ms / 1000
+        self.profiling_output_dir = settings.profiling_output_dir
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith("/api/v1/"):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self._maybe_start_profiler(scope)
+        if not self.server_timing_enabled and profiler is None:
+            await self.app(scope, receive, send)
+            return
+
+        timings = begin_request_timings()
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if self.server_timing_enabled:
+                    headers.append("Server-Timing", format_server_timing(timings, time.perf_counter() - started))
+                if profiler is not None:
+                    headers.append("X-Profile-Id", profiler.profile_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profiler is not None:
+                # join сэмплера и запись файла блокируют — выполняем их вне event loop.
+                await asyncio.to_thread(finish_profile, profiler, self.profiling_output_dir)
+
+    def _maybe_start_profiler(self, scope: Scope) -> Optional[SamplingProfiler]:
+        if not self.profiling_enabled:
+            return None
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") not in (b"1", b"true"):
+            return None
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        if api_key not in self.profiling_api_keys:
+            return None
+        return try_start_profiler(self.profiling_interval)
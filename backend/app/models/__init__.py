@@ -1 +1,6 @@
-
+# Импортируем все модели, чтобы связи по строковым именам ("User") разрешались,
+# какой бы модуль моделей ни был импортирован первым.
+from app.models.user import User  # noqa: F401
+from app.models.prompt_params import PromptParams  # noqa: F401
+from app.models.prompt_history import PromptHistory  # noqa: F401
+from app.models.enhancement_result import EnhancementResult  # noqa: F401
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class EnhancementResult(Base):
+    """
+    Постоянный (второй уровень) кэш результатов улучшения, общий для всех воркеров и реплик.
+
+    - fingerprint: отпечаток запроса (см. app.services.fingerprint.request_fingerprint), PK
+    - model_name: модель Gemini, которая сгенерировала ответ
+    - enhanced_prompt: уже очищенный улучшенный промпт
+    - created_at: когда запись создана или обновлена
+    - expires_at: после этого момента запись не используется и удаляется фоновой очисткой
+    """
+
+    __tablename__ = "enhancement_results"
+
+    fingerprint: Mapped[str] = mapped_column(
+        String(64),
+        primary_key=True,
+    )
+
+    model_name: Mapped[str] = mapped_column(
+        String(100),
+        nullable=False,
+    )
+
+    enhanced_prompt: Mapped[str] = mapped_column(
+        Text,
+        nullable=False,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default="now()",
+    )
+
+    # Индекс для фоновой очистки просроченных записей (DELETE ... WHERE expires_at < now()).
+    expires_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        index=True,
+    )
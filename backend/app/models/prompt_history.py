@@ -4,11 +4,11 @@ import uuid
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import DateTime, ForeignKey, Index, JSON, String, Text
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import BigInteger, Computed, DateTime, ForeignKey, Index, String, Text
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.db.base import Base
+from app.db.base_class import Base
 
 
 class PromptHistory(Base):
@@ -23,11 +23,19 @@ class PromptHistory(Base):
     - provider: провайдер модели (gemini/openai/anthropic/...); дублируем из ModelMeta
     - input_prompt: исходный промпт пользователя
     - enhanced_prompt: улучшенный промпт, который вернули
-    - params_json: JSON со всеми параметрами EnhancementParams (style, detail, и т.д.)
+    - gemini_model: модель Gemini, сгенерировавшая ответ (NULL, если ответ взят из кэша)
+    - params_id: FK → prompt_params.id — общий набор остальных параметров EnhancementParams
+      (style, detail, и т.д.); полный набор собирает app.services.params_store.expand_params
     - created_at: время создания записи
+    - search_vector: tsvector по input_prompt и enhanced_prompt для полнотекстового поиска
+      (генерируется самой БД, в обычных выборках не загружается)
+
+    Таблица партиционирована по месяцам created_at (см. app.db.partitions), поэтому
+    created_at входит в первичный ключ, а старые данные удаляются целыми партициями.
     """
 
     __tablename__ = "prompt_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id: Mapped[uuid.UUID] = mapped_column(
         UUID(as_uuid=True),
@@ -40,7 +48,6 @@ class PromptHistory(Base):
         UUID(as_uuid=True),
         ForeignKey("users.id", ondelete="SET NULL"),
         nullable=True,
-        index=True,
     )
 
     model_id: Mapped[str] = mapped_column(
@@ -64,10 +71,15 @@ class PromptHistory(Base):
         nullable=False,
     )
 
-    params_json: Mapped[dict] = mapped_column(
-        JSON,
+    gemini_model: Mapped[Optional[str]] = mapped_column(
+        String(100),
+        nullable=True,
+    )
+
+    params_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("prompt_params.id"),
         nullable=False,
-        default=dict,
     )
 
     created_at: Mapped[datetime] = mapped_column(
@@ -75,9 +87,21 @@ class PromptHistory(Base):
         nullable=False,
         default=datetime.utcnow,
         server_default="now()",
+        primary_key=True,
         index=True,
     )
 
+    search_vector: Mapped[Optional[str]] = mapped_column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple'::regconfig, coalesce(input_prompt, '')), 'A') || "
+            "setweight(to_tsvector('simple'::regconfig, coalesce(enhanced_prompt, '')), 'B')",
+            persisted=True,
+        ),
+        nullable=True,
+        deferred=True,
+    )
+
     # Пока односторонняя связь, чтобы не плодить лишнего кода
     user: Mapped["User"] = relationship(
         "User",
@@ -86,9 +110,16 @@ class PromptHistory(Base):
     )
 
 
-# Индекс для частых выборок истории пользователя по дате
+# Индекс для частых выборок истории пользователя по дате (заодно покрывает фильтр по user_id)
 Index(
     "ix_prompt_history_user_created_at",
     PromptHistory.user_id,
     PromptHistory.created_at.desc(),
 )
+
+# GIN-индекс для полнотекстового поиска по истории
+Index(
+    "ix_prompt_history_search_vector",
+    PromptHistory.search_vector,
+    postgresql_using="gin",
+)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Identity, JSON, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class PromptParams(Base):
+    """
+    Уникальный набор параметров улучшения, на который ссылаются строки prompt_history.
+
+    Большинство запросов повторяют одни и те же значения ("Default" стиль, освещение и т.п.),
+    поэтому набор хранится один раз, а история ссылается на него по params_id.
+
+    - id: BIGINT PK
+    - params_hash: sha256 канонической формы params_json (см. app.services.params_store), уникален
+    - params_json: параметры EnhancementParams без initialPrompt и targetAiModel
+      (они уже лежат в prompt_history.input_prompt и model_id)
+    - created_at: когда набор встретился впервые
+    """
+
+    __tablename__ = "prompt_params"
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        Identity(always=False),
+        primary_key=True,
+    )
+
+    params_hash: Mapped[str] = mapped_column(
+        String(64),
+        unique=True,
+        nullable=False,
+    )
+
+    params_json: Mapped[dict] = mapped_column(
+        JSON,
+        nullable=False,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default="now()",
+    )
@@ -1,3 +1,22 @@
-from .enhancement import EnhancementParams, EnhanceRequest, EnhanceResponse
+from .enhancement import (
+    BatchEnhanceItemResult,
+    BatchEnhanceRequest,
+    BatchEnhanceResponse,
+    EnhancementParams,
+    EnhanceRequest,
+    EnhanceResponse,
+)
+from .history import HistoryItem, HistoryPage, HistorySearchItem, HistorySearchPage
 
-__all__ = ["EnhancementParams", "EnhanceRequest", "EnhanceResponse"]
+__all__ = [
+    "BatchEnhanceItemResult",
+    "BatchEnhanceRequest",
+    "BatchEnhanceResponse",
+    "EnhancementParams",
+    "EnhanceRequest",
+    "EnhanceResponse",
+    "HistoryItem",
+    "HistoryPage",
+    "HistorySearchItem",
+    "HistorySearchPage",
+]
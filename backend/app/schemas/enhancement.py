@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import List, Optional
+
+from pydantic import BaseModel, Field
 
 
 class EnhancementParams(BaseModel):
@@ -35,3 +37,28 @@ class EnhanceResponse(BaseModel):
     """Ответ backend'а с улучшенным промптом."""
 
     enhancedPrompt: str
+
+
+class BatchEnhanceRequest(BaseModel):
+    """Тело запроса на пакетное улучшение: список обычных EnhanceRequest."""
+
+    items: List[EnhanceRequest] = Field(min_length=1)
+
+
+class BatchEnhanceItemResult(BaseModel):
+    """Результат одного элемента пакета.
+
+    status повторяет HTTP-статус, который вернул бы /api/v1/enhance для этого элемента
+    (200, 400, 502, ...). При ошибке enhancedPrompt пустой, а detail содержит причину.
+    """
+
+    index: int
+    status: int
+    enhancedPrompt: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class BatchEnhanceResponse(BaseModel):
+    """Ответ на пакетный запрос; results идут в том же порядке, что и items."""
+
+    results: List[BatchEnhanceItemResult]
@@ -0,0 +1,43 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class HistoryItem(BaseModel):
+    """Одна запись истории улучшений (поля в camelCase, как и в остальных схемах API)."""
+
+    id: uuid.UUID
+    modelId: str
+    provider: str
+    inputPrompt: str
+    enhancedPrompt: str
+    createdAt: datetime
+    # Заполняется только при include_params=true: колонка params_json широкая.
+    params: Optional[Dict[str, Any]] = None
+
+
+class HistoryPage(BaseModel):
+    """Страница истории. nextCursor == None означает, что дальше записей нет."""
+
+    items: List[HistoryItem]
+    nextCursor: Optional[str] = None
+
+
+class HistorySearchItem(HistoryItem):
+    """Результат полнотекстового поиска: запись истории, её релевантность и сниппеты.
+
+    В сниппетах найденные слова обёрнуты в <mark>...</mark>.
+    """
+
+    rank: float
+    inputHighlight: str
+    enhancedHighlight: str
+
+
+class HistorySearchPage(BaseModel):
+    """Страница результатов поиска, отсортированных по релевантности."""
+
+    items: List[HistorySearchItem]
+    nextCursor: Optional[str] = None
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import gzip
+from typing import Collection, Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli — необязательная зависимость: без неё доступен только gzip.
+    brotli = None
+
+# Поддерживаемые кодировки в порядке предпочтения при одинаковом q.
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compress_gzip(data: bytes, level: int = 9) -> bytes:
+    # mtime=0: одинаковый вход — побайтно одинаковый выход (стабильные ETag и кэши).
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def compress_brotli(data: bytes, quality: int = 11) -> Optional[bytes]:
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=quality)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding -> {кодировка: q}."""
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, available: Collection[str] = SUPPORTED_ENCODINGS) -> str:
+    """Лучшая из доступных кодировок по Accept-Encoding (br предпочтительнее gzip при равном q)."""
+    if not accept_encoding:
+        return "identity"
+
+    accepted = parse_accept_encoding(accept_encoding)
+    best, best_quality = "identity", 0.0
+    for encoding in ("br", "gzip"):
+        if encoding not in available:
+            continue
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
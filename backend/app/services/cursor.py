@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Dict
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """
+    Упаковывает позицию keyset-пагинации в непрозрачную строку для клиента (base64url от JSON).
+    """
+    raw = json.dumps(position, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Обратная операция к encode_cursor. Некорректный курсор — HTTP 400.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        ) from exc
+
+    if not isinstance(position, dict):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor.",
+        )
+    return position
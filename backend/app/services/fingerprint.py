@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import hashlib
+import json
+
+from app.schemas.enhancement import EnhanceRequest
+
+
+def normalize_request(params: EnhanceRequest) -> EnhanceRequest:
+    """
+    Приводит запрос к каноническому виду: обрезает пробелы по краям всех строковых полей
+    и приводит promptLanguage к нижнему регистру.
+
+    Формы, отличающиеся только «хвостовыми» пробелами, дают один и тот же запрос к Gemini.
+    """
+    data = {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in params.model_dump().items()
+    }
+    data["promptLanguage"] = data["promptLanguage"].lower()
+    return EnhanceRequest(**data)
+
+
+def request_fingerprint(params: EnhanceRequest, meta_prompt: str, model_name: str) -> str:
+    """
+    Канонический отпечаток запроса на улучшение: sha256 от нормализованных параметров,
+    итогового мета-промпта и имени модели Gemini.
+
+    params должен быть уже нормализован через normalize_request.
+    """
+    payload = json.dumps(
+        {
+            "params": params.model_dump(),
+            "meta_prompt": meta_prompt,
+            "model": model_name,
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
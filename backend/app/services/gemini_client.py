@@ -1,17 +1,79 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
-from typing import List, Optional
+import threading
+import zlib
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException, status
-from google import genai
 
 from app.core.config import get_settings
 from app.models_meta import ModelMeta, get_model_meta
 from app.schemas.enhancement import EnhanceRequest
-from app.services.prompt_engine import build_meta_prompt
+from app.services.fingerprint import normalize_request, request_fingerprint
+from app.services.hedging import HedgePolicy, hedged_call
+from app.services.metrics import (
+    PROMPT_INPUT_TOKENS,
+    PROMPT_TOKENS_SAVED,
+    UPSTREAM_ERRORS,
+    UPSTREAM_IN_FLIGHT,
+    observe_stage,
+)
+from app.services.prompt_engine import (
+    build_compact_prompt,
+    build_meta_prompt,
+    build_system_instruction,
+    build_user_prompt,
+)
+from app.services.resilience import (
+    CircuitOpenError,
+    await_within_deadline,
+    call_with_resilience,
+    current_deadline,
+    deadline_exceeded,
+    use_server_deadline,
+)
+from app.services.result_cache import get_result_cache
+from app.services.result_store import get_result_store
+from app.services.similarity_index import get_similarity_index
+from app.services.token_budget import estimate_tokens
+
+if TYPE_CHECKING:
+    # google.genai импортируется ~0.5 с, поэтому в рантайме — только при первом вызове Gemini.
+    from google import genai
+    from google.genai import types
+
+logger = logging.getLogger(__name__)
 
 _client: Optional[genai.Client] = None
+# Клиент могут создавать одновременно фоновый прогрев и поток первого запроса.
+_client_lock = threading.Lock()
+_semaphore: Optional[asyncio.Semaphore] = None
+
+# Идущие прямо сейчас вызовы Gemini: cache_key -> задача с (ответ, модель, см. _generated_by).
+# Дубликаты не делают свой вызов, а дожидаются уже запущенного.
+_inflight: Dict[str, "asyncio.Task[Tuple[str, Optional[str]]]"] = {}
+_single_flight_stats: Dict[str, int] = {"leaders": 0, "coalesced": 0}
+
+_hedge_policy: Optional[HedgePolicy] = None
+
+# Модель Gemini, сгенерировавшая последний ответ в текущем контексте (запросе);
+# None — ответ взят из кэша и модель неизвестна.
+_generated_by: ContextVar[Optional[str]] = ContextVar("gemini_generated_by", default=None)
+
+
+def generated_by() -> Optional[str]:
+    """
+    Какая модель Gemini сгенерировала ответ, только что полученный в этом запросе
+    (enhance_prompt_with_gemini*, стрим после завершения). None — ответ из кэша
+    (in-process, Postgres или индекса почти-дубликатов): его модель неизвестна.
+    """
+    return _generated_by.get()
 
 
 def _get_client() -> genai.Client:
@@ -25,24 +87,45 @@ def _get_client() -> genai.Client:
     if _client is not None:
         return _client
 
-    settings = get_settings()
+    with _client_lock:
+        if _client is not None:
+            return _client
+
+        from google import genai
+        from google.genai import types
 
-    if settings.gemini_api_key:
-        _client = genai.Client(api_key=settings.gemini_api_key)
-    else:
-        _client = genai.Client()
+        settings = get_settings()
+        http_options = types.HttpOptions(base_url=settings.gemini_api_base_url) if settings.gemini_api_base_url else None
+
+        if settings.gemini_api_key:
+            _client = genai.Client(api_key=settings.gemini_api_key, http_options=http_options)
+        else:
+            _client = genai.Client(http_options=http_options)
 
     return _client
 
 
-def _clean_gemini_output(raw_text: str, model_meta: ModelMeta) -> str:
+async def _get_client_async() -> genai.Client:
     """
-    Очистка ответа модели от типичных преамбул (перенос логики из фронтового GeminiService).
+    _get_client для async-кода: первый вызов импортирует google.genai (~0.5 с) в отдельном
+    потоке, не замораживая event loop (и /health) на время импорта. Если клиент в этот
+    момент создаёт фоновый прогрев, поток просто дождётся его на _client_lock.
     """
-    enhanced_prompt_text = raw_text.strip()
+    if _client is not None:
+        return _client
+    return await asyncio.to_thread(_get_client)
+
+
+def warm_up_gemini_client() -> None:
+    """Импортирует google.genai и создаёт клиент заранее, чтобы первый запрос не платил за это."""
+    _get_client()
+
+
+def _common_preambles(model_meta: ModelMeta) -> List[str]:
+    """Типичные преамбулы, которыми модель любит начинать ответ (в нижнем регистре)."""
     target_label = model_meta.label or model_meta.id
 
-    common_preambles: List[str] = [
+    return [
         f"enhanced prompt for {target_label}".lower(),
         "enhanced prompt:",
         "here is the enhanced prompt:",
@@ -50,6 +133,14 @@ def _clean_gemini_output(raw_text: str, model_meta: ModelMeta) -> str:
         "prompt:",
     ]
 
+
+def _clean_gemini_output(raw_text: str, model_meta: ModelMeta) -> str:
+    """
+    Очистка ответа модели от типичных преамбул (перенос логики из фронтового GeminiService).
+    """
+    enhanced_prompt_text = raw_text.strip()
+    common_preambles = _common_preambles(model_meta)
+
     final_prompt = enhanced_prompt_text
     for preamble in common_preambles:
         if final_prompt.lower().startswith(preamble):
@@ -78,12 +169,83 @@ def _clean_gemini_output(raw_text: str, model_meta: ModelMeta) -> str:
     return final_prompt.strip()
 
 
-def enhance_prompt_with_gemini(params: EnhanceRequest) -> str:
+class StreamingOutputCleaner:
     """
-    Вызывает Gemini через Google Gen AI SDK и возвращает очищенный улучшенный промпт.
+    Потоковый аналог _clean_gemini_output.
+
+    Буферизует только начало ответа — до первого перевода строки или max_head_chars
+    символов, — чтобы решить, есть ли там преамбула. После этого фрагменты
+    пропускаются сразу, удерживаются лишь хвостовые пробельные символы
+    (как .strip() у полного ответа).
+
+    Использование: для каждого фрагмента вызвать feed(), в конце — finish();
+    непустые возвращённые строки можно сразу отдавать клиенту.
     """
-    settings = get_settings()
 
+    def __init__(self, model_meta: ModelMeta, max_head_chars: int = 256) -> None:
+        self._preambles = _common_preambles(model_meta)
+        self._max_head_chars = max_head_chars
+        self._head = ""
+        self._decided = False
+        self._dropped_line: Optional[str] = None
+        self._pending_whitespace = ""
+        self._emitted_any = False
+
+    def feed(self, chunk: str) -> str:
+        if self._decided:
+            return self._emit(chunk)
+
+        self._head += chunk
+        head = self._head.lstrip()
+        if "\n" in head or len(head) >= self._max_head_chars:
+            return self._decide()
+        return ""
+
+    def finish(self) -> str:
+        output = self._decide() if not self._decided else ""
+        if not self._emitted_any and self._dropped_line:
+            # После преамбулы ничего не пришло — ответ был однострочным,
+            # и _clean_gemini_output срезал бы только префикс.
+            output += self._emit(self._strip_prefix(self._dropped_line))
+        return output
+
+    def _decide(self) -> str:
+        self._decided = True
+        head = self._head.lstrip()
+        self._head = ""
+
+        if "\n" in head:
+            first_line, rest = head.split("\n", 1)
+            first_line_lower = first_line.lower()
+            if any(preamble.rstrip(":") in first_line_lower for preamble in self._preambles):
+                self._dropped_line = first_line.strip()
+                return self._emit(rest)
+
+        return self._emit(self._strip_prefix(head))
+
+    def _strip_prefix(self, text: str) -> str:
+        text_lower = text.lower()
+        for preamble in self._preambles:
+            if text_lower.startswith(preamble):
+                return text[len(preamble) :]
+        return text
+
+    def _emit(self, text: str) -> str:
+        if not self._emitted_any:
+            text = text.lstrip()
+
+        combined = self._pending_whitespace + text
+        stripped = combined.rstrip()
+        self._pending_whitespace = combined[len(stripped) :]
+        if stripped:
+            self._emitted_any = True
+        return stripped
+
+
+def _resolve_model_meta(params: EnhanceRequest) -> ModelMeta:
+    """
+    Проверяет, что целевая модель есть в реестре и её провайдер поддерживается backend'ом.
+    """
     model_meta = get_model_meta(params.targetAiModel)
     if model_meta is None:
         raise HTTPException(
@@ -100,6 +262,12 @@ def enhance_prompt_with_gemini(params: EnhanceRequest) -> str:
             ),
         )
 
+    return model_meta
+
+
+def _ensure_api_key_configured() -> None:
+    settings = get_settings()
+
     if not (
         settings.gemini_api_key
         or os.getenv("GEMINI_API_KEY")
@@ -110,32 +278,582 @@ def enhance_prompt_with_gemini(params: EnhanceRequest) -> str:
             detail="Gemini API key is not configured. Set GEMINI_API_KEY or GOOGLE_API_KEY.",
         )
 
-    client = _get_client()
-    meta_prompt = build_meta_prompt(params, model_meta)
 
+def _extract_text(response: Any) -> str:
+    """
+    Достаёт текст из ответа SDK и проверяет, что он не пустой.
+    """
     try:
-        response = client.models.generate_content(
-            model=settings.gemini_model_name,
-            contents=meta_prompt,
-        )
+        raw_text = response.text
     except Exception as exc:
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Failed to call Gemini API: {exc}",
+            detail=f"Unexpected Gemini response format: {exc}",
         ) from exc
 
+    if not raw_text or not raw_text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Gemini API returned empty response.",
+        )
+
+    return raw_text
+
+
+@dataclass(frozen=True)
+class PreparedPrompt:
+    """
+    Что именно уходит в Gemini.
+
+    system_instruction — статическая часть (None, если весь мета-промпт идёт одним
+    сообщением), contents — сообщение пользователя.
+    """
+
+    system_instruction: Optional[str]
+    contents: str
+    # "verbose" или "compact" (см. GEMINI_PROMPT_MODE).
+    mode: str = "verbose"
+
+    @property
+    def estimated_tokens(self) -> int:
+        return estimate_tokens(self.system_instruction or "") + estimate_tokens(self.contents)
+
+    @property
+    def fingerprint_text(self) -> str:
+        if self.system_instruction is None:
+            return self.contents
+        return f"{self.system_instruction}\n\n{self.contents}"
+
+
+def _prompt_mode(params: EnhanceRequest) -> str:
+    """
+    Режим мета-промпта для запроса: GEMINI_PROMPT_MODE, а в режиме "ab" — compact
+    для доли GEMINI_PROMPT_AB_COMPACT_SHARE запросов. Выбор детерминирован по содержимому
+    запроса, поэтому одинаковые запросы всегда попадают в одну группу (и в один ключ кэша).
+    """
+    settings = get_settings()
+    if settings.gemini_prompt_mode != "ab":
+        return settings.gemini_prompt_mode
+
+    bucket = zlib.crc32(params.model_dump_json().encode("utf-8")) % 10000
+    return "compact" if bucket < settings.gemini_prompt_ab_compact_share * 10000 else "verbose"
+
+
+def _build_verbose_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> PreparedPrompt:
+    if get_settings().gemini_system_instruction_enabled:
+        return PreparedPrompt(
+            system_instruction=build_system_instruction(model_meta, params.promptLanguage),
+            contents=build_user_prompt(params, model_meta),
+        )
+    return PreparedPrompt(system_instruction=None, contents=build_meta_prompt(params, model_meta))
+
+
+def _build_prompt(params: EnhanceRequest, model_meta: ModelMeta, *, record: bool = True) -> PreparedPrompt:
+    """
+    Мета-промпт в режиме _prompt_mode. record=True пишет оценку входных токенов в метрики,
+    а для компактного режима — ещё и сколько токенов сэкономлено относительно подробного
+    (для сравнения режимов в A/B).
+    """
+    settings = get_settings()
+    mode = _prompt_mode(params)
+    if mode != "compact":
+        prompt = _build_verbose_prompt(params, model_meta)
+        if record:
+            PROMPT_INPUT_TOKENS.labels("verbose").observe(prompt.estimated_tokens)
+        return prompt
+
+    system_instruction, contents = build_compact_prompt(
+        params,
+        model_meta,
+        use_system_instruction=settings.gemini_system_instruction_enabled,
+        token_budget=settings.gemini_prompt_token_budget,
+    )
+    prompt = PreparedPrompt(system_instruction=system_instruction, contents=contents, mode="compact")
+    if record:
+        verbose_tokens = _build_verbose_prompt(params, model_meta).estimated_tokens
+        saved = max(0, verbose_tokens - prompt.estimated_tokens)
+        PROMPT_INPUT_TOKENS.labels("compact").observe(prompt.estimated_tokens)
+        PROMPT_TOKENS_SAVED.inc(saved)
+        logger.info(
+            "Compact meta-prompt for %s: ~%d input tokens instead of ~%d (saved ~%d)",
+            model_meta.id,
+            prompt.estimated_tokens,
+            verbose_tokens,
+            saved,
+        )
+    return prompt
+
+
+def _prepare_call(params: EnhanceRequest, *, record: bool = True) -> Tuple[ModelMeta, PreparedPrompt, str]:
+    """
+    Общая подготовка вызова: валидация модели, построение промпта
+    и вычисление ключа кэша по нормализованному запросу.
+
+    Возвращает (model_meta, prompt, cache_key). record=False — без метрик и логов
+    (ключ кэша считается не для реального запроса, а, например, при прогреве).
+    """
+    settings = get_settings()
+
+    params = normalize_request(params)
+    model_meta = _resolve_model_meta(params)
+    with observe_stage("build_meta_prompt", model_meta.id):
+        prompt = _build_prompt(params, model_meta, record=record)
+    cache_key = request_fingerprint(params, prompt.fingerprint_text, settings.gemini_model_name)
+    return model_meta, prompt, cache_key
+
+
+def request_cache_key(params: EnhanceRequest) -> str:
+    """
+    Отпечаток запроса, под которым его результат лежит в кэшах (in-process и enhancement_results).
+
+    Бросает HTTPException, если целевая модель неизвестна или не поддерживается.
+    """
+    return _prepare_call(params, record=False)[2]
+
+
+def _generation_config(prompt: PreparedPrompt) -> Optional[types.GenerateContentConfig]:
+    if prompt.system_instruction is None:
+        return None
+    from google.genai import types
+
+    return types.GenerateContentConfig(system_instruction=prompt.system_instruction)
+
+
+def _upstream_error_type(exc: BaseException) -> str:
+    """Короткая метка типа ошибки upstream для метрик."""
+    if isinstance(exc, HTTPException):
+        # 503 бывает не только от circuit breaker (см. _upstream_slot), поэтому смотрим на причину.
+        if isinstance(exc.__cause__, CircuitOpenError):
+            return "circuit_open"
+        if exc.status_code == status.HTTP_504_GATEWAY_TIMEOUT:
+            return "deadline_exceeded"
+        return f"http_{exc.status_code}"
+    from google.genai import errors as genai_errors
+
+    if isinstance(exc, genai_errors.APIError):
+        return f"api_{exc.code}"
+    return type(exc).__name__
+
+
+def _lookup_stored_result(params: EnhanceRequest, cache_key: str) -> Optional[str]:
+    """
+    Ищет готовый ответ без вызова Gemini: сначала точное совпадение в кэше результатов,
+    затем почти-дубликат в индексе похожих промптов (если он включён).
+    """
+    cached = get_result_cache().get(cache_key)
+    if cached is not None:
+        return cached
+
+    similarity_index = get_similarity_index()
+    if similarity_index is not None:
+        return similarity_index.lookup(params)
+    return None
+
+
+async def _lookup_result_store(cache_key: str) -> Optional[str]:
+    """
+    Ищет ответ в общем хранилище результатов (Postgres). Попадание заодно кладётся
+    в in-process кэш, чтобы повторные запросы в этот процесс не ходили в базу.
+    """
+    store = get_result_store()
+    if store is None:
+        return None
+
+    stored = await store.get(cache_key)
+    if stored is not None:
+        get_result_cache().set(cache_key, stored)
+    return stored
+
+
+def _store_result(params: EnhanceRequest, cache_key: str, enhanced: str, model_name: str) -> None:
+    """
+    Кэширует свежий ответ; model_name — модель, которая его реально сгенерировала.
+
+    Отпечаток запроса включает GEMINI_MODEL_NAME, поэтому ответ другой модели (запасной,
+    выигравшей хедж) отдаётся клиенту, но не кэшируется: иначе он выдавался бы
+    за ответ основной модели до истечения TTL.
+    """
+    if model_name != get_settings().gemini_model_name:
+        return
+
+    get_result_cache().set(cache_key, enhanced)
+
+    store = get_result_store()
+    if store is not None:
+        store.put(cache_key, model_name, enhanced)
+
+    similarity_index = get_similarity_index()
+    if similarity_index is not None:
+        similarity_index.add(params, enhanced)
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """
+    Возвращает семафор, ограничивающий число одновременных вызовов Gemini в процессе.
+
+    Создаётся лениво, чтобы размер брался из актуальных Settings.
+    """
+    global _semaphore
+
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(get_settings().gemini_max_concurrency)
+
+    return _semaphore
+
+
+@asynccontextmanager
+async def _upstream_slot(target_model: str) -> AsyncIterator[None]:
+    """
+    Занимает слот в семафоре на время вызова Gemini.
+
+    Если слот не освободился за GEMINI_QUEUE_TIMEOUT_SECONDS, отвечаем 503,
+    а не копим бесконечную очередь ожидающих корутин. Ожидание в очереди
+    также ограничено дедлайном запроса (тогда — 504). В метриках такой 503
+    считается как queue_timeout, а не circuit_open.
+    """
+    settings = get_settings()
+    semaphore = _get_semaphore()
+    deadline = current_deadline()
+
     try:
-        raw_text = response.text
+        await asyncio.wait_for(
+            semaphore.acquire(),
+            timeout=min(settings.gemini_queue_timeout_seconds, deadline.remaining()),
+        )
+    except asyncio.TimeoutError as exc:
+        if deadline.expired():
+            UPSTREAM_ERRORS.labels("deadline_exceeded", target_model).inc()
+            raise deadline_exceeded() from exc
+        UPSTREAM_ERRORS.labels("queue_timeout", target_model).inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent Gemini requests, please retry later.",
+        ) from exc
+
+    try:
+        yield
+    finally:
+        semaphore.release()
+
+
+async def _single_flight(
+    key: str,
+    call: Callable[[], Awaitable[Tuple[str, Optional[str]]]],
+) -> Tuple[str, Optional[str]]:
+    """
+    Объединяет одновременные одинаковые вызовы: первый запрос запускает call(),
+    остальные с тем же ключом ждут ту же задачу и получают тот же результат или ту же ошибку.
+
+    Вызов выполняется в отдельной задаче, поэтому отмена одного из ожидающих
+    (например, клиент закрыл соединение) не отменяет запрос для остальных.
+    Задача работает с серверным дедлайном, а не с дедлайном первого запроса:
+    свой дедлайн каждый ожидающий соблюдает сам (см. await_within_deadline).
+    """
+    task = _inflight.get(key)
+    if task is not None:
+        _single_flight_stats["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    async def shared_call() -> Tuple[str, Optional[str]]:
+        # Меняется только контекст задачи: дедлайн запроса-лидера остаётся прежним.
+        use_server_deadline()
+        return await call()
+
+    task = asyncio.ensure_future(shared_call())
+    _inflight[key] = task
+    _single_flight_stats["leaders"] += 1
+
+    def _on_done(finished: "asyncio.Task[Tuple[str, Optional[str]]]") -> None:
+        if _inflight.get(key) is finished:
+            del _inflight[key]
+        # Помечаем исключение как полученное, даже если все ожидающие уже отменены.
+        if not finished.cancelled():
+            finished.exception()
+
+    task.add_done_callback(_on_done)
+    return await asyncio.shield(task)
+
+
+def get_single_flight_stats() -> Dict[str, int]:
+    """Сколько вызовов реально ушло в Gemini и сколько дубликатов к ним присоединилось."""
+    return {**_single_flight_stats, "inflight": len(_inflight)}
+
+
+def enhance_prompt_with_gemini(params: EnhanceRequest, *, use_cache: bool = True) -> str:
+    """
+    Вызывает Gemini через Google Gen AI SDK и возвращает очищенный улучшенный промпт.
+
+    Синхронный вариант: блокирует поток на всё время вызова. Внутри async-эндпоинтов
+    используйте enhance_prompt_with_gemini_async.
+
+    use_cache=False пропускает поиск в кэше результатов, но свежий ответ всё равно
+    попадает в кэш.
+    """
+    settings = get_settings()
+
+    model_meta, prompt, cache_key = _prepare_call(params)
+    if use_cache:
+        cached = _lookup_stored_result(params, cache_key)
+        if cached is not None:
+            _generated_by.set(None)
+            return cached
+
+    _ensure_api_key_configured()
+    client = _get_client()
+
+    try:
+        with observe_stage("upstream_call", model_meta.id):
+            response = client.models.generate_content(
+                model=settings.gemini_model_name,
+                contents=prompt.contents,
+                config=_generation_config(prompt),
+            )
     except Exception as exc:
+        UPSTREAM_ERRORS.labels(_upstream_error_type(exc), model_meta.id).inc()
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
-            detail=f"Unexpected Gemini response format: {exc}",
+            detail=f"Failed to call Gemini API: {exc}",
         ) from exc
 
-    if not raw_text or not raw_text.strip():
+    with observe_stage("clean_output", model_meta.id):
+        enhanced = _clean_gemini_output(_extract_text(response), model_meta)
+    _store_result(params, cache_key, enhanced, settings.gemini_model_name)
+    _generated_by.set(settings.gemini_model_name)
+    return enhanced
+
+
+def get_hedge_policy() -> Optional[HedgePolicy]:
+    """
+    Политика хеджирования из Settings или None, если хеджирование выключено.
+    """
+    global _hedge_policy
+
+    settings = get_settings()
+    if not settings.gemini_hedge_enabled:
+        return None
+
+    if _hedge_policy is None:
+        _hedge_policy = HedgePolicy(
+            percentile=settings.gemini_hedge_percentile,
+            initial_delay=settings.gemini_hedge_initial_delay_seconds,
+            max_rate=settings.gemini_hedge_max_rate,
+        )
+    return _hedge_policy
+
+
+async def _generate_async(client: genai.Client, prompt: PreparedPrompt, model_name: str) -> Tuple[str, Any]:
+    """(модель, ответ): при хеджировании ответить может и запасная модель."""
+    response = await client.aio.models.generate_content(
+        model=model_name,
+        contents=prompt.contents,
+        config=_generation_config(prompt),
+    )
+    return model_name, response
+
+
+async def _call_gemini_async(
+    params: EnhanceRequest,
+    model_meta: ModelMeta,
+    prompt: PreparedPrompt,
+    cache_key: str,
+) -> Tuple[str, str]:
+    """
+    Один реальный вызов Gemini: слот семафора, запрос, очистка ответа, запись в кэш.
+    Возвращает (ответ, модель, которая его сгенерировала).
+
+    При включённом хеджировании медленный основной вызов дублируется вторым запросом
+    (в GEMINI_FALLBACK_MODEL_NAME, если задана); берётся первый успешный ответ.
+    Временные ошибки повторяются в пределах дедлайна запроса, см. call_with_resilience.
+    """
+    settings = get_settings()
+    client = await _get_client_async()
+    primary_model = settings.gemini_model_name
+    hedge_model = settings.gemini_fallback_model_name or primary_model
+    hedge_policy = get_hedge_policy()
+
+    async def attempt() -> Tuple[str, Any]:
+        if hedge_policy is None:
+            return await _generate_async(client, prompt, primary_model)
+        return await hedged_call(
+            lambda: _generate_async(client, prompt, primary_model),
+            lambda: _generate_async(client, prompt, hedge_model),
+            hedge_policy,
+        )
+
+    async with _upstream_slot(model_meta.id):
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            with observe_stage("upstream_call", model_meta.id):
+                model_name, response = await call_with_resilience(attempt, current_deadline())
+        except HTTPException as exc:
+            UPSTREAM_ERRORS.labels(_upstream_error_type(exc), model_meta.id).inc()
+            raise
+        except Exception as exc:
+            UPSTREAM_ERRORS.labels(_upstream_error_type(exc), model_meta.id).inc()
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Failed to call Gemini API: {exc}",
+            ) from exc
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+
+    with observe_stage("clean_output", model_meta.id):
+        enhanced = _clean_gemini_output(_extract_text(response), model_meta)
+    _store_result(params, cache_key, enhanced, model_name)
+    return enhanced, model_name
+
+
+async def _fetch_or_call_gemini_async(
+    params: EnhanceRequest,
+    model_meta: ModelMeta,
+    prompt: PreparedPrompt,
+    cache_key: str,
+    use_cache: bool,
+) -> Tuple[str, Optional[str]]:
+    """
+    Работа лидера single-flight: сначала общее хранилище результатов, затем Gemini.
+    Возвращает (ответ, модель Gemini или None для ответа из хранилища).
+
+    Поиск в Postgres идёт до захвата слота семафора и один раз на группу одинаковых запросов.
+    """
+    if use_cache:
+        stored = await _lookup_result_store(cache_key)
+        if stored is not None:
+            return stored, None
+
+    return await _call_gemini_async(params, model_meta, prompt, cache_key)
+
+
+async def enhance_prompt_with_gemini_async(
+    params: EnhanceRequest,
+    *,
+    use_cache: bool = True,
+) -> str:
+    """
+    Асинхронный аналог enhance_prompt_with_gemini.
+
+    Использует async-клиент SDK (client.aio), поэтому не блокирует event loop,
+    а число одновременных вызовов ограничено семафором (GEMINI_MAX_CONCURRENCY).
+    Попадания в кэш результатов (и в индекс почти-дубликатов) обслуживаются без захвата
+    семафора, а одновременные одинаковые запросы объединяются в один вызов Gemini.
+    При промахе in-process кэша проверяется общее хранилище результатов в Postgres
+    (RESULT_STORE_ENABLED). Модель, сгенерировавшая ответ, доступна через generated_by().
+    """
+    model_meta, prompt, cache_key = _prepare_call(params)
+    if use_cache:
+        cached = _lookup_stored_result(params, cache_key)
+        if cached is not None:
+            _generated_by.set(None)
+            return cached
+
+    _ensure_api_key_configured()
+
+    # Каждый ожидающий ограничен своим дедлайном, даже если присоединился к чужому вызову;
+    # сам общий вызов идёт с серверным дедлайном (см. _single_flight).
+    enhanced, model_name = await await_within_deadline(
+        _single_flight(
+            cache_key,
+            lambda: _fetch_or_call_gemini_async(params, model_meta, prompt, cache_key, use_cache),
+        ),
+        current_deadline(),
+    )
+    _generated_by.set(model_name)
+    return enhanced
+
+
+def open_enhancement_stream(
+    params: EnhanceRequest,
+    *,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    """
+    Готовит потоковое улучшение промпта и возвращает асинхронный итератор фрагментов
+    уже очищенного текста.
+
+    Валидация (модель, провайдер, ключ API) выполняется сразу, до начала ответа,
+    поэтому её ошибки остаются обычными HTTP 400/500. Ошибки самого вызова Gemini
+    возникают уже во время итерации (HTTPException 502/503).
+    """
+    model_meta, prompt, cache_key = _prepare_call(params)
+    if use_cache:
+        cached = _lookup_stored_result(params, cache_key)
+        if cached is not None:
+            return _iterate_cached(cached)
+
+    _ensure_api_key_configured()
+
+    return _stream_gemini(params, model_meta, prompt, cache_key, use_cache=use_cache)
+
+
+async def _iterate_cached(text: str) -> AsyncIterator[str]:
+    _generated_by.set(None)
+    yield text
+
+
+async def _stream_gemini(
+    params: EnhanceRequest,
+    model_meta: ModelMeta,
+    prompt: PreparedPrompt,
+    cache_key: str,
+    *,
+    use_cache: bool = True,
+) -> AsyncIterator[str]:
+    if use_cache:
+        # Найденный в Postgres ответ отдаём одним фрагментом, как и попадание в in-process кэш.
+        stored = await _lookup_result_store(cache_key)
+        if stored is not None:
+            _generated_by.set(None)
+            yield stored
+            return
+
+    settings = get_settings()
+    client = await _get_client_async()
+    cleaner = StreamingOutputCleaner(model_meta)
+    raw_parts: List[str] = []
+
+    async def open_stream() -> AsyncIterator[Any]:
+        return await client.aio.models.generate_content_stream(
+            model=settings.gemini_model_name,
+            contents=prompt.contents,
+            config=_generation_config(prompt),
+        )
+
+    async with _upstream_slot(model_meta.id):
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            # Для стрима upstream_call — полное время генерации, включая отдачу фрагментов.
+            with observe_stage("upstream_call", model_meta.id):
+                # Повторы и circuit breaker применяются только к открытию стрима:
+                # после первого фрагмента повторять уже нельзя.
+                stream = await call_with_resilience(open_stream, current_deadline())
+                async for response in stream:
+                    piece = response.text or ""
+                    raw_parts.append(piece)
+                    cleaned = cleaner.feed(piece)
+                    if cleaned:
+                        yield cleaned
+        except HTTPException as exc:
+            UPSTREAM_ERRORS.labels(_upstream_error_type(exc), model_meta.id).inc()
+            raise
+        except Exception as exc:
+            UPSTREAM_ERRORS.labels(_upstream_error_type(exc), model_meta.id).inc()
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail=f"Failed to call Gemini API: {exc}",
+            ) from exc
+        finally:
+            UPSTREAM_IN_FLIGHT.dec()
+
+    tail = cleaner.finish()
+    if tail:
+        yield tail
+
+    raw_text = "".join(raw_parts)
+    if not raw_text.strip():
         raise HTTPException(
             status_code=status.HTTP_502_BAD_GATEWAY,
             detail="Gemini API returned empty response.",
         )
 
-    return _clean_gemini_output(raw_text, model_meta)
+    _store_result(params, cache_key, _clean_gemini_output(raw_text, model_meta), settings.gemini_model_name)
+    _generated_by.set(settings.gemini_model_name)
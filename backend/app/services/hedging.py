@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """
+    Скользящее окно последних латентностей успешных вызовов и перцентиль по нему.
+    """
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Когда и сколько хеджировать.
+
+    Задержка хеджа — заданный перцентиль латентности основного вызова (пока данных
+    меньше min_samples — initial_delay). Бюджет — token bucket: каждый запрос добавляет
+    max_rate токена (но не больше burst), каждый хедж тратит один. Так доля
+    хеджированных запросов в среднем не превышает max_rate.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        initial_delay: float,
+        max_rate: float,
+        burst: float = 10.0,
+        min_samples: int = 20,
+    ) -> None:
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.max_rate = max_rate
+        self.burst = burst
+        self.min_samples = min_samples
+        self.latency = LatencyTracker()
+        self.stats: Dict[str, int] = {"requests": 0, "hedged": 0, "hedge_wins": 0, "budget_exhausted": 0}
+        self._tokens = burst
+
+    def delay(self) -> float:
+        if len(self.latency) < self.min_samples:
+            return self.initial_delay
+        value = self.latency.percentile(self.percentile)
+        return self.initial_delay if value is None else value
+
+    def on_request(self) -> None:
+        self.stats["requests"] += 1
+        self._tokens = min(self.burst, self._tokens + self.max_rate)
+
+    def try_spend(self) -> bool:
+        if self._tokens < 1.0:
+            self.stats["budget_exhausted"] += 1
+            return False
+        self._tokens -= 1.0
+        self.stats["hedged"] += 1
+        return True
+
+    def snapshot(self) -> Dict[str, float]:
+        requests = self.stats["requests"]
+        return {
+            **self.stats,
+            "hedge_rate": round(self.stats["hedged"] / requests, 4) if requests else 0.0,
+            "current_delay_seconds": round(self.delay(), 4),
+        }
+
+
+async def _cancel(task: "asyncio.Task[T]") -> None:
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[T]],
+    hedge: Callable[[], Awaitable[T]],
+    policy: HedgePolicy,
+) -> T:
+    """
+    Запускает primary(); если он не ответил за policy.delay() и бюджет позволяет,
+    параллельно запускает hedge(). Возвращается первый успешный результат, второй
+    вызов отменяется. Если упали оба — пробрасывается ошибка основного вызова.
+    """
+    policy.on_request()
+    started = time.perf_counter()
+    primary_task = asyncio.ensure_future(primary())
+
+    try:
+        done, _ = await asyncio.wait({primary_task}, timeout=policy.delay())
+        if done or not policy.try_spend():
+            result = await primary_task
+            policy.latency.observe(time.perf_counter() - started)
+            return result
+
+        hedge_task = asyncio.ensure_future(hedge())
+        pending = {primary_task, hedge_task}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge_task:
+                            policy.stats["hedge_wins"] += 1
+                        # Проигравший основной вызов отменяется, и его латентность неизвестна;
+                        # время до победы хеджа — нижняя граница для неё. Без этого медленные
+                        # вызовы выпадали бы из окна, перцентиль занижался бы, и хеджей
+                        # становилось бы всё больше.
+                        policy.latency.observe(time.perf_counter() - started)
+                        return task.result()
+            # Оба вызова завершились ошибкой.
+            return primary_task.result()
+        finally:
+            for task in pending:
+                await _cancel(task)
+    finally:
+        if not primary_task.done():
+            await _cancel(primary_task)
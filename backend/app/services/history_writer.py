@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import get_settings
+from app.models_meta import get_model_meta
+from app.schemas.enhancement import EnhanceRequest
+from app.services.metrics import HISTORY_FLUSH_LATENCY
+from app.services.params_store import get_params_interner, hash_params, resolve_params_ids, split_params
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """
+    Write-behind буфер для prompt_history.
+
+    Эндпоинты только кладут строку в память (record), а фоновая задача пачками
+    вставляет накопленное в БД (через async-engine): как только набралось batch_size строк или прошло
+    flush_interval секунд. Буфер ограничен max_buffer строками — при переполнении
+    новые записи отбрасываются (и считаются в dropped), а не тормозят запросы.
+    """
+
+    def __init__(self, max_buffer: int, batch_size: int, flush_interval: float) -> None:
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats: Dict[str, int] = {"recorded": 0, "written": 0, "dropped": 0, "failed": 0}
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stopping = False
+
+    def record(self, row: Dict[str, Any]) -> bool:
+        """
+        Кладёт строку в буфер, не дожидаясь БД. Возвращает False, если строка отброшена.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            self.stats["dropped"] += 1
+            return False
+
+        self._buffer.append(row)
+        self.stats["recorded"] += 1
+        if len(self._buffer) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="history-writer")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу, предварительно сбросив в БД всё накопленное."""
+        if self._task is None:
+            return
+
+        self._stopping = True
+        assert self._wakeup is not None
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._buffer:
+                await self._flush_batch()
+                if len(self._buffer) < self.batch_size and not self._stopping:
+                    break
+
+            if self._stopping and not self._buffer:
+                return
+
+    async def _flush_batch(self) -> None:
+        rows: List[Dict[str, Any]] = []
+        while self._buffer and len(rows) < self.batch_size:
+            rows.append(self._buffer.popleft())
+
+        try:
+            with HISTORY_FLUSH_LATENCY.time():
+                await _insert_rows(rows)
+        except Exception:
+            # История — вспомогательные данные: при сбое БД теряем пачку, но не копим её бесконечно.
+            self.stats["failed"] += len(rows)
+            logger.exception("Failed to write %d prompt_history rows", len(rows))
+            return
+
+        self.stats["written"] += len(rows)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "buffered": len(self._buffer)}
+
+
+async def _insert_rows(rows: List[Dict[str, Any]]) -> None:
+    """
+    Одна multi-row вставка пачки строк в prompt_history через AsyncSession.
+
+    Наборы параметров предварительно заменяются ссылками на prompt_params
+    (в той же транзакции); новые id попадают в кэш только после коммита.
+    """
+    from sqlalchemy import insert
+
+    from app.db.session import get_async_session_factory
+    from app.models.prompt_history import PromptHistory
+
+    async with get_async_session_factory()() as session:
+        hashes = [hash_params(row["params"]) for row in rows]
+        ids, new_ids = await resolve_params_ids(
+            session, {params_hash: row["params"] for params_hash, row in zip(hashes, rows)}
+        )
+        history_rows = [
+            {**{key: value for key, value in row.items() if key != "params"}, "params_id": ids[params_hash]}
+            for params_hash, row in zip(hashes, rows)
+        ]
+        await session.execute(insert(PromptHistory.__table__), history_rows)
+        await session.commit()
+
+    get_params_interner().remember(new_ids)
+
+
+def build_history_row(
+    params: EnhanceRequest,
+    enhanced_prompt: str,
+    gemini_model: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Строка prompt_history для одного успешного улучшения."""
+    model_meta = get_model_meta(params.targetAiModel)
+
+    return {
+        "id": uuid.uuid4(),
+        "user_id": None,
+        "model_id": params.targetAiModel,
+        "provider": model_meta.provider if model_meta else "unknown",
+        "input_prompt": params.initialPrompt,
+        "enhanced_prompt": enhanced_prompt,
+        "gemini_model": gemini_model,
+        # Заменяется на params_id при записи (см. _insert_rows).
+        "params": split_params(params.model_dump()),
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+async def maintain_history_partitions() -> None:
+    """
+    Фоновая задача: при старте и затем раз в HISTORY_PARTITION_MAINTENANCE_INTERVAL_SECONDS
+    создаёт партиции prompt_history на ближайшие месяцы, чтобы вставки не попадали
+    в партицию по умолчанию. CREATE TABLE IF NOT EXISTS-семантика делает запуск
+    на нескольких репликах безопасным. Ошибки только логируются.
+    """
+    from app.db.partitions import ensure_partitions
+    from app.db.session import get_async_engine
+
+    settings = get_settings()
+    while True:
+        try:
+            async with get_async_engine().begin() as connection:
+                created = await connection.run_sync(ensure_partitions, settings.history_partitions_ahead_months)
+            if created:
+                logger.info("Created prompt_history partitions: %s", ", ".join(created))
+        except Exception:
+            logger.exception("Failed to maintain prompt_history partitions")
+
+        await asyncio.sleep(settings.history_partition_maintenance_interval_seconds)
+
+
+_history_writer: Optional[HistoryWriter] = None
+
+
+def get_history_writer() -> HistoryWriter:
+    """Возвращает singleton HistoryWriter, настроенный из Settings."""
+    global _history_writer
+
+    if _history_writer is None:
+        settings = get_settings()
+        _history_writer = HistoryWriter(
+            max_buffer=settings.history_buffer_max_rows,
+            batch_size=settings.history_flush_batch_size,
+            flush_interval=settings.history_flush_interval_seconds,
+        )
+
+    return _history_writer
+
+
+def record_enhancement(params: EnhanceRequest, enhanced_prompt: str, gemini_model: Optional[str] = None) -> None:
+    """
+    Ставит успешное улучшение в очередь на запись в историю.
+
+    gemini_model — модель, сгенерировавшая ответ (gemini_client.generated_by());
+    None для ответов из кэша.
+
+    Ничего не делает, если история выключена (HISTORY_ENABLED=false).
+    """
+    if not get_settings().history_enabled:
+        return
+
+    get_history_writer().record(build_history_row(params, enhanced_prompt, gemini_model))
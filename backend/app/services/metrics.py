@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from app.services.request_timing import record_stage
+
+# Отдельный реестр, чтобы /metrics содержал только метрики приложения
+# и их можно было безопасно пересоздавать в тестах/бенчмарках.
+REGISTRY = CollectorRegistry()
+
+# Бакеты под наш диапазон: от микросекунд (кэш, очистка) до десятков секунд (Gemini).
+_LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route template, method and status.",
+    ["route", "method", "status"],
+    registry=REGISTRY,
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status.",
+    ["route", "method", "status"],
+    buckets=_LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being processed.",
+    registry=REGISTRY,
+)
+
+STAGE_LATENCY = Histogram(
+    "enhance_stage_duration_seconds",
+    "Duration of enhancement pipeline stages "
+    "(build_meta_prompt, upstream_call, clean_output) by target AI model.",
+    ["stage", "target_model"],
+    buckets=_LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "gemini_upstream_in_flight",
+    "Gemini calls currently in progress.",
+    registry=REGISTRY,
+)
+UPSTREAM_ERRORS = Counter(
+    "gemini_upstream_errors_total",
+    "Failed Gemini calls by error type and target AI model.",
+    ["error_type", "target_model"],
+    registry=REGISTRY,
+)
+PROMPT_INPUT_TOKENS = Histogram(
+    "gemini_prompt_input_tokens",
+    "Estimated input tokens of the meta-prompt sent to Gemini, by prompt mode.",
+    ["mode"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+    registry=REGISTRY,
+)
+PROMPT_TOKENS_SAVED = Counter(
+    "gemini_prompt_tokens_saved_total",
+    "Estimated input tokens saved by the compact meta-prompt compared to the verbose one.",
+    registry=REGISTRY,
+)
+HISTORY_FLUSH_LATENCY = Histogram(
+    "history_flush_duration_seconds",
+    "Duration of one bulk insert of buffered prompt_history rows.",
+    buckets=_LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+RESULT_STORE_LOOKUP_LATENCY = Histogram(
+    "result_store_lookup_duration_seconds",
+    "Duration of one enhancement_results lookup (including timeouts).",
+    buckets=_LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+RESULT_STORE_FLUSH_LATENCY = Histogram(
+    "result_store_flush_duration_seconds",
+    "Duration of one bulk upsert of buffered enhancement_results rows.",
+    buckets=_LATENCY_BUCKETS,
+    registry=REGISTRY,
+)
+
+
+@contextmanager
+def observe_stage(stage: str, target_model: str) -> Iterator[None]:
+    """
+    Замеряет длительность этапа конвейера улучшения (одна perf_counter-пара на этап):
+    в гистограмму Prometheus и в Server-Timing текущего запроса.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(stage, target_model).observe(elapsed)
+        record_stage(stage, elapsed)
+
+
+class _ComponentsCollector(Collector):
+    """
+    Снимает счётчики компонентов (кэши, single-flight, хеджирование, circuit breaker,
+    admission control, история) только в момент запроса /metrics — на горячем пути
+    ничего не стоит. Импорты ленивые: модуль метрик импортируется этими же сервисами.
+    """
+
+    def collect(self) -> Iterator[object]:
+        from app.middleware.admission import get_admission_stats
+        from app.services.gemini_client import get_hedge_policy, get_single_flight_stats
+        from app.services.history_writer import get_history_writer
+        from app.services.resilience import get_circuit_breaker
+        from app.services.result_cache import get_result_cache
+        from app.services.result_store import get_result_store
+
+        cache = get_result_cache().snapshot()
+        yield _counter("result_cache_hits", "Result cache hits.", cache["hits"])
+        yield _counter("result_cache_misses", "Result cache misses.", cache["misses"])
+        yield _counter("result_cache_evictions", "Result cache LRU evictions.", cache["evictions"])
+        yield _gauge("result_cache_entries", "Entries in the result cache.", cache["size"])
+
+        # Счётчики L2 с каждой реплики: sum(hits) / sum(hits + misses) в Prometheus —
+        # доля попаданий по всему парку.
+        result_store = get_result_store()
+        if result_store is not None:
+            store = result_store.snapshot()
+            yield _counter("result_store_hits", "Result store (Postgres) hits.", store["hits"])
+            yield _counter("result_store_misses", "Result store (Postgres) misses.", store["misses"])
+            yield _counter(
+                "result_store_lookup_timeouts",
+                "Result store lookups that exceeded RESULT_STORE_LOOKUP_TIMEOUT_MS.",
+                store["lookup_timeouts"],
+            )
+            yield _counter(
+                "result_store_lookup_errors",
+                "Result store lookups that failed with a database error.",
+                store["lookup_errors"],
+            )
+            yield _counter("result_store_rows_written", "enhancement_results rows upserted.", store["written"])
+            yield _counter(
+                "result_store_rows_dropped",
+                "Results not stored because the buffer was full.",
+                store["dropped"],
+            )
+            yield _counter("result_store_rows_swept", "Expired enhancement_results rows deleted.", store["swept"])
+            yield _gauge("result_store_rows_pending", "Results waiting to be written.", store["pending"])
+
+        single_flight = get_single_flight_stats()
+        yield _counter("gemini_single_flight_leaders", "Gemini calls actually started.", single_flight["leaders"])
+        yield _counter(
+            "gemini_single_flight_coalesced",
+            "Requests that joined an identical in-flight call.",
+            single_flight["coalesced"],
+        )
+
+        hedge_policy = get_hedge_policy()
+        if hedge_policy is not None:
+            yield _counter("gemini_hedged_requests", "Hedged Gemini calls.", hedge_policy.stats["hedged"])
+            yield _counter("gemini_hedge_wins", "Hedged calls that answered first.", hedge_policy.stats["hedge_wins"])
+
+        breaker = get_circuit_breaker().snapshot()
+        yield _gauge("gemini_circuit_open", "1 if the Gemini circuit breaker is open.", int(breaker["state"] == "open"))
+        yield _counter("gemini_circuit_rejected", "Calls rejected by the open circuit.", breaker["rejected"])
+
+        admission = get_admission_stats()
+        if admission is not None:
+            yield _counter("admission_rate_limited", "Requests rejected with 429.", admission["rate_limited"])
+            yield _counter("admission_shed", "Requests rejected with 503 (overload).", admission["shed"])
+            yield _gauge("admission_waiting", "Requests waiting for an admission slot.", admission["waiting"])
+
+        history = get_history_writer().snapshot()
+        yield _counter("history_rows_written", "prompt_history rows written.", history["written"])
+        yield _counter("history_rows_dropped", "prompt_history rows dropped (buffer full).", history["dropped"])
+        yield _counter("history_rows_failed", "prompt_history rows lost on DB errors.", history["failed"])
+        yield _gauge("history_rows_buffered", "prompt_history rows waiting to be written.", history["buffered"])
+
+
+def _counter(name: str, documentation: str, value: float) -> CounterMetricFamily:
+    return CounterMetricFamily(name, documentation, value=value)
+
+
+def _gauge(name: str, documentation: str, value: float) -> GaugeMetricFamily:
+    return GaugeMetricFamily(name, documentation, value=value)
+
+
+REGISTRY.register(_ComponentsCollector())
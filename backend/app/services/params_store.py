@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Mapping, Optional, Tuple
+
+from app.core.config import get_settings
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+# Эти поля уникальны почти для каждого запроса и уже хранятся в prompt_history
+# (input_prompt, model_id), поэтому в общий набор параметров не входят.
+ROW_FIELDS = ("initialPrompt", "targetAiModel")
+
+
+def split_params(params: Mapping[str, Any]) -> Dict[str, Any]:
+    """Параметры запроса без полей, которые хранятся в самой строке истории."""
+    return {key: value for key, value in params.items() if key not in ROW_FIELDS}
+
+
+def expand_params(stored: Mapping[str, Any], input_prompt: str, model_id: str) -> Dict[str, Any]:
+    """Обратная операция к split_params: полный набор EnhancementParams для строки истории."""
+    return {**stored, "initialPrompt": input_prompt, "targetAiModel": model_id}
+
+
+def hash_params(stored: Mapping[str, Any]) -> str:
+    """
+    sha256 (hex) канонической формы набора параметров: JSON с отсортированными ключами
+    и без пробелов-разделителей, так что порядок полей на хеш не влияет.
+    """
+    canonical = json.dumps(stored, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ParamsInterner:
+    """
+    In-process кэш params_hash -> prompt_params.id для записи истории.
+
+    Строки prompt_params никогда не удаляются и не меняются, поэтому id по хешу
+    можно кэшировать без TTL; размер ограничен max_entries (LRU). Частые наборы
+    параметров после первого обращения не требуют ни одного запроса к БД.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.stats: Dict[str, int] = {"hits": 0, "misses": 0}
+        self._ids: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, params_hash: str) -> Optional[int]:
+        with self._lock:
+            params_id = self._ids.get(params_hash)
+            if params_id is None:
+                self.stats["misses"] += 1
+                return None
+            self._ids.move_to_end(params_hash)
+            self.stats["hits"] += 1
+            return params_id
+
+    def remember(self, ids: Mapping[str, int]) -> None:
+        """Запоминает id; вызывать только после коммита транзакции, в которой они получены."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for params_hash, params_id in ids.items():
+                self._ids[params_hash] = params_id
+                self._ids.move_to_end(params_hash)
+            while len(self._ids) > self.max_entries:
+                self._ids.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "size": len(self._ids)}
+
+
+_params_interner: Optional[ParamsInterner] = None
+
+
+def get_params_interner() -> ParamsInterner:
+    """Возвращает singleton ParamsInterner, настроенный из Settings."""
+    global _params_interner
+
+    if _params_interner is None:
+        _params_interner = ParamsInterner(max_entries=get_settings().history_params_cache_size)
+
+    return _params_interner
+
+
+async def resolve_params_ids(
+    session: "AsyncSession",
+    param_sets: Mapping[str, Mapping[str, Any]],
+) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Находит (или создаёт) строки prompt_params для наборов параметров (hash -> набор,
+    хеш из hash_params).
+
+    Возвращает (hash -> id для всех наборов, hash -> id, которых ещё не было в кэше).
+    Вторые нужно передать в ParamsInterner.remember после коммита session:
+    при откате только что вставленные id не должны попасть в кэш.
+
+    Новые наборы вставляются одним INSERT ... ON CONFLICT DO NOTHING и дочитываются
+    одним SELECT — так параллельные писатели (другие реплики) не конфликтуют.
+    """
+    from sqlalchemy import select
+    from sqlalchemy.dialects.postgresql import insert
+
+    from app.models.prompt_params import PromptParams
+
+    interner = get_params_interner()
+    ids: Dict[str, int] = {}
+    missing: Dict[str, Mapping[str, Any]] = {}
+    for params_hash, stored in param_sets.items():
+        params_id = interner.get(params_hash)
+        if params_id is None:
+            missing[params_hash] = stored
+        else:
+            ids[params_hash] = params_id
+
+    if not missing:
+        return ids, {}
+
+    await session.execute(
+        insert(PromptParams.__table__).on_conflict_do_nothing(index_elements=["params_hash"]),
+        [{"params_hash": params_hash, "params_json": dict(stored)} for params_hash, stored in missing.items()],
+    )
+    rows = await session.execute(
+        select(PromptParams.params_hash, PromptParams.id).where(PromptParams.params_hash.in_(list(missing)))
+    )
+    new_ids = {row.params_hash: row.id for row in rows}
+    ids.update(new_ids)
+    return ids, new_ids
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Optional
+
+# Одновременно профилируется не больше одного запроса: сэмплер смотрит на весь
+# поток event loop, и параллельные профили всё равно показывали бы одно и то же.
+_busy = threading.Lock()
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class SamplingProfiler:
+    """
+    Сэмплирующий профайлер одного потока: фоновый поток раз в interval секунд снимает
+    стек целевого потока через sys._current_frames() и копит «свёрнутые» стеки
+    (формат folded: `a;b;c <число сэмплов>`), которые сразу открываются в
+    speedscope или flamegraph.pl.
+
+    Профилируется поток event loop целиком, поэтому при параллельной нагрузке
+    в профиль попадают и соседние запросы, а ожидание ввода-вывода видно как select.
+    """
+
+    def __init__(self, thread_id: int, interval: float) -> None:
+        # Id известен заранее, чтобы отдать его в заголовках ответа до окончания профиля.
+        self.profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def try_start_profiler(interval: float) -> Optional[SamplingProfiler]:
+    """Запускает профайлер текущего потока или возвращает None, если уже идёт другой профиль."""
+    if not _busy.acquire(blocking=False):
+        return None
+    profiler = SamplingProfiler(threading.get_ident(), interval)
+    profiler.start()
+    return profiler
+
+
+def finish_profile(profiler: SamplingProfiler, output_dir: Path) -> Path:
+    """Останавливает профайлер и сохраняет профиль в output_dir/<profile_id>.folded."""
+    try:
+        profiler.stop()
+    finally:
+        _busy.release()
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{profiler.profile_id}.folded"
+    path.write_text(profiler.folded(), encoding="utf-8")
+    return path
+
+
+def profile_path(output_dir: Path, profile_id: str) -> Optional[Path]:
+    """Путь к сохранённому профилю или None (id проверяется, чтобы не выйти за output_dir)."""
+    if not profile_id or not all(ch.isalnum() or ch == "-" for ch in profile_id):
+        return None
+    path = output_dir / f"{profile_id}.folded"
+    return path if path.is_file() else None
@@ -1,7 +1,11 @@
 from __future__ import annotations
 
+import re
+from typing import List, Optional, Tuple
+
 from app.models_meta import ModelMeta
 from app.schemas.enhancement import EnhanceRequest
+from app.services.token_budget import estimate_tokens, truncate_to_tokens
 
 
 def build_meta_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> str:
@@ -58,3 +62,283 @@ def build_meta_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> str:
         f"Enhanced Prompt for {target_model_name} (in {output_language_name}):\n"
     )
     return meta_prompt
+
+
+def build_system_instruction(model_meta: ModelMeta, prompt_language: str) -> str:
+    """
+    Статическая часть мета-промпта для system instruction.
+
+    Зависит только от целевой модели и языка результата, поэтому одинакова для всех
+    запросов этого варианта и может быть закэширована на стороне Gemini.
+    Параметры конкретного запроса идут отдельно — см. build_user_prompt.
+    """
+    target_model_name = model_meta.label or model_meta.id
+    image_model = model_meta.is_image_model
+    output_language_name = prompt_language.upper()
+
+    instruction = (
+        "You are a world-class prompt engineering assistant.\n"
+        "Your primary goal is to enhance the user's initial prompt to make it highly effective for the specified target AI model.\n"
+        f"The final enhanced prompt MUST be in the target output language: **{output_language_name}**.\n\n"
+        f"Target AI Model: **{target_model_name}**.\n"
+        "Tailor the prompt structure, syntax, and keywords considering the specific strengths and requirements of this model. "
+        "For example, Midjourney uses '--ar' for aspect ratio, DALL-E prefers descriptive sentences.\n\n"
+        "The user message contains the original prompt and the enhancement parameters.\n"
+        'If a parameter is "Default" or empty, use your best judgment or omit it if not applicable.\n\n'
+        "**How to apply the parameters:**\n"
+        f"- **Style/Tone:** interpret and apply it in {output_language_name}.\n"
+        f"- **Detail Level:** adjust verbosity and detail in {output_language_name}.\n"
+        f"- **Keywords/Concepts to Add/Emphasize:** incorporate them into the {output_language_name} prompt.\n"
+        f"- **Elements to Avoid/Negative Prompts:** ensure they are excluded in the {output_language_name} prompt.\n"
+    )
+
+    if image_model:
+        instruction += (
+            f"- **Image Specific Parameters** (artistic medium, camera angle, lighting, color palette) "
+            f"describe the desired image for {target_model_name}; express them in {output_language_name}.\n"
+        )
+
+    instruction += (
+        "- **Specific Instructions for You (The Prompt Enhancer AI):** follow them when present.\n\n"
+        "**Output Requirements:**\n"
+        f"- Generate ONLY the enhanced prompt text, in **{output_language_name}**.\n"
+        '- Do NOT include any explanations, apologies, or conversational filler like "Here is the enhanced prompt:" before or after the prompt.\n'
+        f"- The output should be ready to be copied and pasted directly into the target AI model ({target_model_name}).\n"
+        f"- If the target model uses specific syntax (e.g., parameters like --v 6 or --ar 16:9 for Midjourney), try to incorporate them intelligently if relevant, ensuring they are compatible with the {output_language_name} prompt.\n"
+        "- For image models, focus on vivid descriptions and artistic styles. For text models, focus on clarity, completeness, and appropriate tone. All in "
+        f"**{output_language_name}**.\n"
+    )
+    return instruction
+
+
+def build_user_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> str:
+    """
+    Динамическая часть мета-промпта: исходный промпт и параметры конкретного запроса.
+
+    Используется вместе с build_system_instruction.
+    """
+    target_model_name = model_meta.label or model_meta.id
+    output_language_name = params.promptLanguage.upper()
+
+    user_prompt = (
+        "User's original prompt:\n"
+        f"\"{params.initialPrompt}\"\n\n"
+        "**Core Enhancement Parameters:**\n"
+        f"- **Style/Tone:** {params.styleOrTone}\n"
+        f"- **Detail Level:** {params.detailLevel}\n"
+        f"- **Keywords/Concepts to Add/Emphasize:** {params.keywordsToAdd or 'None specified'}\n"
+        f"- **Elements to Avoid/Negative Prompts:** {params.negativePrompts or 'None specified'}\n"
+    )
+
+    if model_meta.is_image_model:
+        user_prompt += (
+            "\n"
+            "**Image Specific Parameters:**\n"
+            f"- **Artistic Medium:** {params.artisticMedium}\n"
+            f"- **Camera Angle/Shot Type:** {params.cameraAngle}\n"
+            f"- **Lighting:** {params.lighting}\n"
+            f"- **Color Palette:** {params.colorPalette}\n"
+        )
+
+    user_prompt += (
+        "\n"
+        "**Specific Instructions for You (The Prompt Enhancer AI):**\n"
+        f"{params.specificInstructions or f'Generate the most effective and creative prompt in {output_language_name} based on the above.'}\n\n"
+        f"Enhanced Prompt for {target_model_name} (in {output_language_name}):\n"
+    )
+    return user_prompt
+
+
+# --- Компактный режим -------------------------------------------------------------------
+#
+# Те же инструкции, что и в подробном режиме, но без повторов: язык результата и требования
+# к выводу упоминаются один раз, параметры со значением "Default" или пустые не выводятся
+# вовсе (подробный промпт всё равно просит модель их игнорировать), а секция image-параметров
+# появляется, только если хотя бы один из них задан.
+
+_DEFAULT_VALUES = frozenset({"", "default"})
+_LIST_SEPARATORS = re.compile(r"\s*[,;\n]\s*")
+_INSTRUCTION_SEPARATORS = re.compile(r"(?<=[.!?])\s+|\n+")
+
+# Минимум токенов, который остаётся у initialPrompt даже при очень маленьком бюджете.
+_MIN_PROMPT_TOKENS = 16
+
+# Сколько раз уточнять укорачивание, если промпт всё ещё не влез в бюджет.
+_FIT_ATTEMPTS = 3
+
+
+def _is_default(value: str) -> bool:
+    return value.strip().lower() in _DEFAULT_VALUES
+
+
+def _dedupe_list(value: str) -> str:
+    """'cat, Cat; dog' -> 'cat, dog': повторы без учёта регистра убираются, порядок сохраняется."""
+    seen = set()
+    items: List[str] = []
+    for item in _LIST_SEPARATORS.split(value.strip()):
+        key = item.lower()
+        if item and key not in seen:
+            seen.add(key)
+            items.append(item)
+    return ", ".join(items)
+
+
+def _dedupe_instructions(value: str) -> str:
+    """Убирает повторяющиеся предложения/строки в specificInstructions."""
+    seen = set()
+    sentences: List[str] = []
+    for sentence in _INSTRUCTION_SEPARATORS.split(value.strip()):
+        key = " ".join(sentence.lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            sentences.append(sentence.strip())
+    return " ".join(sentences)
+
+
+def compact_params(params: EnhanceRequest) -> EnhanceRequest:
+    """Копия запроса с дедуплицированными списками ключевых слов и инструкциями."""
+    return params.model_copy(
+        update={
+            "keywordsToAdd": _dedupe_list(params.keywordsToAdd),
+            "negativePrompts": _dedupe_list(params.negativePrompts),
+            "specificInstructions": _dedupe_instructions(params.specificInstructions),
+        }
+    )
+
+
+def _parameter_lines(params: EnhanceRequest, model_meta: ModelMeta) -> str:
+    lines = [
+        f"- {label}: {value}"
+        for label, value in (
+            ("Style/Tone", params.styleOrTone),
+            ("Detail level", params.detailLevel),
+            ("Add/emphasize", params.keywordsToAdd),
+            ("Avoid", params.negativePrompts),
+        )
+        if not _is_default(value)
+    ]
+    if model_meta.is_image_model:
+        lines.extend(
+            f"- {label}: {value}"
+            for label, value in (
+                ("Artistic medium", params.artisticMedium),
+                ("Camera angle/shot", params.cameraAngle),
+                ("Lighting", params.lighting),
+                ("Color palette", params.colorPalette),
+            )
+            if not _is_default(value)
+        )
+    if not lines:
+        return ""
+    return "Parameters:\n" + "\n".join(lines) + "\n"
+
+
+def build_compact_system_instruction(model_meta: ModelMeta, prompt_language: str) -> str:
+    """Компактный аналог build_system_instruction: каждая инструкция — один раз."""
+    target_model_name = model_meta.label or model_meta.id
+    focus = (
+        "vivid visual description and artistic style"
+        if model_meta.is_image_model
+        else "clarity, completeness and appropriate tone"
+    )
+    return (
+        "You are a world-class prompt engineer. Rewrite the user's prompt into a highly effective prompt "
+        f"for {target_model_name}, written in {prompt_language.upper()}.\n"
+        f"Use {target_model_name}'s preferred structure, syntax and keywords "
+        "(e.g. Midjourney: --ar/--v parameters; DALL-E: descriptive sentences). "
+        f"Focus on {focus}.\n"
+        "Apply the listed parameters; for anything not listed, use your best judgment.\n"
+        f"Output ONLY the enhanced prompt, ready to paste into {target_model_name}: "
+        "no explanations, apologies or preface.\n"
+    )
+
+
+def build_compact_user_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> str:
+    """Компактный аналог build_user_prompt: исходный промпт и только заданные параметры."""
+    user_prompt = f"Original prompt:\n\"{params.initialPrompt}\"\n"
+    parameters = _parameter_lines(params, model_meta)
+    if parameters:
+        user_prompt += "\n" + parameters
+    if params.specificInstructions:
+        user_prompt += f"\nInstructions: {params.specificInstructions}\n"
+    return user_prompt
+
+
+def build_compact_meta_prompt(params: EnhanceRequest, model_meta: ModelMeta) -> str:
+    """Компактный аналог build_meta_prompt (инструкции и параметры одним сообщением)."""
+    return (
+        build_compact_system_instruction(model_meta, params.promptLanguage)
+        + "\n"
+        + build_compact_user_prompt(params, model_meta)
+    )
+
+
+def _fit_to_budget(params: EnhanceRequest, available_tokens: int) -> EnhanceRequest:
+    """
+    Укорачивает initialPrompt и specificInstructions так, чтобы вместе они заняли
+    не больше available_tokens. Инструкциям достаётся не больше трети бюджета
+    (и меньше, если сам промпт короткий), остальное — промпту.
+    """
+    prompt_tokens = estimate_tokens(params.initialPrompt)
+    instruction_tokens = estimate_tokens(params.specificInstructions)
+    if prompt_tokens + instruction_tokens <= available_tokens:
+        return params
+
+    available_tokens = max(available_tokens, _MIN_PROMPT_TOKENS)
+    instruction_share = min(instruction_tokens, available_tokens // 3)
+    prompt_share = available_tokens - instruction_share
+    if prompt_tokens < prompt_share:
+        instruction_share = available_tokens - prompt_tokens
+
+    return params.model_copy(
+        update={
+            "initialPrompt": truncate_to_tokens(params.initialPrompt, prompt_share),
+            "specificInstructions": truncate_to_tokens(params.specificInstructions, instruction_share),
+        }
+    )
+
+
+def build_compact_prompt(
+    params: EnhanceRequest,
+    model_meta: ModelMeta,
+    *,
+    use_system_instruction: bool,
+    token_budget: int,
+) -> Tuple[Optional[str], str]:
+    """
+    Компактный промпт: (system_instruction или None, сообщение пользователя).
+
+    token_budget > 0 ограничивает оценку входных токенов всего промпта: если он не помещается,
+    укорачиваются initialPrompt и specificInstructions (начало и конец сохраняются,
+    середина вырезается). Остальная часть промпта и так минимальна, поэтому бюджет меньше
+    неё плюс _MIN_PROMPT_TOKENS на initialPrompt не соблюдается — это нижняя граница.
+    """
+    params = compact_params(params)
+
+    def build(current: EnhanceRequest) -> Tuple[Optional[str], str]:
+        if use_system_instruction:
+            return (
+                build_compact_system_instruction(model_meta, current.promptLanguage),
+                build_compact_user_prompt(current, model_meta),
+            )
+        return None, build_compact_meta_prompt(current, model_meta)
+
+    if token_budget > 0 and _estimate_prompt_tokens(build(params)) > token_budget:
+        skeleton = build(params.model_copy(update={"initialPrompt": "", "specificInstructions": ""}))
+        available_tokens = token_budget - _estimate_prompt_tokens(skeleton)
+        fitted = params
+        for _ in range(_FIT_ATTEMPTS):
+            fitted = _fit_to_budget(params, available_tokens)
+            excess = _estimate_prompt_tokens(build(fitted)) - token_budget
+            if excess <= 0:
+                break
+            # Скелет не учитывает подпись "Instructions:" и округление оценок: урезаем ещё.
+            used_tokens = estimate_tokens(fitted.initialPrompt) + estimate_tokens(fitted.specificInstructions)
+            available_tokens = used_tokens - excess
+        params = fitted
+
+    return build(params)
+
+
+def _estimate_prompt_tokens(prompt: Tuple[Optional[str], str]) -> int:
+    return sum(estimate_tokens(part or "") for part in prompt)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# Длительности этапов текущего запроса (имя этапа, секунды). Список создаёт
+# ServerTimingMiddleware; вне запроса (CLI, фоновые задачи) значение — None.
+_stage_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("stage_timings", default=None)
+
+
+def begin_request_timings() -> List[Tuple[str, float]]:
+    """Заводит пустой список этапов для текущего запроса и возвращает его."""
+    timings: List[Tuple[str, float]] = []
+    _stage_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Добавляет этап в Server-Timing текущего запроса (если запрос его собирает)."""
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+def format_server_timing(timings: List[Tuple[str, float]], total_seconds: float) -> str:
+    """
+    Формирует значение заголовка Server-Timing в миллисекундах.
+
+    Повторяющиеся этапы (например, элементы пакетного запроса) суммируются;
+    other — всё, что не покрыто этапами: валидация, кэш, сериализация ответа.
+    """
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in totals.items()]
+    other = max(0.0, total_seconds - sum(totals.values()))
+    parts.append(f"other;dur={other * 1000:.2f}")
+    parts.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(parts)
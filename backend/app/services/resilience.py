@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from fastapi import Header, HTTPException, status
+
+from app.core.config import get_settings
+
+T = TypeVar("T")
+
+# HTTP-коды Gemini, при которых повтор имеет смысл: перегрузка, лимиты, временные сбои.
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+class Deadline:
+    """Абсолютный дедлайн обработки запроса (по time.monotonic)."""
+
+    def __init__(self, seconds: float) -> None:
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Deadline:
+    """
+    Дедлайн текущего запроса; вне HTTP-запроса (CLI, фоновые задачи) — новый дедлайн
+    на UPSTREAM_DEADLINE_SECONDS для каждого вызова.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        deadline = Deadline(get_settings().upstream_deadline_seconds)
+    return deadline
+
+
+async def apply_request_deadline(
+    request_timeout: Optional[float] = Header(
+        default=None,
+        alias="X-Request-Timeout",
+        gt=0,
+        description=(
+            "Сколько секунд клиент готов ждать ответа. Может только сократить "
+            "серверный дедлайн UPSTREAM_DEADLINE_SECONDS."
+        ),
+    ),
+) -> None:
+    """
+    Dependency: фиксирует дедлайн запроса в contextvar, откуда его берёт клиент Gemini.
+    """
+    seconds = get_settings().upstream_deadline_seconds
+    if request_timeout is not None:
+        seconds = min(seconds, request_timeout)
+    _current_deadline.set(Deadline(seconds))
+
+
+def use_server_deadline() -> None:
+    """
+    Сбрасывает дедлайн текущего контекста на серверный UPSTREAM_DEADLINE_SECONDS.
+
+    Для задач, общих для нескольких запросов (single-flight): задача наследует contextvar
+    создавшего её запроса, и без сброса короткий X-Request-Timeout одного клиента
+    обрывал бы вызов для всех. Каждый запрос ждёт общую задачу через await_within_deadline
+    со своим дедлайном; серверный дедлайн — верхняя граница любого из них.
+    """
+    _current_deadline.set(Deadline(get_settings().upstream_deadline_seconds))
+
+
+def deadline_exceeded() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        detail="Gemini API did not respond within the request deadline.",
+    )
+
+
+async def await_within_deadline(awaitable: Awaitable[T], deadline: Deadline) -> T:
+    """Ждёт awaitable не дольше оставшегося времени дедлайна; иначе — HTTP 504."""
+    try:
+        return await asyncio.wait_for(awaitable, timeout=deadline.remaining())
+    except asyncio.TimeoutError as exc:
+        raise deadline_exceeded() from exc
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Временная ли это ошибка upstream, которую имеет смысл повторить."""
+    # Ленивые импорты: к моменту первой ошибки google.genai (и httpx) уже загружены клиентом.
+    import httpx
+    from google.genai import errors as genai_errors
+
+    if isinstance(exc, genai_errors.APIError):
+        return exc.code in RETRYABLE_STATUS_CODES
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+class CircuitOpenError(Exception):
+    """Upstream считается нездоровым: вызов отклонён без обращения к нему."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Circuit breaker is open")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Простой circuit breaker: после failure_threshold подряд временных ошибок
+    цепь размыкается на reset_timeout секунд, и вызовы сразу отклоняются.
+    Затем пропускается один пробный вызов (half-open): успех замыкает цепь,
+    ошибка снова размыкает её. Пробный вызов обязательно освобождается через
+    release_probe — в том числе при отмене, иначе цепь навсегда останется half-open.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.stats: Dict[str, int] = {"opened": 0, "rejected": 0}
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def before_call(self) -> bool:
+        """Пропускает вызов или бросает CircuitOpenError. True — это пробный вызов."""
+        if self.state == "closed":
+            return False
+
+        if self.state == "open":
+            elapsed = time.monotonic() - self._opened_at
+            if elapsed < self.reset_timeout:
+                self.stats["rejected"] += 1
+                raise CircuitOpenError(self.reset_timeout - elapsed)
+            self.state = "half_open"
+
+        # half_open: пропускаем только один пробный вызов.
+        if self._probe_in_flight:
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(self.reset_timeout)
+        self._probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        """Пробный вызов завершён (успехом, ошибкой или отменой): можно пропустить следующий."""
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        self._consecutive_failures = 0
+        self.state = "closed"
+
+    def record_failure(self) -> None:
+        self._consecutive_failures += 1
+        if self.state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.stats["opened"] += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def record_neutral(self) -> None:
+        """
+        Вызов завершился, ничего не сказав о здоровье upstream (ошибка вроде 400 или отмена).
+        Состояние цепи не меняется; пробный вызов освобождается через release_probe.
+        """
+
+    def snapshot(self) -> Dict[str, object]:
+        return {**self.stats, "state": self.state, "consecutive_failures": self._consecutive_failures}
+
+
+_circuit_breaker: Optional[CircuitBreaker] = None
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _circuit_breaker
+
+    if _circuit_breaker is None:
+        settings = get_settings()
+        _circuit_breaker = CircuitBreaker(
+            failure_threshold=settings.upstream_circuit_failure_threshold,
+            reset_timeout=settings.upstream_circuit_reset_seconds,
+        )
+    return _circuit_breaker
+
+
+async def call_with_resilience(call: Callable[[], Awaitable[T]], deadline: Deadline) -> T:
+    """
+    Вызывает upstream с учётом дедлайна, повторов и circuit breaker.
+
+    - каждая попытка ограничена оставшимся временем дедлайна;
+    - повторяются только временные ошибки (см. is_retryable), с экспоненциальной
+      задержкой и full jitter, и только если после паузы ещё останется время;
+    - при разомкнутой цепи — сразу HTTP 503 с Retry-After;
+    - если дедлайн истёк — HTTP 504. Остальные ошибки пробрасываются как есть.
+    """
+    settings = get_settings()
+    breaker = get_circuit_breaker()
+    attempt = 0
+
+    while True:
+        if deadline.expired():
+            raise deadline_exceeded()
+
+        try:
+            probe = breaker.before_call()
+        except CircuitOpenError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Gemini API is temporarily unavailable, please retry later.",
+                headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+            ) from exc
+
+        attempt += 1
+        try:
+            result = await asyncio.wait_for(call(), timeout=deadline.remaining())
+        except Exception as exc:
+            retryable = is_retryable(exc)
+            # Истёкший дедлайн — это таймаут клиента (например, X-Request-Timeout: 0.05),
+            # а не сбой upstream: иначе один клиент мог бы разомкнуть цепь для всех.
+            if retryable and not deadline.expired():
+                breaker.record_failure()
+            else:
+                breaker.record_neutral()
+            if probe:
+                breaker.release_probe()
+
+            if deadline.expired():
+                raise deadline_exceeded() from exc
+            if not retryable or attempt >= settings.upstream_retry_max_attempts:
+                raise
+
+            backoff_cap = min(
+                settings.upstream_retry_max_delay_seconds,
+                settings.upstream_retry_base_delay_seconds * (2 ** (attempt - 1)),
+            )
+            delay = random.uniform(0, backoff_cap)
+            if delay >= deadline.remaining():
+                raise
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Отмена (клиент отключился посреди SSE) — не ответ upstream, но пробный вызов
+            # нужно освободить, иначе цепь отклоняла бы все запросы до перезапуска.
+            breaker.record_neutral()
+            if probe:
+                breaker.release_probe()
+            raise
+
+        breaker.record_success()
+        if probe:
+            breaker.release_probe()
+        return result
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.core.config import get_settings
+
+
+@dataclass
+class CacheStats:
+    """Счётчики кэша результатов (для диагностики и метрик)."""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+
+class ResultCache:
+    """
+    In-process LRU-кэш улучшенных промптов с ограничением по размеру и TTL.
+
+    Ключ — отпечаток запроса (см. app.services.fingerprint.request_fingerprint),
+    значение — уже очищенный улучшенный промпт.
+
+    max_entries <= 0 полностью отключает кэш.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        # key -> (expires_at по time.monotonic(), value)
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats.misses += 1
+                return None
+
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.stats.hits += 1
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Текущее состояние кэша в виде простого словаря (для /health и метрик)."""
+        lookups = self.stats.hits + self.stats.misses
+        return {
+            "size": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.stats.hits,
+            "misses": self.stats.misses,
+            "evictions": self.stats.evictions,
+            "expirations": self.stats.expirations,
+            "hit_rate": round(self.stats.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_result_cache: Optional[ResultCache] = None
+
+
+def get_result_cache() -> ResultCache:
+    """Возвращает singleton-экземпляр кэша, настроенный из Settings."""
+    global _result_cache
+
+    if _result_cache is None:
+        settings = get_settings()
+        _result_cache = ResultCache(
+            max_entries=settings.result_cache_max_entries,
+            ttl_seconds=settings.result_cache_ttl_seconds,
+        )
+
+    return _result_cache
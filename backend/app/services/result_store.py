@@ -0,0 +1,399 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import get_settings
+from app.services.metrics import RESULT_STORE_FLUSH_LATENCY, RESULT_STORE_LOOKUP_LATENCY
+
+logger = logging.getLogger(__name__)
+
+# Ошибки поиска при недоступной базе повторяются на каждом запросе: в лог — не чаще раза в минуту.
+_LOOKUP_ERROR_LOG_INTERVAL_SECONDS = 60.0
+
+
+class ResultStore:
+    """
+    Второй уровень кэша результатов: таблица enhancement_results в Postgres,
+    общая для всех воркеров и реплик.
+
+    - get: точечный поиск по отпечатку запроса перед вызовом Gemini, ограниченный
+      lookup_timeout — медленная или недоступная база считается промахом, а не ошибкой запроса;
+    - put: только кладёт результат в память; фоновая задача пачками делает upsert
+      (как HistoryWriter), так что запись никогда не задерживает ответ;
+    - раз в sweep_interval удаляет просроченные строки (по индексу expires_at) порциями.
+
+    При переполнении буфера новые результаты отбрасываются (и считаются в dropped).
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float,
+        lookup_timeout: float,
+        max_buffer: int,
+        batch_size: int,
+        flush_interval: float,
+        sweep_interval: float,
+        sweep_batch_size: int = 5000,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.lookup_timeout = lookup_timeout
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "lookup_timeouts": 0,
+            "lookup_errors": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "swept": 0,
+        }
+        # fingerprint -> (model_name, enhanced_prompt); повторная запись того же ключа
+        # до сброса просто заменяет значение.
+        self._pending: Dict[str, Tuple[str, str]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stopping = False
+        self._last_sweep = 0.0
+        self._last_error_log = float("-inf")
+        self._suppressed_errors = 0
+
+    async def get(self, fingerprint: str) -> Optional[str]:
+        """
+        Непросроченный результат по отпечатку или None (в том числе при ошибке/таймауте БД).
+
+        Таймауты под нагрузкой на базу — штатная ситуация: они только считаются
+        (lookup_timeouts) и пишутся в debug. Прочие ошибки попадают в лог с traceback
+        не чаще раза в _LOOKUP_ERROR_LOG_INTERVAL_SECONDS.
+        """
+        try:
+            with RESULT_STORE_LOOKUP_LATENCY.time():
+                value = await asyncio.wait_for(_select_result(fingerprint), timeout=self.lookup_timeout)
+        except asyncio.TimeoutError:
+            self.stats["lookup_timeouts"] += 1
+            logger.debug("Result store lookup timed out after %.3fs", self.lookup_timeout)
+            return None
+        except Exception:
+            self.stats["lookup_errors"] += 1
+            self._log_lookup_error()
+            return None
+
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+
+        self.stats["hits"] += 1
+        return value
+
+    def _log_lookup_error(self) -> None:
+        now = time.monotonic()
+        if now - self._last_error_log < _LOOKUP_ERROR_LOG_INTERVAL_SECONDS:
+            self._suppressed_errors += 1
+            return
+
+        logger.warning(
+            "Result store lookup failed (%d similar errors suppressed)",
+            self._suppressed_errors,
+            exc_info=True,
+        )
+        self._last_error_log = now
+        self._suppressed_errors = 0
+
+    def put(self, fingerprint: str, model_name: str, enhanced_prompt: str) -> bool:
+        """
+        Ставит результат в очередь на запись, не дожидаясь БД. Возвращает False, если он отброшен.
+
+        Можно вызывать и из других потоков (синхронный путь Gemini): фоновая задача
+        будится через call_soon_threadsafe.
+        """
+        if fingerprint not in self._pending and len(self._pending) >= self.max_buffer:
+            self.stats["dropped"] += 1
+            return False
+
+        self._pending[fingerprint] = (model_name, enhanced_prompt)
+        if len(self._pending) >= self.batch_size and self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._last_sweep = time.monotonic()
+            self._task = asyncio.create_task(self._run(), name="result-store-writer")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу, предварительно записав в БД всё накопленное."""
+        if self._task is None:
+            return
+
+        self._stopping = True
+        assert self._wakeup is not None
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        self._loop = None
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._pending:
+                await self._flush_batch()
+                if len(self._pending) < self.batch_size and not self._stopping:
+                    break
+
+            if self._stopping and not self._pending:
+                return
+
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                self._last_sweep = time.monotonic()
+                await self._sweep_expired()
+
+    async def _flush_batch(self) -> None:
+        rows: List[Dict[str, object]] = []
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+        for fingerprint in list(self._pending)[: self.batch_size]:
+            model_name, enhanced_prompt = self._pending.pop(fingerprint)
+            rows.append(
+                {
+                    "fingerprint": fingerprint,
+                    "model_name": model_name,
+                    "enhanced_prompt": enhanced_prompt,
+                    "expires_at": expires_at,
+                }
+            )
+
+        try:
+            with RESULT_STORE_FLUSH_LATENCY.time():
+                await upsert_results(rows)
+        except Exception:
+            # Это кэш: при сбое БД теряем пачку, ответы просто будут сгенерированы заново.
+            self.stats["failed"] += len(rows)
+            logger.exception("Failed to write %d enhancement_results rows", len(rows))
+            return
+
+        self.stats["written"] += len(rows)
+
+    async def _sweep_expired(self) -> None:
+        try:
+            while True:
+                deleted = await _delete_expired(self.sweep_batch_size)
+                self.stats["swept"] += deleted
+                if deleted < self.sweep_batch_size or self._stopping:
+                    return
+        except Exception:
+            logger.exception("Failed to sweep expired enhancement_results rows")
+
+    def snapshot(self) -> Dict[str, int]:
+        return {**self.stats, "pending": len(self._pending)}
+
+
+async def _select_result(fingerprint: str) -> Optional[str]:
+    """
+    Неистёкший ответ по отпечатку. Отдаются только ответы текущей GEMINI_MODEL_NAME:
+    строку, записанную другой моделью (например, запасной при хеджировании), не выдаём
+    под отпечатком основной — это промах, и свежий ответ её перезапишет.
+    """
+    from sqlalchemy import func, select
+
+    from app.db.session import get_async_session_factory
+    from app.models.enhancement_result import EnhancementResult
+
+    query = select(EnhancementResult.enhanced_prompt).where(
+        EnhancementResult.fingerprint == fingerprint,
+        EnhancementResult.model_name == get_settings().gemini_model_name,
+        EnhancementResult.expires_at > func.now(),
+    )
+    async with get_async_session_factory()() as session:
+        return (await session.execute(query)).scalar_one_or_none()
+
+
+async def upsert_results(rows: List[Dict[str, object]], *, overwrite: bool = True) -> None:
+    """
+    Одна multi-row вставка в enhancement_results.
+
+    overwrite=True заменяет существующие записи (свежий ответ Gemini и новый срок жизни),
+    overwrite=False оставляет их как есть (прогрев из истории не должен перетирать свежие ответы).
+    """
+    from sqlalchemy.dialects.postgresql import insert
+
+    from app.db.session import get_async_session_factory
+    from app.models.enhancement_result import EnhancementResult
+
+    statement = insert(EnhancementResult.__table__)
+    if overwrite:
+        statement = statement.on_conflict_do_update(
+            index_elements=["fingerprint"],
+            set_={
+                "model_name": statement.excluded.model_name,
+                "enhanced_prompt": statement.excluded.enhanced_prompt,
+                "created_at": statement.excluded.created_at,
+                "expires_at": statement.excluded.expires_at,
+            },
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=["fingerprint"])
+
+    async with get_async_session_factory()() as session:
+        await session.execute(statement, rows)
+        await session.commit()
+
+
+async def _delete_expired(limit: int) -> int:
+    """Удаляет до limit просроченных строк; короткие транзакции не держат долгих блокировок."""
+    from sqlalchemy import delete, func, select
+
+    from app.db.session import get_async_session_factory
+    from app.models.enhancement_result import EnhancementResult
+
+    expired = (
+        select(EnhancementResult.fingerprint)
+        .where(EnhancementResult.expires_at <= func.now())
+        .limit(limit)
+        .scalar_subquery()
+    )
+    statement = delete(EnhancementResult).where(EnhancementResult.fingerprint.in_(expired))
+
+    async with get_async_session_factory()() as session:
+        result = await session.execute(statement)
+        await session.commit()
+        return result.rowcount or 0
+
+
+_result_store: Optional[ResultStore] = None
+
+
+def get_result_store() -> Optional[ResultStore]:
+    """
+    Возвращает singleton ResultStore или None, если хранилище выключено (RESULT_STORE_ENABLED=false).
+    """
+    global _result_store
+
+    settings = get_settings()
+    if not settings.result_store_enabled:
+        return None
+
+    if _result_store is None:
+        _result_store = ResultStore(
+            ttl_seconds=settings.result_store_ttl_seconds,
+            lookup_timeout=settings.result_store_lookup_timeout_ms / 1000.0,
+            max_buffer=settings.result_store_buffer_max_rows,
+            batch_size=settings.result_store_flush_batch_size,
+            flush_interval=settings.result_store_flush_interval_seconds,
+            sweep_interval=settings.result_store_sweep_interval_seconds,
+        )
+
+    return _result_store
+
+
+async def prewarm_result_store_from_history() -> int:
+    """
+    Прогревает кэши самыми частыми запросами из prompt_history за последние
+    RESULT_STORE_PREWARM_DAYS дней (не больше RESULT_STORE_PREWARM_ROWS разных запросов).
+
+    Для каждого запроса берётся последний ответ; он кладётся в in-process кэш
+    и (без перезаписи существующих строк) в enhancement_results. Отпечаток считается
+    заново по текущему мета-промпту, поэтому после смены шаблонов прогрев не отдаёт
+    ответы на старые промпты. Берутся только ответы, которые сгенерировала текущая
+    GEMINI_MODEL_NAME: ответы другой модели (прежней или запасной при хеджировании)
+    и ответы из кэша (модель не записана) под её отпечатком не выдаются.
+    Возвращает число прогретых записей; ошибки БД только логируются.
+    """
+    store = get_result_store()
+    settings = get_settings()
+    if store is None or settings.result_store_prewarm_rows <= 0:
+        return 0
+
+    from sqlalchemy import func, select
+
+    from app.db.session import get_async_session_factory
+    from app.models.prompt_history import PromptHistory
+    from app.models.prompt_params import PromptParams
+    from app.schemas.enhancement import EnhanceRequest
+    from app.services.gemini_client import request_cache_key
+    from app.services.params_store import expand_params
+    from app.services.result_cache import get_result_cache
+
+    since = datetime.now(timezone.utc) - timedelta(days=settings.result_store_prewarm_days)
+    # Уникальный запрос — набор параметров (params_id) плюс промпт и модель из самой строки.
+    request_key = (PromptHistory.params_id, PromptHistory.model_id, func.md5(PromptHistory.input_prompt))
+    # Для каждого уникального запроса — сколько раз он встречался и его последний ответ.
+    ranked = (
+        select(
+            PromptHistory.params_id,
+            PromptHistory.model_id,
+            PromptHistory.input_prompt,
+            PromptHistory.enhanced_prompt,
+            func.count().over(partition_by=request_key).label("hits"),
+            func.row_number()
+            .over(partition_by=request_key, order_by=PromptHistory.created_at.desc())
+            .label("recency"),
+        )
+        .where(
+            PromptHistory.created_at >= since,
+            PromptHistory.gemini_model == settings.gemini_model_name,
+        )
+        .subquery()
+    )
+    query = (
+        select(PromptParams.params_json, ranked.c.model_id, ranked.c.input_prompt, ranked.c.enhanced_prompt)
+        .join(PromptParams, PromptParams.id == ranked.c.params_id)
+        .where(ranked.c.recency == 1)
+        .order_by(ranked.c.hits.desc())
+        .limit(settings.result_store_prewarm_rows)
+    )
+
+    try:
+        async with get_async_session_factory()() as session:
+            history_rows = (await session.execute(query)).all()
+    except Exception:
+        logger.exception("Failed to read prompt_history for result store pre-warm")
+        return 0
+
+    cache = get_result_cache()
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=store.ttl_seconds)
+    rows: List[Dict[str, object]] = []
+    # От редких к частым: в LRU in-process кэша самые частые окажутся самыми свежими.
+    for history_row in reversed(history_rows):
+        try:
+            params = EnhanceRequest.model_validate(
+                expand_params(history_row.params_json, history_row.input_prompt, history_row.model_id)
+            )
+            fingerprint = request_cache_key(params)
+        except Exception:
+            # Устаревшие параметры или модель, которой больше нет в каталоге.
+            continue
+        cache.set(fingerprint, history_row.enhanced_prompt)
+        rows.append(
+            {
+                "fingerprint": fingerprint,
+                "model_name": settings.gemini_model_name,
+                "enhanced_prompt": history_row.enhanced_prompt,
+                "expires_at": expires_at,
+            }
+        )
+
+    try:
+        for start in range(0, len(rows), store.batch_size):
+            await upsert_results(rows[start : start + store.batch_size], overwrite=False)
+    except Exception:
+        logger.exception("Failed to pre-warm enhancement_results")
+
+    return len(rows)
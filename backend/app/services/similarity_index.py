@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.core.config import get_settings
+from app.models_meta import get_model_meta
+from app.schemas.enhancement import EnhanceRequest
+
+logger = logging.getLogger(__name__)
+
+# Параметры MinHash/LSH: 64 «перестановки», 16 полос по 4 строки.
+# При такой разбивке пара с похожестью 0.9 становится кандидатом с вероятностью > 0.99,
+# а пара с похожестью 0.3 — примерно в 12% случаев (и затем отсекается порогом).
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 4
+
+_MASK_64 = (1 << 64) - 1
+# Фиксированный seed: сигнатуры должны совпадать между перезапусками и процессами.
+_rng = random.Random(20260118)
+_PERMUTATION_MASKS = tuple(_rng.getrandbits(64) for _ in range(NUM_PERM))
+del _rng
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+# Параметры, которые не участвуют в scope для текстовых моделей.
+_IMAGE_FIELDS = ("artisticMedium", "cameraAngle", "lighting", "colorPalette")
+
+
+def normalize_prompt_text(text: str) -> str:
+    """Нижний регистр, без пунктуации, пробелы схлопнуты — «смысловой» вид промпта."""
+    return " ".join(_NON_WORD_RE.sub(" ", text.lower()).split())
+
+
+def _shingles(text: str) -> Set[str]:
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i : i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(text: str) -> Tuple[int, ...]:
+    """
+    MinHash-сигнатура нормализованного текста по символьным 4-граммам.
+
+    Каждая шинга хэшируется один раз (blake2b, 64 бита), «перестановки» — XOR с
+    фиксированными масками, так что сигнатура стоит O(NUM_PERM * число шинглов)
+    дешёвых целочисленных операций.
+    """
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        for shingle in _shingles(text)
+    ]
+    return tuple(min(h ^ mask for h in hashes) & _MASK_64 for mask in _PERMUTATION_MASKS)
+
+
+def estimate_similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    """Оценка коэффициента Жаккара по двум MinHash-сигнатурам."""
+    return sum(1 for a, b in zip(left, right) if a == b) / NUM_PERM
+
+
+def similarity_scope(params: EnhanceRequest) -> str:
+    """
+    Область, внутри которой ответы взаимозаменяемы: все параметры, кроме initialPrompt.
+
+    Для текстовых моделей image-параметры не влияют на мета-промпт и в scope не входят.
+    """
+    data = params.model_dump(exclude={"initialPrompt"})
+    model_meta = get_model_meta(params.targetAiModel)
+    if model_meta is not None and not model_meta.is_image_model:
+        for field in _IMAGE_FIELDS:
+            data.pop(field, None)
+
+    normalized = {key: " ".join(str(value).lower().split()) for key, value in data.items()}
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+
+
+@dataclass
+class _Entry:
+    scope: str
+    signature: Tuple[int, ...]
+    enhanced_prompt: str
+
+
+class SimilarityIndex:
+    """
+    In-process индекс почти-дубликатов (MinHash + LSH) по нормализованному initialPrompt.
+
+    Если для запроса в том же scope нашёлся сохранённый промпт с оценкой похожести
+    >= threshold, возвращается его улучшенный вариант. Размер ограничен max_entries,
+    вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, threshold: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.stats: Dict[str, float] = {"lookups": 0, "hits": 0, "lookup_seconds": 0.0}
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _band_keys(scope: str, signature: Tuple[int, ...]) -> List[Tuple[str, int, Tuple[int, ...]]]:
+        return [
+            (scope, band, signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND])
+            for band in range(BANDS)
+        ]
+
+    def lookup(self, params: EnhanceRequest) -> Optional[str]:
+        started = time.perf_counter()
+        scope = similarity_scope(params)
+        signature = minhash_signature(normalize_prompt_text(params.initialPrompt))
+
+        best: Optional[Tuple[float, int]] = None
+        with self._lock:
+            candidates: Set[int] = set()
+            for key in self._band_keys(scope, signature):
+                candidates.update(self._buckets.get(key, ()))
+
+            for entry_id in candidates:
+                similarity = estimate_similarity(signature, self._entries[entry_id].signature)
+                if similarity >= self.threshold and (best is None or similarity > best[0]):
+                    best = (similarity, entry_id)
+
+            result = None
+            if best is not None:
+                self._entries.move_to_end(best[1])
+                result = self._entries[best[1]].enhanced_prompt
+                self.stats["hits"] += 1
+
+            self.stats["lookups"] += 1
+            self.stats["lookup_seconds"] += time.perf_counter() - started
+
+        return result
+
+    def add(self, params: EnhanceRequest, enhanced_prompt: str) -> None:
+        scope = similarity_scope(params)
+        signature = minhash_signature(normalize_prompt_text(params.initialPrompt))
+
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, signature, enhanced_prompt)
+            for key in self._band_keys(scope, signature):
+                self._buckets[key].append(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                old_id, old_entry = self._entries.popitem(last=False)
+                for key in self._band_keys(old_entry.scope, old_entry.signature):
+                    bucket = self._buckets.get(key)
+                    if bucket is None:
+                        continue
+                    bucket.remove(old_id)
+                    if not bucket:
+                        del self._buckets[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def approx_memory_bytes(self) -> int:
+        """
+        Грубая оценка занимаемой памяти: сигнатуры, тексты ответов и ключи корзин LSH.
+        """
+        per_signature = NUM_PERM * 8
+        entries = sum(per_signature + len(entry.enhanced_prompt) for entry in self._entries.values())
+        buckets = len(self._buckets) * (ROWS_PER_BAND * 8 + 64)
+        return entries + buckets
+
+    def snapshot(self) -> Dict[str, float]:
+        lookups = int(self.stats["lookups"])
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "hits": int(self.stats["hits"]),
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "avg_lookup_ms": round(self.stats["lookup_seconds"] / lookups * 1000, 3) if lookups else 0.0,
+            "approx_memory_bytes": self.approx_memory_bytes(),
+        }
+
+
+_similarity_index: Optional[SimilarityIndex] = None
+
+
+def get_similarity_index() -> Optional[SimilarityIndex]:
+    """
+    Возвращает singleton индекса почти-дубликатов или None, если он выключен
+    (NEAR_DUPLICATE_ENABLED=false).
+    """
+    global _similarity_index
+
+    settings = get_settings()
+    if not settings.near_duplicate_enabled:
+        return None
+
+    if _similarity_index is None:
+        _similarity_index = SimilarityIndex(
+            threshold=settings.near_duplicate_threshold,
+            max_entries=settings.near_duplicate_max_entries,
+        )
+
+    return _similarity_index
+
+
+async def seed_similarity_index_from_history() -> int:
+    """
+    Заполняет индекс последними записями prompt_history (не больше NEAR_DUPLICATE_SEED_ROWS).
+
+    Возвращает число добавленных записей. Ошибки БД логируются и не мешают старту.
+    """
+    index = get_similarity_index()
+    settings = get_settings()
+    if index is None or settings.near_duplicate_seed_rows <= 0:
+        return 0
+
+    from sqlalchemy import select
+
+    from app.db.session import get_async_session_factory
+    from app.models.prompt_history import PromptHistory
+    from app.models.prompt_params import PromptParams
+    from app.services.params_store import expand_params
+
+    query = (
+        select(
+            PromptParams.params_json,
+            PromptHistory.input_prompt,
+            PromptHistory.model_id,
+            PromptHistory.enhanced_prompt,
+        )
+        .join_from(PromptHistory, PromptParams, PromptParams.id == PromptHistory.params_id)
+        .order_by(PromptHistory.created_at.desc())
+        .limit(settings.near_duplicate_seed_rows)
+    )
+
+    try:
+        async with get_async_session_factory()() as session:
+            rows = (await session.execute(query)).all()
+    except Exception:
+        logger.exception("Failed to seed near-duplicate index from prompt_history")
+        return 0
+
+    added = 0
+    # Добавляем от старых к новым, чтобы самые свежие записи вытеснялись последними.
+    for row in reversed(rows):
+        try:
+            params = EnhanceRequest.model_validate(expand_params(row.params_json, row.input_prompt, row.model_id))
+        except ValueError:
+            continue
+        index.add(params, row.enhanced_prompt)
+        added += 1
+
+    return added
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.services.content_encoding import choose_encoding, compress_brotli, compress_gzip
+
+# Суффиксы предсжатых копий файлов.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+# Что имеет смысл сжимать: текст и форматы без собственного сжатия.
+COMPRESSIBLE_SUFFIXES = frozenset(
+    {".html", ".js", ".mjs", ".css", ".json", ".map", ".svg", ".txt", ".xml", ".webmanifest", ".ico", ".wasm"}
+)
+
+# Vite кладёт в assets/ файлы с хешем содержимого в имени (index-BkD3x9aZ.js):
+# их содержимое по этому URL никогда не меняется.
+_HASHED_ASSET = re.compile(r"^assets/.+[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def is_compressed_copy(path: Path) -> bool:
+    """.br/.gz рядом с исходником — его вариант, а не самостоятельный файл."""
+    return any(
+        path.name.endswith(suffix) and path.with_name(path.name[: -len(suffix)]).is_file()
+        for suffix in ENCODING_SUFFIXES.values()
+    )
+
+
+@dataclass(frozen=True)
+class AssetVariant:
+    """Одно представление файла: исходное или предсжатое (на диске или, для index.html, в памяти)."""
+
+    etag: str
+    path: Optional[Path] = None
+    stat: Optional[os.stat_result] = None
+    body: Optional[bytes] = None
+
+
+@dataclass(frozen=True)
+class Asset:
+    media_type: str
+    cache_control: str
+    # "identity", "br", "gzip" -> вариант.
+    variants: Dict[str, AssetVariant]
+
+
+def _content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def _media_type(path: Path) -> str:
+    media_type, _ = mimetypes.guess_type(path.name)
+    if media_type is None:
+        return "application/octet-stream"
+    if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+        return f"{media_type}; charset=utf-8"
+    return media_type
+
+
+def _cache_control(relative_path: str) -> str:
+    return IMMUTABLE_CACHE_CONTROL if _HASHED_ASSET.match(relative_path) else REVALIDATE_CACHE_CONTROL
+
+
+def _load_file(path: Path, relative_path: str) -> Asset:
+    stat = path.stat()
+    content_hash = _content_hash(path)
+    variants = {"identity": AssetVariant(etag=f'"{content_hash}"', path=path, stat=stat)}
+
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        compressed = path.with_name(path.name + suffix)
+        try:
+            compressed_stat = compressed.stat()
+        except FileNotFoundError:
+            continue
+        # Сжатая копия старше исходника — устарела, не отдаём её.
+        if compressed_stat.st_mtime >= stat.st_mtime:
+            variants[encoding] = AssetVariant(
+                etag=f'"{content_hash}-{encoding}"',
+                path=compressed,
+                stat=compressed_stat,
+            )
+
+    return Asset(media_type=_media_type(path), cache_control=_cache_control(relative_path), variants=variants)
+
+
+def _load_index(path: Path) -> Asset:
+    """index.html держим в памяти целиком, вместе с gzip/brotli-версиями."""
+    body = path.read_bytes()
+    content_hash = hashlib.sha256(body).hexdigest()[:32]
+    variants = {"identity": AssetVariant(etag=f'"{content_hash}"', body=body)}
+
+    compressed_bodies = {"gzip": compress_gzip(body), "br": compress_brotli(body)}
+    for encoding, compressed in compressed_bodies.items():
+        if compressed is not None and len(compressed) < len(body):
+            variants[encoding] = AssetVariant(etag=f'"{content_hash}-{encoding}"', body=compressed)
+
+    return Asset(media_type="text/html; charset=utf-8", cache_control=REVALIDATE_CACHE_CONTROL, variants=variants)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение для If-None-Match (RFC 9110): W/-префикс не учитывается."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class FrontendStaticFiles:
+    """
+    ASGI-приложение для собранного SPA (каталог dist).
+
+    - файлы индексируются один раз при первом запросе: stat, хеш содержимого и наличие
+      предсжатых .br/.gz рядом с файлом; на запрос диск больше не stat'ится;
+    - вариант выбирается по Accept-Encoding, ETag строгий (хеш содержимого + кодировка),
+      совпадение If-None-Match — 304 без тела;
+    - хешированные ассеты Vite (assets/*-<hash>.*) кэшируются навсегда (immutable),
+      index.html и прочие файлы — с обязательной ревалидацией (no-cache);
+    - index.html лежит в памяти и отдаётся для всех путей без расширения (SPA fallback).
+
+    Предсжатые файлы готовит `python -m app.cli.precompress_static`. Пересобранный dist
+    подхватывается после перезапуска процесса.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self._assets: Optional[Dict[str, Asset]] = None
+        self._index: Optional[Asset] = None
+
+    def _load(self) -> Dict[str, Asset]:
+        assets: Dict[str, Asset] = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = Path(root) / name
+                relative_path = path.relative_to(self.directory).as_posix()
+                if is_compressed_copy(path):
+                    continue
+                if relative_path == "index.html":
+                    self._index = _load_index(path)
+                    assets[relative_path] = self._index
+                else:
+                    assets[relative_path] = _load_file(path, relative_path)
+        return assets
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+
+        if self._assets is None:
+            self._assets = self._load()
+
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            response: Response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        response = self._response_for(scope)
+        await response(scope, receive, send)
+
+    def _response_for(self, scope: Scope) -> Response:
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path) :]
+        relative_path = path.lstrip("/")
+
+        assert self._assets is not None
+        asset = self._assets.get(relative_path) if relative_path else self._index
+        if asset is None:
+            # API и health-check сюда попадают только для несуществующих маршрутов.
+            if relative_path.startswith("api/") or relative_path == "health":
+                return JSONResponse({"detail": "Not Found"}, status_code=404)
+            # Отсутствующий файл (например, устаревший чанк) — 404, а не index.html под видом JS.
+            if "." in relative_path.rsplit("/", 1)[-1]:
+                return PlainTextResponse("Not Found", status_code=404)
+            if self._index is None:
+                return JSONResponse({"detail": "Frontend is not built (index.html missing)"}, status_code=404)
+            asset = self._index
+
+        return self._asset_response(scope, asset)
+
+    @staticmethod
+    def _asset_response(scope: Scope, asset: Asset) -> Response:
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), asset.variants.keys())
+        variant = asset.variants[encoding]
+
+        headers = {"ETag": variant.etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, variant.etag):
+            return Response(status_code=304, headers=headers)
+
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        if variant.body is not None:
+            response = Response(variant.body, media_type=asset.media_type, headers=headers)
+            if scope["method"] == "HEAD":
+                # Content-Length уже посчитан по телу; для HEAD само тело не отправляем.
+                response.body = b""
+            return response
+
+        assert variant.path is not None
+        return FileResponse(
+            variant.path,
+            stat_result=variant.stat,
+            media_type=asset.media_type,
+            headers=headers,
+        )
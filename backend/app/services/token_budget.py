@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import math
+import re
+
+# Маркер на месте вырезанной середины текста.
+TRUNCATION_MARKER = " […] "
+
+# Грубая оценка без токенизатора (вызов countTokens у Gemini — лишний сетевой запрос):
+# латиница — около 4 символов на токен, прочие алфавиты (кириллица, CJK) — заметно меньше.
+_ASCII_CHARS_PER_TOKEN = 4.0
+_OTHER_CHARS_PER_TOKEN = 1.5
+
+_SENTENCE_END = re.compile(r"[.!?。！？\n]\s*")
+
+
+def estimate_tokens(text: str) -> int:
+    """Оценка числа входных токенов текста (с запасом для нелатинских символов)."""
+    if not text:
+        return 0
+    ascii_chars = sum(1 for char in text if char.isascii())
+    other_chars = len(text) - ascii_chars
+    return math.ceil(ascii_chars / _ASCII_CHARS_PER_TOKEN + other_chars / _OTHER_CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Укорачивает текст так, чтобы оценка его токенов не превышала max_tokens: сохраняет
+    начало (2/3) и конец (1/3), середину заменяет маркером. Границы по возможности
+    сдвигаются к концу предложения, чтобы не обрывать фразы. Текст, который и так
+    укладывается в бюджет, не меняется; если в бюджет не влезает даже маркер — пустая строка.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= estimate_tokens(TRUNCATION_MARKER):
+        return ""
+
+    keep_chars = int(len(text) * max_tokens / tokens) - len(TRUNCATION_MARKER)
+    while keep_chars > 0:
+        truncated = _cut_middle(text, keep_chars)
+        excess = estimate_tokens(truncated) - max_tokens
+        if excess <= 0:
+            return truncated
+        # Оставленные края «дороже» среднего (например, в них больше кириллицы): режем ещё.
+        keep_chars -= max(1, excess * len(text) // tokens)
+    return ""
+
+
+def _cut_middle(text: str, keep_chars: int) -> str:
+    """Оставляет около keep_chars символов с краёв текста и вставляет маркер вместо середины."""
+    head_chars = keep_chars * 2 // 3
+    tail_chars = keep_chars - head_chars
+
+    head = text[:head_chars]
+    # Обрезаем голову по последней границе предложения, если она не слишком далеко.
+    boundaries = list(_SENTENCE_END.finditer(head))
+    if boundaries and boundaries[-1].end() >= head_chars // 2:
+        head = head[: boundaries[-1].end()]
+
+    tail = text[len(text) - tail_chars :] if tail_chars else ""
+    match = _SENTENCE_END.search(tail)
+    if match is not None and match.end() <= len(tail) // 2:
+        tail = tail[match.end() :]
+
+    return head.rstrip() + TRUNCATION_MARKER + tail.lstrip()
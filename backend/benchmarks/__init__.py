@@ -0,0 +1,8 @@
+"""
+Бенчмарки backend: микробенчмарки горячих функций, локальная заглушка Gemini API
+и нагрузочный драйвер для app.main:app. Запуск — из каталога backend:
+
+    python -m benchmarks.micro
+    python -m benchmarks.fake_gemini --port 8090
+    python -m benchmarks.load --concurrency 64 --duration 30
+"""
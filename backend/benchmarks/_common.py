@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+
+def configure_env(**defaults: str) -> None:
+    """Проставляет переменные окружения для замеров; явно заданные значения не трогаются."""
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def sample_request(index: int = 0, *, target_model: str = "gemini-advanced", **overrides: str) -> Dict[str, str]:
+    """Типичное тело EnhanceRequest; index делает initialPrompt уникальным."""
+    request = {
+        "initialPrompt": f"A lighthouse keeper's cat watching a storm roll in over the sea #{index}",
+        "targetAiModel": target_model,
+        "styleOrTone": "Cinematic",
+        "detailLevel": "Highly detailed",
+        "keywordsToAdd": "moody, dramatic clouds, golden hour",
+        "negativePrompts": "blurry, watermark",
+        "artisticMedium": "Digital painting",
+        "cameraAngle": "Wide shot",
+        "lighting": "Rim lighting",
+        "colorPalette": "Teal and orange",
+        "specificInstructions": "Keep the cat in the foreground.",
+        "promptLanguage": "en",
+    }
+    request.update(overrides)
+    return request
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Перцентиль по методу nearest-rank для уже отсортированной последовательности."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def write_json(path: Path, payload: Any) -> None:
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+
+def load_json(path: Path) -> Any:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max в миллисекундах."""
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 3),
+    }
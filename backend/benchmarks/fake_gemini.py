@@ -0,0 +1,213 @@
+"""
+Локальная заглушка Gemini Developer API для нагрузочных тестов и работы офлайн.
+
+Поддерживает generateContent и streamGenerateContent (SSE) в формате REST API, поэтому
+google-genai подключается к ней без изменений кода: достаточно GEMINI_API_BASE_URL.
+
+    python -m benchmarks.fake_gemini --port 8090 --latency-ms 800 --latency-sigma 0.5 --error-rate 0.01
+    GEMINI_API_BASE_URL=http://127.0.0.1:8090 GEMINI_API_KEY=fake uvicorn app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+_STATUS_NAMES = {
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+_DEFAULT_TEXT = (
+    "Here is the enhanced prompt:\n\n"
+    "A ginger cat perched on the gallery of a weathered stone lighthouse, fur ruffled by the wind, "
+    "watching towering storm clouds roll in over a dark, choppy sea at golden hour; cinematic wide shot, "
+    "rim lighting, teal and orange palette, highly detailed digital painting."
+)
+
+
+@dataclass
+class FakeGeminiConfig:
+    """
+    Поведение заглушки.
+
+    Латентность ответа — логнормальная с медианой latency_ms и разбросом latency_sigma
+    (0 — фиксированная), не больше latency_max_ms. С вероятностью error_rate вместо ответа
+    возвращается ошибка error_status. Стрим отдаёт текст stream_chunks фрагментами:
+    первый — через латентность ответа, остальные — через stream_chunk_delay_ms.
+    """
+
+    latency_ms: float = 500.0
+    latency_sigma: float = 0.0
+    latency_max_ms: float = 30000.0
+    error_rate: float = 0.0
+    error_status: int = 503
+    stream_chunks: int = 8
+    stream_chunk_delay_ms: float = 20.0
+    response_text: str = _DEFAULT_TEXT
+    seed: Optional[int] = None
+
+
+class FakeGemini:
+    def __init__(self, config: FakeGeminiConfig) -> None:
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "streams": 0}
+
+    def latency(self) -> float:
+        config = self.config
+        value = config.latency_ms
+        if config.latency_sigma > 0:
+            value *= math.exp(self.random.gauss(0.0, config.latency_sigma))
+        return min(value, config.latency_max_ms) / 1000
+
+    def should_fail(self) -> bool:
+        return self.config.error_rate > 0 and self.random.random() < self.config.error_rate
+
+    def error_response(self) -> JSONResponse:
+        self.stats["errors"] += 1
+        status_code = self.config.error_status
+        payload = {
+            "error": {
+                "code": status_code,
+                "message": "Injected by fake Gemini server.",
+                "status": _STATUS_NAMES.get(status_code, "UNKNOWN"),
+            }
+        }
+        return JSONResponse(payload, status_code=status_code)
+
+    @staticmethod
+    def response_payload(text: str, model: str, finished: bool = True) -> Dict[str, object]:
+        candidate: Dict[str, object] = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if finished:
+            candidate["finishReason"] = "STOP"
+        return {"candidates": [candidate], "modelVersion": model}
+
+    async def handle(self, request: Request) -> Response:
+        model, method = _split_target(request.path_params["target"])
+        self.stats["requests"] += 1
+
+        await asyncio.sleep(self.latency())
+        if self.should_fail():
+            return self.error_response()
+
+        if method == "generateContent":
+            return JSONResponse(self.response_payload(self.config.response_text, model))
+        if method == "streamGenerateContent":
+            self.stats["streams"] += 1
+            return StreamingResponse(self._stream(model), media_type="text/event-stream")
+        return JSONResponse({"error": {"code": 404, "message": f"Unsupported method {method}.", "status": "NOT_FOUND"}}, 404)
+
+    async def _stream(self, model: str) -> AsyncIterator[bytes]:
+        text = self.config.response_text
+        count = max(1, self.config.stream_chunks)
+        size = math.ceil(len(text) / count)
+        pieces = [text[i : i + size] for i in range(0, len(text), size)] or [""]
+        for index, piece in enumerate(pieces):
+            if index:
+                await asyncio.sleep(self.config.stream_chunk_delay_ms / 1000)
+            payload = self.response_payload(piece, model, finished=index == len(pieces) - 1)
+            yield f"data: {json.dumps(payload)}\r\n\r\n".encode("utf-8")
+
+
+def _split_target(target: str) -> Tuple[str, str]:
+    model, _, method = target.partition(":")
+    return model, method
+
+
+def create_app(config: FakeGeminiConfig) -> Starlette:
+    fake = FakeGemini(config)
+
+    async def stats(_: Request) -> JSONResponse:
+        return JSONResponse(fake.stats)
+
+    app = Starlette(
+        routes=[
+            Route("/{version}/models/{target:path}", fake.handle, methods=["POST"]),
+            Route("/stats", stats, methods=["GET"]),
+        ]
+    )
+    app.state.fake = fake
+    return app
+
+
+class FakeGeminiServer:
+    """Заглушка в фоновом потоке со своим event loop — не мешает измерять loop приложения."""
+
+    def __init__(self, config: FakeGeminiConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.app = create_app(config)
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, name="fake-gemini", daemon=True)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self.app.state.fake.stats
+
+    def start(self, timeout: float = 10.0) -> str:
+        """Запускает сервер и возвращает его базовый URL."""
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline or not self.thread.is_alive():
+                raise RuntimeError("Fake Gemini server failed to start.")
+            time.sleep(0.01)
+        host, port = self.server.servers[0].sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = FakeGeminiConfig()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Медианная латентность ответа, мс.")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="Разброс логнормальной латентности.")
+    parser.add_argument("--latency-max-ms", type=float, default=defaults.latency_max_ms, help="Верхняя граница латентности, мс.")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Доля ответов с ошибкой (0..1).")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status, help="HTTP-статус ошибки (429, 500, 503...).")
+    parser.add_argument("--stream-chunks", type=int, default=defaults.stream_chunks, help="Число фрагментов в стриме.")
+    parser.add_argument(
+        "--stream-chunk-delay-ms", type=float, default=defaults.stream_chunk_delay_ms, help="Пауза между фрагментами, мс."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed генератора латентности и ошибок.")
+
+
+def config_from_args(args: argparse.Namespace) -> FakeGeminiConfig:
+    return FakeGeminiConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        latency_max_ms=args.latency_max_ms,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_chunks=args.stream_chunks,
+        stream_chunk_delay_ms=args.stream_chunk_delay_ms,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
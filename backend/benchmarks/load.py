@@ -0,0 +1,220 @@
+"""
+Нагрузочный драйвер: гоняет запросы к app.main:app и печатает RPS, p50/p95/p99
+латентности, распределение статусов и задержку event loop.
+
+По умолчанию приложение запускается в этом же процессе (через ASGI, без сети), а Gemini
+заменяется локальной заглушкой из benchmarks.fake_gemini — так задержка event loop
+измеряется у самого приложения. С --url нагружается уже запущенный сервер по HTTP
+(задержка loop тогда относится к драйверу).
+
+    python -m benchmarks.load --concurrency 64 --duration 30 --latency-ms 800 --latency-sigma 0.4
+    python -m benchmarks.load --endpoint stream --unique-ratio 1.0 --json result.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --requests 5000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from contextlib import AsyncExitStack
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks._common import configure_env, percentile, sample_request, summarize_latencies, write_json
+from benchmarks.fake_gemini import FakeGeminiServer, add_config_arguments, config_from_args
+
+_ENDPOINTS = {
+    "enhance": "/api/v1/enhance",
+    "stream": "/api/v1/enhance/stream",
+    "batch": "/api/v1/enhance/batch",
+}
+
+
+class LoopLagMonitor:
+    """Раз в interval секунд замеряет, насколько позже заказанного event loop разбудил корутину."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        return {
+            "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+            "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 3),
+        }
+
+
+class RequestFactory:
+    """
+    Тела запросов: доля unique_ratio уникальна (промахи кэша), остальные выбираются
+    из небольшого набора повторяющихся промптов (попадания в кэш и single-flight).
+    """
+
+    def __init__(self, endpoint: str, unique_ratio: float, batch_size: int, seed: Optional[int]) -> None:
+        self.endpoint = endpoint
+        self.unique_ratio = unique_ratio
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    def _item(self) -> Dict[str, str]:
+        self.counter += 1
+        if self.random.random() < self.unique_ratio:
+            return sample_request(self.counter)
+        return sample_request(-self.random.randrange(16))
+
+    def body(self) -> Dict[str, Any]:
+        if self.endpoint == "batch":
+            return {"items": [self._item() for _ in range(self.batch_size)]}
+        return self._item()
+
+
+async def _worker(
+    client: httpx.AsyncClient,
+    path: str,
+    factory: RequestFactory,
+    stop_at: float,
+    remaining: List[int],
+    latencies: List[float],
+    statuses: Counter,
+) -> None:
+    while time.monotonic() < stop_at:
+        if remaining[0] <= 0:
+            return
+        remaining[0] -= 1
+        started = time.perf_counter()
+        try:
+            response = await client.post(path, json=factory.body())
+            status = str(response.status_code)
+        except httpx.HTTPError as exc:
+            status = type(exc).__name__
+        latencies.append(time.perf_counter() - started)
+        statuses[status] += 1
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    factory = RequestFactory(args.endpoint, args.unique_ratio, args.batch_size, args.seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    remaining = [args.requests if args.requests else sys.maxsize]
+    fake_server: Optional[FakeGeminiServer] = None
+
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=httpx.Limits(max_connections=None))
+        else:
+            fake_server = FakeGeminiServer(config_from_args(args))
+            stack.callback(fake_server.stop)
+            configure_env(
+                GEMINI_API_BASE_URL=fake_server.start(),
+                GEMINI_API_KEY="benchmark",
+                HISTORY_ENABLED="false",
+                RATE_LIMIT_ENABLED="false",
+            )
+            from app.main import app
+
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            # Холодный импорт google.genai — разовая стоимость старта, а не задержка loop под
+            # нагрузкой: дожидаемся клиента (вместе с фоновым прогревом приложения) до замера.
+            from app.services.gemini_client import warm_up_gemini_client
+
+            await asyncio.to_thread(warm_up_gemini_client)
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=args.timeout)
+        await stack.enter_async_context(client)
+
+        if args.warmup:
+            await asyncio.gather(*(client.post(_ENDPOINTS[args.endpoint], json=factory.body()) for _ in range(args.warmup)))
+
+        monitor = LoopLagMonitor(args.loop_lag_interval_ms / 1000)
+        monitor.start()
+        started = time.perf_counter()
+        stop_at = time.monotonic() + (args.duration if args.duration else float("inf"))
+        await asyncio.gather(
+            *(
+                _worker(client, _ENDPOINTS[args.endpoint], factory, stop_at, remaining, latencies, statuses)
+                for _ in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+
+    result: Dict[str, Any] = {
+        "endpoint": args.endpoint,
+        "concurrency": args.concurrency,
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize_latencies(latencies),
+        "statuses": dict(sorted(statuses.items())),
+        "loop_lag": monitor.summary(),
+    }
+    if fake_server is not None:
+        result["upstream"] = dict(fake_server.stats)
+    return result
+
+
+def _print_report(result: Dict[str, Any]) -> None:
+    latency, lag = result["latency"], result["loop_lag"]
+    print(f"endpoint     {result['endpoint']} (concurrency {result['concurrency']})")
+    print(f"requests     {result['requests']} in {result['elapsed_s']}s -> {result['rps']} req/s")
+    print(f"latency      p50 {latency['p50_ms']}ms  p95 {latency['p95_ms']}ms  p99 {latency['p99_ms']}ms  max {latency['max_ms']}ms")
+    print(f"statuses     {result['statuses']}")
+    print(f"loop lag     p50 {lag['p50_ms']}ms  p99 {lag['p99_ms']}ms  max {lag['max_ms']}ms")
+    if "upstream" in result:
+        print(f"upstream     {result['upstream']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Нагружать уже запущенный сервер вместо app.main:app в процессе.")
+    parser.add_argument("--endpoint", choices=sorted(_ENDPOINTS), default="enhance")
+    parser.add_argument("--concurrency", type=int, default=32, help="Число одновременных клиентов.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность, с (0 — до --requests).")
+    parser.add_argument("--requests", type=int, default=0, help="Общее число запросов (0 — без ограничения).")
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=8,
+        help="Сколько запросов отправить до замера (0 — замерить и холодный старт).",
+    )
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="Доля уникальных промптов (остальные повторяются).")
+    parser.add_argument("--batch-size", type=int, default=10, help="Размер пакета для --endpoint batch.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Таймаут одного запроса, с.")
+    parser.add_argument("--loop-lag-interval-ms", type=float, default=10.0, help="Период замера задержки event loop, мс.")
+    parser.add_argument("--json", type=Path, help="Сохранить результат в JSON.")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    if not args.duration and not args.requests:
+        parser.error("Set --duration or --requests.")
+
+    result = asyncio.run(run_load(args))
+    _print_report(result)
+    if args.json:
+        write_json(args.json, result)
+
+
+if __name__ == "__main__":
+    main()
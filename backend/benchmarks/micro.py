@@ -0,0 +1,119 @@
+"""
+Микробенчмарки горячих функций конвейера улучшения.
+
+    python -m benchmarks.micro                          # таблица результатов
+    python -m benchmarks.micro --json out.json          # сохранить результаты
+    python -m benchmarks.micro --compare baseline.json  # код выхода 1 при регрессии
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks._common import configure_env, load_json, sample_request, write_json
+
+configure_env()
+
+from app.models_meta import get_model_meta  # noqa: E402
+from app.schemas.enhancement import EnhanceRequest  # noqa: E402
+from app.services.fingerprint import request_fingerprint  # noqa: E402
+from app.services.gemini_client import StreamingOutputCleaner, _clean_gemini_output  # noqa: E402
+from app.services.prompt_engine import build_meta_prompt  # noqa: E402
+
+_ENHANCED_BODY = (
+    "A ginger cat sits on the gallery of an old stone lighthouse, fur ruffled by the wind, "
+    "watching towering storm clouds roll in over a dark, choppy sea. " * 6
+).strip()
+
+_RAW_WITH_PREAMBLE = f"Here is the enhanced prompt:\n\n```\n{_ENHANCED_BODY}\n```\n"
+
+
+def _benchmarks() -> List[Tuple[str, Callable[[], object]]]:
+    text_params = EnhanceRequest(**sample_request(target_model="gemini-advanced"))
+    image_params = EnhanceRequest(**sample_request(target_model="midjourney"))
+    text_meta = get_model_meta(text_params.targetAiModel)
+    image_meta = get_model_meta(image_params.targetAiModel)
+    assert text_meta is not None and image_meta is not None
+    meta_prompt = build_meta_prompt(text_params, text_meta)
+    chunks = [_RAW_WITH_PREAMBLE[i : i + 24] for i in range(0, len(_RAW_WITH_PREAMBLE), 24)]
+
+    def stream_clean() -> str:
+        cleaner = StreamingOutputCleaner(text_meta)
+        parts = [cleaner.feed(chunk) for chunk in chunks]
+        parts.append(cleaner.finish())
+        return "".join(parts)
+
+    return [
+        ("build_meta_prompt[text]", lambda: build_meta_prompt(text_params, text_meta)),
+        ("build_meta_prompt[image]", lambda: build_meta_prompt(image_params, image_meta)),
+        ("clean_gemini_output[preamble+fence]", lambda: _clean_gemini_output(_RAW_WITH_PREAMBLE, text_meta)),
+        ("clean_gemini_output[plain]", lambda: _clean_gemini_output(_ENHANCED_BODY, text_meta)),
+        ("streaming_output_cleaner[24b chunks]", stream_clean),
+        ("request_fingerprint", lambda: request_fingerprint(text_params, meta_prompt, "gemini-2.5-flash")),
+    ]
+
+
+def run(repeat: int, min_time: float) -> Dict[str, Dict[str, float]]:
+    """Каждый бенчмарк: число итераций подбирается под min_time, затем repeat замеров."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, func in _benchmarks():
+        timer = timeit.Timer(func)
+        number, elapsed = timer.autorange()
+        if elapsed < min_time:
+            number = max(number, int(number * min_time / max(elapsed, 1e-9)))
+        per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+        results[name] = {
+            "best_us": round(min(per_call) * 1e6, 3),
+            "median_us": round(statistics.median(per_call) * 1e6, 3),
+            "loops": number,
+        }
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """Бенчмарки, у которых лучший результат хуже baseline больше чем на tolerance."""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and current["best_us"] > previous["best_us"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: {previous['best_us']:.3f}us -> {current['best_us']:.3f}us "
+                f"(+{(current['best_us'] / previous['best_us'] - 1) * 100:.1f}%)"
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Число замеров на бенчмарк (по умолчанию 5).")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Минимальная длительность одного замера, с.")
+    parser.add_argument("--json", type=Path, help="Сохранить результаты в JSON.")
+    parser.add_argument("--compare", type=Path, help="JSON с базовыми результатами для сравнения.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Допустимое замедление относительно baseline (по умолчанию 0.2 = 20%%)."
+    )
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.min_time)
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'best, us':>10}  {'median, us':>10}  {'loops':>8}")
+    for name, result in results.items():
+        print(f"{name:<{width}}  {result['best_us']:>10.3f}  {result['median_us']:>10.3f}  {result['loops']:>8}")
+
+    if args.json:
+        write_json(args.json, results)
+
+    if args.compare:
+        regressions = compare(results, load_json(args.compare), args.tolerance)
+        if regressions:
+            print("\nRegressions:", *regressions, sep="\n  ", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
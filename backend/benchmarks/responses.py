@@ -0,0 +1,155 @@
+"""
+Сколько CPU на запрос стоит отдача ответа: прежний путь FastAPI (валидация и
+сериализация по response_model в dict + json.dumps) против FastJSONResponse
+(pydantic-core пишет модель сразу в JSON), и цена/выигрыш gzip/brotli-сжатия
+с настройками API по умолчанию.
+
+    python -m benchmarks.responses
+    python -m benchmarks.responses --json out.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import BaseModel
+
+from benchmarks._common import configure_env, sample_request, write_json
+
+configure_env()
+
+from app.api.responses import FastJSONResponse  # noqa: E402
+from app.core.config import get_settings  # noqa: E402
+from app.schemas.enhancement import BatchEnhanceItemResult, BatchEnhanceResponse, EnhanceResponse  # noqa: E402
+from app.schemas.history import HistoryItem, HistoryPage  # noqa: E402
+from app.services.content_encoding import compress_brotli, compress_gzip  # noqa: E402
+
+_ENHANCED = (
+    "A ginger cat perched on the gallery of a weathered stone lighthouse, fur ruffled by the wind, "
+    "watching towering storm clouds roll in over a dark, choppy sea at golden hour; cinematic wide shot, "
+    "rim lighting, teal and orange palette, highly detailed digital painting. "
+) * 4
+
+
+def _payloads() -> List[Tuple[str, BaseModel, bool]]:
+    """(имя, модель ответа, exclude_none как у эндпоинта)."""
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    history = HistoryPage(
+        items=[
+            HistoryItem(
+                id=uuid.uuid4(),
+                modelId="midjourney",
+                provider="gemini",
+                inputPrompt=sample_request(i)["initialPrompt"],
+                enhancedPrompt=_ENHANCED,
+                createdAt=created_at - timedelta(minutes=i),
+                params=sample_request(i, target_model="midjourney"),
+            )
+            for i in range(100)
+        ],
+        nextCursor="eyJjIjoiMjAyNS0wMS0wMVQwMDowMDowMCIsImkiOiIwIn0",
+    )
+    batch = BatchEnhanceResponse(
+        results=[BatchEnhanceItemResult(index=i, status=200, enhancedPrompt=_ENHANCED) for i in range(50)]
+    )
+    return [
+        ("enhance", EnhanceResponse(enhancedPrompt=_ENHANCED), False),
+        ("batch[50]", batch, False),
+        ("history[100, params]", history, True),
+    ]
+
+
+def _time_per_call(func: Callable[[], Any], min_time: float) -> float:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / number
+        number *= 2
+
+
+def _time_per_call_async(func: Callable[[], Any], min_time: float) -> float:
+    async def run() -> float:
+        number = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(number):
+                await func()
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                return elapsed / number
+            number *= 2
+
+    return asyncio.run(run())
+
+
+def run(min_time: float) -> Dict[str, Dict[str, Any]]:
+    settings = get_settings()
+    results: Dict[str, Dict[str, Any]] = {}
+
+    for name, model, exclude_none in _payloads():
+        field = create_model_field(name=f"Response_{type(model).__name__}", type_=type(model), mode="serialization")
+
+        async def default_path() -> bytes:
+            content = await serialize_response(field=field, response_content=model, exclude_none=exclude_none)
+            return JSONResponse(content).body
+
+        def fast_path() -> bytes:
+            return FastJSONResponse(model, exclude_none=exclude_none).body
+
+        body = fast_path()
+        default_us = _time_per_call_async(default_path, min_time) * 1e6
+        fast_us = _time_per_call(fast_path, min_time) * 1e6
+        gzip_us = _time_per_call(lambda: compress_gzip(body, settings.api_compression_gzip_level), min_time) * 1e6
+        gzip_size = len(compress_gzip(body, settings.api_compression_gzip_level))
+        brotli_body = compress_brotli(body, settings.api_compression_brotli_quality)
+
+        result: Dict[str, Any] = {
+            "bytes": len(body),
+            "default_us": round(default_us, 1),
+            "fast_us": round(fast_us, 1),
+            "saved_us": round(default_us - fast_us, 1),
+            "speedup": round(default_us / fast_us, 2),
+            "gzip_bytes": gzip_size,
+            "gzip_us": round(gzip_us, 1),
+        }
+        if brotli_body is not None:
+            brotli_us = _time_per_call(
+                lambda: compress_brotli(body, settings.api_compression_brotli_quality), min_time
+            ) * 1e6
+            result.update(br_bytes=len(brotli_body), br_us=round(brotli_us, 1))
+        results[name] = result
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-time", type=float, default=0.3, help="Минимальная длительность замера, с.")
+    parser.add_argument("--json", type=Path, help="Сохранить результаты в JSON.")
+    args = parser.parse_args()
+
+    results = run(args.min_time)
+    print(f"{'payload':<22}{'bytes':>9}{'default, us':>13}{'fast, us':>10}{'saved, us':>11}{'x':>7}"
+          f"{'gzip bytes':>12}{'gzip, us':>10}{'br bytes':>10}{'br, us':>8}")
+    for name, r in results.items():
+        print(
+            f"{name:<22}{r['bytes']:>9}{r['default_us']:>13}{r['fast_us']:>10}{r['saved_us']:>11}{r['speedup']:>7}"
+            f"{r['gzip_bytes']:>12}{r['gzip_us']:>10}{r.get('br_bytes', '-'):>10}{r.get('br_us', '-'):>8}"
+        )
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Замер холодного старта: время импорта app.main в свежем интерпретаторе и время
+от запуска процесса uvicorn до первого успешного ответа /health.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --import-budget-ms 700 --health-budget-ms 1500   # код выхода 1 при превышении
+    python -m benchmarks.startup --top 15                                         # самые тяжёлые импорты
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks._common import write_json
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def _child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    # Без базы сервер стартует только с выключенной записью истории.
+    if not env.get("DATABASE_URL"):
+        env.setdefault("HISTORY_ENABLED", "false")
+    return env
+
+
+def measure_import(runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET],
+            cwd=BACKEND_DIR,
+            env=_child_env(),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return samples
+
+
+def heaviest_imports(limit: int) -> List[Tuple[str, float]]:
+    """Модули верхнего уровня import app.main с наибольшим накопленным временем (по -X importtime)."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        env=_child_env(),
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        # Отступ в 1-2 пробела — прямые импорты app.main и его ближайших зависимостей.
+        if match and len(match.group(3)) <= 3:
+            modules.append((match.group(4), int(match.group(2)) / 1e6))
+    return sorted(modules, key=lambda item: item[1], reverse=True)[:limit]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_time_to_health(runs: int, timeout: float) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        port = _free_port()
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env=_child_env(),
+        )
+        try:
+            with httpx.Client(timeout=1.0) as client:
+                while True:
+                    if time.perf_counter() - started > timeout:
+                        raise RuntimeError("Server did not become healthy in time.")
+                    if process.poll() is not None:
+                        raise RuntimeError(f"Server exited with code {process.returncode}.")
+                    try:
+                        if client.get(f"http://127.0.0.1:{port}/health").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    time.sleep(0.005)
+            samples.append(time.perf_counter() - started)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    return samples
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Число запусков каждого замера.")
+    parser.add_argument("--import-budget-ms", type=float, help="Бюджет медианного времени импорта app.main, мс.")
+    parser.add_argument("--health-budget-ms", type=float, help="Бюджет медианного времени до ответа /health, мс.")
+    parser.add_argument("--health-timeout", type=float, default=30.0, help="Сколько ждать /health, с.")
+    parser.add_argument("--skip-health", action="store_true", help="Не запускать uvicorn, мерить только импорт.")
+    parser.add_argument("--top", type=int, default=0, help="Показать N самых тяжёлых импортов.")
+    parser.add_argument("--json", type=Path, help="Сохранить результаты в JSON.")
+    args = parser.parse_args()
+
+    results: Dict[str, float] = {}
+    failures = []
+
+    import_ms = statistics.median(measure_import(args.runs)) * 1000
+    results["import_app_main_ms"] = round(import_ms, 1)
+    print(f"import app.main      median {import_ms:.1f}ms")
+    if args.import_budget_ms is not None and import_ms > args.import_budget_ms:
+        failures.append(f"import app.main: {import_ms:.1f}ms > budget {args.import_budget_ms:g}ms")
+
+    if not args.skip_health:
+        health_ms = statistics.median(measure_time_to_health(args.runs, args.health_timeout)) * 1000
+        results["time_to_health_ms"] = round(health_ms, 1)
+        print(f"spawn -> /health 200 median {health_ms:.1f}ms")
+        if args.health_budget_ms is not None and health_ms > args.health_budget_ms:
+            failures.append(f"time to /health: {health_ms:.1f}ms > budget {args.health_budget_ms:g}ms")
+
+    if args.top:
+        print("\nheaviest imports (cumulative):")
+        for module, seconds in heaviest_imports(args.top):
+            print(f"  {seconds * 1000:8.1f}ms  {module}")
+
+    if args.json:
+        write_json(args.json, results)
+
+    if failures:
+        print("\nBudget exceeded:", *failures, sep="\n  ", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
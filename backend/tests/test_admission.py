@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from app.middleware import admission
+from app.middleware.admission import AdmissionControlMiddleware, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(admission.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_allows_burst_then_limits(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_take() == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_rate_up_to_burst(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    for _ in range(3):
+        bucket.try_take()
+
+    clock.now += 0.5
+    assert bucket.try_take() == 0.0
+    assert bucket.try_take() > 0.0
+
+    clock.now += 60
+    assert [bucket.try_take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_take() > 0.0
+
+
+def test_rate_limit_is_disabled_by_default(settings_env):
+    assert settings_env().rate_limit_enabled is False
+
+
+def _scope(client_ip="203.0.113.7", headers=()):
+    return {
+        "type": "http",
+        "path": "/api/v1/enhance",
+        "client": (client_ip, 50000),
+        "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+    }
+
+
+def _middleware(settings_env, **env):
+    settings_env(RATE_LIMIT_ENABLED="true", RATE_LIMIT_PER_SECOND="1", RATE_LIMIT_BURST="2", **env)
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    return AdmissionControlMiddleware(app)
+
+
+def _status(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"]
+
+
+def test_unknown_api_keys_share_the_ip_bucket(settings_env, clock):
+    middleware = _middleware(settings_env, RATE_LIMIT_API_KEYS="trusted")
+
+    statuses = [_status(middleware, _scope(headers=[("X-API-Key", f"rotating-{i}")])) for i in range(3)]
+
+    assert statuses == [200, 200, 429]
+    assert len(middleware._buckets) == 1
+
+
+def test_allow_listed_api_key_gets_own_bucket(settings_env, clock):
+    middleware = _middleware(settings_env, RATE_LIMIT_API_KEYS="trusted")
+    for _ in range(2):
+        _status(middleware, _scope())
+
+    assert _status(middleware, _scope()) == 429
+    assert _status(middleware, _scope(headers=[("X-API-Key", "trusted")])) == 200
+
+
+def test_forwarded_for_uses_address_appended_by_proxy(settings_env, clock):
+    middleware = _middleware(settings_env, TRUST_FORWARDED_FOR="true")
+
+    statuses = [
+        _status(middleware, _scope("10.0.0.1", [("X-Forwarded-For", f"198.51.100.{i}, 203.0.113.7")]))
+        for i in range(3)
+    ]
+
+    assert statuses == [200, 200, 429]
+    assert list(middleware._buckets) == ["ip:203.0.113.7"]
@@ -0,0 +1,35 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+
+from app.api.routes import enhancement
+from app.schemas.enhancement import BatchEnhanceRequest
+
+from .test_single_flight import REQUEST
+
+
+def test_batch_item_errors_do_not_fail_the_batch(monkeypatch, settings_env, caplog):
+    settings_env(HISTORY_ENABLED="false", BATCH_MAX_PARALLELISM="2")
+
+    async def enhance(request, *, use_cache=True):
+        if request.initialPrompt == "timeout":
+            raise asyncio.TimeoutError
+        if request.initialPrompt == "busy":
+            raise HTTPException(status_code=503, detail="Gemini API is temporarily unavailable")
+        return f"enhanced {request.initialPrompt}"
+
+    monkeypatch.setattr(enhancement, "enhance_prompt_with_gemini_async", enhance)
+    batch = BatchEnhanceRequest(
+        items=[{**REQUEST, "initialPrompt": prompt} for prompt in ("a cat", "timeout", "busy", "a dog")]
+    )
+
+    with caplog.at_level("ERROR", logger=enhancement.logger.name):
+        response = asyncio.run(enhancement.enhance_prompt_batch(batch, cache_bypass=False))
+
+    results = json.loads(response.body)["results"]
+    assert [(result["index"], result["status"]) for result in results] == [(0, 200), (1, 500), (2, 503), (3, 200)]
+    assert results[0]["enhancedPrompt"] == "enhanced a cat"
+    assert results[1] == {"index": 1, "status": 500, "enhancedPrompt": None, "detail": "Internal Server Error"}
+    assert results[2]["detail"] == "Gemini API is temporarily unavailable"
+    assert [record.exc_info[0] for record in caplog.records] == [asyncio.TimeoutError]
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from app.cli import bulk_enhance
+from app.cli.bulk_enhance import Checkpoint
+
+from .test_single_flight import REQUEST
+
+
+@pytest.fixture
+def fake_enhance(monkeypatch):
+    calls = []
+
+    async def enhance(request, *, use_cache=True):
+        calls.append(request.initialPrompt)
+        return f"enhanced {request.initialPrompt}"
+
+    monkeypatch.setattr(bulk_enhance, "enhance_prompt_with_gemini_async", enhance)
+    return calls
+
+
+@pytest.fixture
+def files(tmp_path):
+    source = tmp_path / "prompts.jsonl"
+    lines = [json.dumps({**REQUEST, "initialPrompt": f"prompt {index}", "id": index}) for index in range(1, 6)]
+    source.write_text("\n".join(lines[:2] + ["not json"] + lines[2:]) + "\n", encoding="utf-8")
+    return source, tmp_path / "enhanced.jsonl", tmp_path / "enhanced.ckpt"
+
+
+def _args(source, output, checkpoint, *extra):
+    return ["--input", str(source), "--output", str(output), "--checkpoint", str(checkpoint), *extra]
+
+
+def _results(output):
+    return [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+
+
+def test_writes_results_in_input_order(fake_enhance, files):
+    source, output, checkpoint = files
+
+    assert bulk_enhance.main(_args(source, output, checkpoint, "--concurrency", "3")) == 0
+
+    results = _results(output)
+    assert [result["line"] for result in results] == [1, 2, 3, 4, 5, 6]
+    assert [result["status"] for result in results] == [200, 200, 422, 200, 200, 200]
+    assert results[0] == {"line": 1, "id": 1, "status": 200, "enhancedPrompt": "enhanced prompt 1", "detail": None}
+    assert Checkpoint.load(checkpoint) == Checkpoint(input_line=6, output_bytes=output.stat().st_size)
+
+
+def test_resume_continues_after_checkpoint(fake_enhance, files):
+    source, output, checkpoint = files
+    bulk_enhance.main(_args(source, output, checkpoint))
+    full_output = output.read_bytes()
+    first_two = b"".join(full_output.splitlines(keepends=True)[:2])
+    # Прерванный запуск: после чекпоинта успела записаться ещё полстроки.
+    output.write_bytes(first_two + b'{"line": 3, "trunc')
+    Checkpoint(input_line=2, output_bytes=len(first_two)).save(checkpoint)
+    fake_enhance.clear()
+
+    assert bulk_enhance.main(_args(source, output, checkpoint, "--resume")) == 0
+
+    assert output.read_bytes() == full_output
+    assert fake_enhance == ["prompt 3", "prompt 4", "prompt 5"]
+
+
+@pytest.mark.parametrize("remaining_output", [None, b'{"line": 1}\n'])
+def test_resume_refuses_missing_or_short_output(fake_enhance, files, remaining_output, capsys):
+    source, output, checkpoint = files
+    Checkpoint(input_line=4, output_bytes=400).save(checkpoint)
+    if remaining_output is not None:
+        output.write_bytes(remaining_output)
+
+    assert bulk_enhance.main(_args(source, output, checkpoint, "--resume")) == 2
+
+    assert "Cannot resume" in capsys.readouterr().err
+    assert fake_enhance == []
+    assert Checkpoint.load(checkpoint) == Checkpoint(input_line=4, output_bytes=400)
+    assert (output.read_bytes() if output.exists() else None) == remaining_output
+
+
+def test_resume_without_checkpoint_file_starts_over(fake_enhance, files):
+    source, output, checkpoint = files
+
+    assert bulk_enhance.main(_args(source, output, checkpoint, "--resume")) == 0
+
+    assert len(_results(output)) == 6
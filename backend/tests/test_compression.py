@@ -0,0 +1,114 @@
+import asyncio
+import gzip
+
+import pytest
+
+from app.middleware.compression import APICompressionMiddleware
+from app.services.content_encoding import brotli
+
+LARGE_JSON = b'{"enhancedPrompt": "' + b"a cat in space, " * 200 + b'"}'
+
+
+def _app(body_chunks, content_type="application/json", extra_headers=()):
+    async def app(scope, receive, send):
+        headers = [(b"content-type", content_type.encode()), *extra_headers]
+        if len(body_chunks) == 1:
+            headers.append((b"content-length", str(len(body_chunks[0])).encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        for index, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(body_chunks) - 1})
+
+    return app
+
+
+def _call(app, accept_encoding=None, path="/api/v1/enhance"):
+    headers = [(b"accept-encoding", accept_encoding.encode())] if accept_encoding is not None else []
+    scope = {"type": "http", "method": "POST", "path": path, "headers": headers}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(APICompressionMiddleware(app)(scope, receive, send))
+    start, *bodies = messages
+    headers = {name.decode(): value.decode() for name, value in start["headers"]}
+    return headers, bodies
+
+
+@pytest.fixture(autouse=True)
+def compression_settings(settings_env):
+    settings_env(API_COMPRESSION_ENABLED="true", API_COMPRESSION_MIN_SIZE="1024")
+
+
+def test_large_json_is_gzipped_with_length_and_vary():
+    headers, bodies = _call(_app([LARGE_JSON]), "gzip")
+
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert headers["content-length"] == str(len(bodies[0]["body"]))
+    assert gzip.decompress(bodies[0]["body"]) == LARGE_JSON
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred():
+    headers, bodies = _call(_app([LARGE_JSON]), "gzip, br")
+
+    assert headers["content-encoding"] == "br"
+    assert brotli.decompress(bodies[0]["body"]) == LARGE_JSON
+
+
+def test_small_response_is_not_compressed_but_varies():
+    headers, bodies = _call(_app([b'{"status": "ok"}']), "gzip")
+
+    assert "content-encoding" not in headers
+    assert headers["content-length"] == str(len(b'{"status": "ok"}'))
+    assert headers["vary"] == "Accept-Encoding"
+    assert bodies[0]["body"] == b'{"status": "ok"}'
+
+
+def test_identity_request_is_not_compressed_but_varies():
+    headers, bodies = _call(_app([LARGE_JSON]))
+
+    assert "content-encoding" not in headers
+    assert headers["vary"] == "Accept-Encoding"
+    assert bodies[0]["body"] == LARGE_JSON
+
+
+def test_streamed_response_passes_through():
+    chunks = [b"data: first\n\n", b"data: second\n\n", b""]
+
+    headers, bodies = _call(_app(chunks, content_type="text/event-stream"), "gzip")
+
+    assert "content-encoding" not in headers
+    assert "vary" not in headers
+    assert [body["body"] for body in bodies] == chunks
+    assert [body["more_body"] for body in bodies] == [True, True, False]
+
+
+def test_chunked_json_passes_through():
+    chunks = [LARGE_JSON, LARGE_JSON, b""]
+
+    headers, bodies = _call(_app(chunks), "gzip")
+
+    assert "content-encoding" not in headers
+    assert [body["body"] for body in bodies] == chunks
+
+
+def test_already_encoded_response_is_untouched():
+    encoded = gzip.compress(LARGE_JSON)
+
+    headers, bodies = _call(_app([encoded], extra_headers=[(b"content-encoding", b"gzip")]), "br, gzip")
+
+    assert headers["content-encoding"] == "gzip"
+    assert "vary" not in headers
+    assert bodies[0]["body"] == encoded
+
+
+def test_non_api_paths_are_skipped():
+    headers, bodies = _call(_app([LARGE_JSON]), "gzip", path="/health")
+
+    assert "content-encoding" not in headers
+    assert bodies[0]["body"] == LARGE_JSON
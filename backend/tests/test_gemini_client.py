@@ -0,0 +1,127 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from google import genai
+
+from app.schemas.enhancement import EnhanceRequest
+from app.services import gemini_client, resilience
+from app.services.metrics import REGISTRY
+from app.services.resilience import CircuitOpenError, Deadline
+
+from .test_single_flight import REQUEST
+
+
+class SlowClient:
+    """Имитирует долгое первое создание клиента (импорт google.genai и т.п.)."""
+
+    instances = 0
+
+    def __init__(self, **kwargs) -> None:
+        time.sleep(0.3)
+        SlowClient.instances += 1
+
+
+@pytest.fixture
+def slow_client(monkeypatch, settings_env):
+    settings_env(GEMINI_API_KEY="test-key")
+    SlowClient.instances = 0
+    monkeypatch.setattr(genai, "Client", SlowClient)
+    monkeypatch.setattr(gemini_client, "_client", None)
+
+
+def test_client_creation_does_not_block_event_loop(slow_client):
+    async def scenario():
+        longest_gap = 0.0
+        creating = asyncio.ensure_future(gemini_client._get_client_async())
+        last = time.perf_counter()
+        while not creating.done():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            longest_gap = max(longest_gap, now - last)
+            last = now
+        return await creating, longest_gap
+
+    client, longest_gap = asyncio.run(scenario())
+
+    assert isinstance(client, SlowClient)
+    assert longest_gap < 0.1
+
+
+def test_concurrent_prewarm_and_request_create_one_client(slow_client):
+    prewarm = threading.Thread(target=gemini_client.warm_up_gemini_client)
+
+    async def scenario():
+        prewarm.start()
+        return await asyncio.gather(*(gemini_client._get_client_async() for _ in range(3)))
+
+    clients = asyncio.run(scenario())
+    prewarm.join()
+
+    assert SlowClient.instances == 1
+    assert all(client is gemini_client._client for client in clients)
+
+
+def _upstream_errors(error_type: str, target_model: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "gemini_upstream_errors_total", {"error_type": error_type, "target_model": target_model}
+    )
+    return value or 0.0
+
+
+def test_queue_timeout_is_not_labelled_circuit_open(monkeypatch, settings_env):
+    settings_env(GEMINI_MAX_CONCURRENCY="1", GEMINI_QUEUE_TIMEOUT_SECONDS="0.01")
+    monkeypatch.setattr(gemini_client, "_semaphore", None)
+    before = {label: _upstream_errors(label, "queue-test") for label in ("queue_timeout", "circuit_open")}
+
+    async def scenario():
+        resilience._current_deadline.set(Deadline(5))
+        async with gemini_client._upstream_slot("queue-test"):
+            async with gemini_client._upstream_slot("queue-test"):
+                raise AssertionError("the second slot must not be acquired")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(scenario())
+
+    assert exc_info.value.status_code == 503
+    assert _upstream_errors("queue_timeout", "queue-test") == before["queue_timeout"] + 1
+    assert _upstream_errors("circuit_open", "queue-test") == before["circuit_open"]
+
+
+def test_upstream_error_type_labels_circuit_open_by_cause():
+    try:
+        try:
+            raise CircuitOpenError(30)
+        except CircuitOpenError as exc:
+            raise HTTPException(status_code=503) from exc
+    except HTTPException as exc:
+        breaker_error = exc
+
+    assert gemini_client._upstream_error_type(breaker_error) == "circuit_open"
+    assert gemini_client._upstream_error_type(HTTPException(status_code=503)) == "http_503"
+    assert gemini_client._upstream_error_type(resilience.deadline_exceeded()) == "deadline_exceeded"
+
+
+def test_ab_prompt_mode_is_deterministic_per_request(settings_env):
+    settings_env(GEMINI_PROMPT_MODE="ab", GEMINI_PROMPT_AB_COMPACT_SHARE="0.5")
+    requests = [EnhanceRequest(**{**REQUEST, "initialPrompt": f"prompt {index}"}) for index in range(200)]
+
+    modes = [gemini_client._prompt_mode(request) for request in requests]
+
+    assert modes == [gemini_client._prompt_mode(request.model_copy()) for request in requests]
+    assert 60 < modes.count("compact") < 140
+    # Ключ кэша учитывает режим, поэтому одинаковые запросы получают один ключ.
+    assert gemini_client.request_cache_key(requests[0]) == gemini_client.request_cache_key(requests[0].model_copy())
+
+
+def test_ab_prompt_mode_share_bounds(settings_env):
+    request = EnhanceRequest(**REQUEST)
+
+    settings_env(GEMINI_PROMPT_MODE="ab", GEMINI_PROMPT_AB_COMPACT_SHARE="0")
+    assert gemini_client._prompt_mode(request) == "verbose"
+    settings_env(GEMINI_PROMPT_MODE="ab", GEMINI_PROMPT_AB_COMPACT_SHARE="1")
+    assert gemini_client._prompt_mode(request) == "compact"
+    settings_env(GEMINI_PROMPT_MODE="compact")
+    assert gemini_client._prompt_mode(request) == "compact"
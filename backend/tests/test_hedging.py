@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from app.services.hedging import HedgePolicy, hedged_call
+
+
+def _policy(**overrides):
+    options = dict(percentile=0.5, initial_delay=0.01, max_rate=1.0, min_samples=1)
+    options.update(overrides)
+    return HedgePolicy(**options)
+
+
+def test_fast_primary_is_not_hedged():
+    policy = _policy(initial_delay=1.0)
+
+    async def primary():
+        return "primary"
+
+    async def hedge():
+        raise AssertionError("hedge must not start")
+
+    assert asyncio.run(hedged_call(primary, hedge, policy)) == "primary"
+    assert policy.stats["hedged"] == 0
+    assert len(policy.latency) == 1
+
+
+def test_hedge_win_records_lower_bound_for_primary_latency():
+    policy = _policy(initial_delay=0.02)
+    cancelled = []
+
+    async def slow_primary():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return "primary"
+
+    async def fast_hedge():
+        await asyncio.sleep(0.03)
+        return "hedge"
+
+    assert asyncio.run(hedged_call(slow_primary, fast_hedge, policy)) == "hedge"
+    assert cancelled == [True]
+    assert policy.stats["hedge_wins"] == 1
+    # Наблюдение не меньше задержки хеджа плюс время самого хеджа.
+    assert policy.latency.percentile(0.5) >= 0.05
+    assert policy.delay() >= 0.05
+
+
+def test_hedging_is_limited_by_budget():
+    policy = _policy(initial_delay=0.0, max_rate=0.0, burst=1.0, min_samples=100)
+
+    async def primary():
+        await asyncio.sleep(0.01)
+        return "primary"
+
+    async def hedge():
+        await asyncio.sleep(1)
+        return "hedge"
+
+    async def scenario():
+        return [await hedged_call(primary, hedge, policy) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == ["primary"] * 3
+    assert policy.stats["hedged"] == 1
+    assert policy.stats["budget_exhausted"] == 2
+
+
+def test_primary_error_is_raised_when_both_fail():
+    policy = _policy(initial_delay=0.0)
+
+    async def primary():
+        await asyncio.sleep(0.01)
+        raise ValueError("primary")
+
+    async def hedge():
+        raise RuntimeError("hedge")
+
+    with pytest.raises(ValueError, match="primary"):
+        asyncio.run(hedged_call(primary, hedge, policy))
@@ -0,0 +1,210 @@
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from app.api.routes import history
+from app.db.session import get_async_db
+from app.services.cursor import decode_cursor, encode_cursor
+
+ADMIN_KEY = "admin-key"
+USER_KEY = "user-key"
+USER_ID = uuid.UUID("00000000-0000-4000-8000-000000000001")
+OTHER_USER_ID = uuid.UUID("00000000-0000-4000-8000-000000000002")
+
+
+class FakeSession:
+    """Запоминает выполненные запросы и отдаёт заранее заданные строки."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: self.rows)
+
+    def compiled(self, index=0):
+        return self.statements[index].compile(dialect=postgresql.dialect())
+
+
+def _client(settings_env, session, api_keys=f"{ADMIN_KEY},{USER_KEY}={USER_ID}"):
+    settings_env(HISTORY_API_KEYS=api_keys)
+    app = FastAPI()
+    app.include_router(history.router)
+
+    async def override():
+        yield session
+
+    app.dependency_overrides[get_async_db] = override
+    return TestClient(app)
+
+
+def _row(index: int, created_at: datetime):
+    return SimpleNamespace(
+        id=uuid.UUID(int=index),
+        model_id="gemini-advanced",
+        provider="gemini",
+        input_prompt=f"prompt {index}",
+        enhanced_prompt=f"enhanced {index}",
+        created_at=created_at,
+    )
+
+
+def test_cursor_round_trip():
+    position = {"c": "2026-10-18T12:00:00+00:00", "i": str(uuid.uuid4())}
+    assert decode_cursor(encode_cursor(position)) == position
+
+
+@pytest.mark.parametrize("path", ["/api/v1/history", "/api/v1/history/search?q=cat"])
+def test_history_is_disabled_without_keys(settings_env, path):
+    session = FakeSession()
+    response = _client(settings_env, session, api_keys="").get(path)
+
+    assert response.status_code == 404
+    assert session.statements == []
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-API-Key": "guess"}])
+@pytest.mark.parametrize("path", ["/api/v1/history", "/api/v1/history/search?q=cat"])
+def test_history_requires_known_api_key(settings_env, path, headers):
+    session = FakeSession()
+    response = _client(settings_env, session).get(path, headers=headers)
+
+    assert response.status_code == 401
+    assert session.statements == []
+
+
+@pytest.mark.parametrize("path", ["/api/v1/history", "/api/v1/history/search?q=cat"])
+def test_user_key_is_scoped_to_its_user(settings_env, path):
+    session = FakeSession()
+    client = _client(settings_env, session)
+
+    assert client.get(path, headers={"X-API-Key": USER_KEY}).status_code == 200
+    assert session.compiled().params["user_id_1"] == USER_ID
+
+    forbidden = client.get(path, params={"user_id": str(OTHER_USER_ID)}, headers={"X-API-Key": USER_KEY})
+    assert forbidden.status_code == 403
+    assert len(session.statements) == 1
+
+
+def test_admin_key_may_filter_by_any_user(settings_env):
+    session = FakeSession()
+    client = _client(settings_env, session)
+
+    client.get("/api/v1/history", headers={"X-API-Key": ADMIN_KEY})
+    client.get("/api/v1/history", params={"user_id": str(OTHER_USER_ID)}, headers={"X-API-Key": ADMIN_KEY})
+
+    assert "user_id_1" not in session.compiled(0).params
+    assert session.compiled(1).params["user_id_1"] == OTHER_USER_ID
+
+
+def test_next_cursor_points_at_last_row_of_page(settings_env):
+    now = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+    rows = [_row(index, now - timedelta(minutes=index)) for index in range(3)]
+    session = FakeSession(rows)
+    client = _client(settings_env, session)
+
+    page = client.get("/api/v1/history", params={"limit": 2}, headers={"X-API-Key": ADMIN_KEY}).json()
+
+    assert [item["inputPrompt"] for item in page["items"]] == ["prompt 0", "prompt 1"]
+    assert decode_cursor(page["nextCursor"]) == {"c": rows[1].created_at.isoformat(), "i": str(rows[1].id)}
+    # Следующая страница начинается строго после последней строки текущей.
+    client.get("/api/v1/history", params={"cursor": page["nextCursor"]}, headers={"X-API-Key": ADMIN_KEY})
+    compiled = session.compiled(1)
+    assert "(prompt_history.created_at, prompt_history.id) < (" in str(compiled)
+    assert compiled.params["param_1"] == rows[1].created_at
+    assert compiled.params["param_2"] == rows[1].id
+
+
+def test_last_page_has_no_cursor(settings_env):
+    session = FakeSession([_row(0, datetime(2026, 10, 18, tzinfo=timezone.utc))])
+    page = _client(settings_env, session).get("/api/v1/history", headers={"X-API-Key": ADMIN_KEY}).json()
+
+    assert len(page["items"]) == 1
+    assert "nextCursor" not in page
+
+
+def test_invalid_cursor_is_rejected(settings_env):
+    session = FakeSession()
+    response = _client(settings_env, session).get(
+        "/api/v1/history", params={"cursor": "not-a-cursor"}, headers={"X-API-Key": ADMIN_KEY}
+    )
+
+    assert response.status_code == 400
+    assert session.statements == []
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_keyset_paging_against_postgres(settings_env):
+    """Все строки проходят ровно по одному разу, в том числе при одинаковом created_at."""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    url = os.environ["TEST_DATABASE_URL"]
+    user_id = uuid.uuid4()
+    created_at = datetime.now(timezone.utc).replace(microsecond=0)
+    # Четыре группы по три строки с одинаковым created_at.
+    expected = [(created_at - timedelta(seconds=index // 3), uuid.uuid4()) for index in range(12)]
+
+    sync_engine = create_engine(url, poolclass=NullPool)
+    with sync_engine.begin() as connection:
+        connection.execute(
+            text("INSERT INTO users (id, email, password_hash) VALUES (:id, :email, 'x')"),
+            {"id": user_id, "email": f"{user_id}@example.test"},
+        )
+        params_id = connection.execute(
+            text(
+                "INSERT INTO prompt_params (params_hash, params_json) VALUES (:hash, '{}') "
+                "ON CONFLICT (params_hash) DO UPDATE SET params_hash = EXCLUDED.params_hash RETURNING id"
+            ),
+            {"hash": "0" * 64},
+        ).scalar_one()
+        connection.execute(
+            text(
+                "INSERT INTO prompt_history (id, user_id, model_id, provider, input_prompt, enhanced_prompt, "
+                "params_id, created_at) VALUES (:id, :user_id, 'gemini-advanced', 'gemini', 'p', 'e', "
+                ":params_id, :created_at)"
+            ),
+            [
+                {"id": row_id, "user_id": user_id, "params_id": params_id, "created_at": row_created_at}
+                for row_created_at, row_id in expected
+            ],
+        )
+
+    async_engine = create_async_engine(url, poolclass=NullPool)
+    settings_env(HISTORY_API_KEYS=f"{USER_KEY}={user_id}")
+    app = FastAPI()
+    app.include_router(history.router)
+
+    async def override():
+        async with AsyncSession(async_engine) as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override
+
+    try:
+        seen = []
+        cursor = None
+        with TestClient(app) as client:
+            while True:
+                params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+                page = client.get("/api/v1/history", params=params, headers={"X-API-Key": USER_KEY}).json()
+                seen.extend(uuid.UUID(item["id"]) for item in page["items"])
+                cursor = page.get("nextCursor")
+                if cursor is None:
+                    break
+
+        ordered = sorted(expected, key=lambda row: (row[0], row[1]), reverse=True)
+        assert seen == [row_id for _, row_id in ordered]
+    finally:
+        with sync_engine.begin() as connection:
+            connection.execute(text("DELETE FROM prompt_history WHERE user_id = :id"), {"id": user_id})
+            connection.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        sync_engine.dispose()
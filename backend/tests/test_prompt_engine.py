@@ -0,0 +1,91 @@
+from app.models_meta import get_model_meta
+from app.schemas.enhancement import EnhanceRequest
+from app.services.prompt_engine import _MIN_PROMPT_TOKENS, build_compact_prompt
+from app.services.token_budget import TRUNCATION_MARKER, estimate_tokens
+
+from .test_single_flight import REQUEST
+
+
+def _compact(token_budget=0, use_system_instruction=True, model_id="gemini-advanced", **overrides):
+    request = EnhanceRequest(**{**REQUEST, "targetAiModel": model_id, **overrides})
+    return build_compact_prompt(
+        request,
+        get_model_meta(model_id),
+        use_system_instruction=use_system_instruction,
+        token_budget=token_budget,
+    )
+
+
+def _tokens(prompt):
+    return sum(estimate_tokens(part or "") for part in prompt)
+
+
+def test_default_and_empty_parameters_are_dropped():
+    _, contents = _compact()
+
+    assert contents == 'Original prompt:\n"a cat"\n'
+
+
+def test_set_parameters_are_listed_and_deduplicated():
+    _, contents = _compact(
+        styleOrTone="Cinematic",
+        keywordsToAdd="neon, Neon; rain",
+        specificInstructions="Keep it short. keep it  short.\nUse present tense.",
+    )
+
+    assert "- Style/Tone: Cinematic\n" in contents
+    assert "- Add/emphasize: neon, rain\n" in contents
+    assert "Detail level" not in contents
+    assert contents.endswith("Instructions: Keep it short. Use present tense.\n")
+
+
+def test_image_parameters_only_for_image_models():
+    image_options = dict(lighting="Golden hour", cameraAngle="Close-up")
+
+    _, text_contents = _compact(**image_options)
+    _, image_contents = _compact(model_id="midjourney", **image_options)
+
+    assert "Lighting" not in text_contents
+    assert "- Lighting: Golden hour\n" in image_contents
+    assert "- Camera angle/shot: Close-up\n" in image_contents
+
+
+def test_single_message_mode_has_no_system_instruction():
+    system_instruction, contents = _compact(use_system_instruction=False)
+
+    assert system_instruction is None
+    assert contents.startswith("You are a world-class prompt engineer.")
+    assert contents.endswith('Original prompt:\n"a cat"\n')
+
+
+def test_long_prompt_and_instructions_fit_the_budget():
+    long_prompt = " ".join(f"Scene detail {index}: a neon street in the rain." for index in range(300))
+    long_instructions = " ".join(f"Rule {index}: mention the weather." for index in range(200))
+
+    for use_system_instruction in (True, False):
+        for budget in (300, 500, 1000):
+            prompt = _compact(
+                budget,
+                use_system_instruction=use_system_instruction,
+                initialPrompt=long_prompt,
+                specificInstructions=long_instructions,
+            )
+            assert _tokens(prompt) <= budget
+            assert TRUNCATION_MARKER in prompt[1]
+            assert "Scene detail 0:" in prompt[1] and "Scene detail 299:" in prompt[1]
+
+
+def test_prompt_within_budget_is_not_truncated():
+    prompt = _compact(4000, initialPrompt="a cat " * 50)
+
+    assert TRUNCATION_MARKER not in prompt[1]
+
+
+def test_budget_below_skeleton_keeps_minimal_prompt():
+    skeleton = _compact(initialPrompt="", specificInstructions="")
+
+    prompt = _compact(50, initialPrompt="a neon street in the rain. " * 100, specificInstructions="Be brief. " * 50)
+
+    # Нижняя граница: скелет, _MIN_PROMPT_TOKENS на промпт и инструкции, подпись инструкций.
+    assert _tokens(prompt) <= _tokens(skeleton) + _MIN_PROMPT_TOKENS + estimate_tokens("\nInstructions: \n")
+    assert TRUNCATION_MARKER in prompt[1]
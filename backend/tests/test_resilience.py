@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.services import resilience
+from app.services.resilience import CircuitBreaker, CircuitOpenError, Deadline, call_with_resilience
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(resilience.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def breaker(monkeypatch, settings_env):
+    settings_env(UPSTREAM_RETRY_MAX_ATTEMPTS="1")
+    instance = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+    monkeypatch.setattr(resilience, "_circuit_breaker", instance)
+    return instance
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.before_call()
+    assert exc_info.value.retry_after == pytest.approx(30.0)
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30.0)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 31
+
+    assert breaker.before_call() is True
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    breaker.release_probe()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 31
+
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.release_probe()
+
+    assert breaker.state == "open"
+    assert breaker.snapshot()["opened"] == 2
+
+
+def test_late_result_of_regular_call_does_not_release_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 31
+    breaker.before_call()
+
+    # Обычный вызов, начатый ещё до размыкания, завершился во время пробного.
+    breaker.record_neutral()
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_cancelled_probe_releases_half_open_breaker(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+    clock.now += 31
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hanging_call():
+            started.set()
+            await asyncio.sleep(3600)
+
+        probe = asyncio.create_task(call_with_resilience(hanging_call, Deadline(60)))
+        await started.wait()
+        assert breaker.state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok_call():
+            return "ok"
+
+        return await call_with_resilience(ok_call, Deadline(60))
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_rejects_with_503(breaker, clock):
+    breaker.record_failure()
+    breaker.record_failure()
+
+    async def never_called():
+        raise AssertionError("upstream must not be called")
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(call_with_resilience(never_called, Deadline(60)))
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers["Retry-After"] == "30"
+
+
+def test_client_deadline_timeouts_do_not_open_breaker(breaker):
+    async def slow_call():
+        await asyncio.sleep(0.5)
+        return "ok"
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(HTTPException) as exc_info:
+                await call_with_resilience(slow_call, Deadline(0.02))
+            assert exc_info.value.status_code == 504
+        return await call_with_resilience(slow_call, Deadline(30))
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.snapshot()["opened"] == 0
+
+
+def test_upstream_timeouts_within_deadline_open_breaker(breaker):
+    async def timing_out_call():
+        raise asyncio.TimeoutError
+
+    for _ in range(2):
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(call_with_resilience(timing_out_call, Deadline(30)))
+
+    assert breaker.state == "open"
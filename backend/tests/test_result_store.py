@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.services import result_cache, result_store
+from app.services.params_store import hash_params, split_params
+from app.services.result_store import ResultStore
+
+from .test_single_flight import REQUEST
+
+
+def _store(**overrides):
+    options = dict(
+        ttl_seconds=60,
+        lookup_timeout=0.05,
+        max_buffer=3,
+        batch_size=2,
+        flush_interval=0.01,
+        sweep_interval=3600,
+    )
+    options.update(overrides)
+    return ResultStore(**options)
+
+
+def test_put_drops_new_keys_when_buffer_is_full():
+    store = _store()
+
+    assert all(store.put(f"fp{index}", "gemini-test", "text") for index in range(3))
+    assert store.put("fp3", "gemini-test", "text") is False
+    # Повторная запись уже ожидающего ключа не занимает новое место.
+    assert store.put("fp0", "gemini-test", "newer") is True
+
+    assert store.snapshot()["dropped"] == 1
+    assert store.snapshot()["pending"] == 3
+
+
+def test_writer_flushes_in_batches_and_on_stop(monkeypatch):
+    batches = []
+
+    async def fake_upsert(rows, *, overwrite=True):
+        batches.append([(row["fingerprint"], row["model_name"], row["enhanced_prompt"]) for row in rows])
+
+    monkeypatch.setattr(result_store, "upsert_results", fake_upsert)
+    store = _store(max_buffer=10)
+
+    async def scenario():
+        store.start()
+        for index in range(5):
+            store.put(f"fp{index}", "gemini-test", f"text {index}")
+        await store.stop()
+
+    asyncio.run(scenario())
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert batches[0][0] == ("fp0", "gemini-test", "text 0")
+    assert store.snapshot()["written"] == 5
+    assert store.snapshot()["pending"] == 0
+
+
+def test_failed_flush_is_counted_not_raised(monkeypatch):
+    async def failing_upsert(rows, *, overwrite=True):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(result_store, "upsert_results", failing_upsert)
+    store = _store()
+
+    async def scenario():
+        store.start()
+        store.put("fp0", "gemini-test", "text")
+        await store.stop()
+
+    asyncio.run(scenario())
+
+    assert store.snapshot()["failed"] == 1
+    assert store.snapshot()["written"] == 0
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_prewarm_uses_only_answers_of_current_model(monkeypatch, settings_env):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.db import session as db_session
+
+    url = os.environ["TEST_DATABASE_URL"]
+    current_model = f"gemini-test-{uuid.uuid4().hex[:8]}"
+    settings_env(RESULT_STORE_ENABLED="true", GEMINI_MODEL_NAME=current_model, RESULT_CACHE_MAX_ENTRIES="100")
+    monkeypatch.setattr(result_store, "_result_store", None)
+    monkeypatch.setattr(result_cache, "_result_cache", None)
+    async_engine = create_async_engine(url, poolclass=NullPool)
+    monkeypatch.setattr(db_session, "get_async_session_factory", lambda: async_sessionmaker(async_engine))
+
+    written = []
+
+    async def capture_upsert(rows, *, overwrite=True):
+        assert overwrite is False
+        written.extend(rows)
+
+    monkeypatch.setattr(result_store, "upsert_results", capture_upsert)
+
+    stored = split_params(REQUEST)
+    now = datetime.now(timezone.utc)
+    rows = [
+        ("current model", current_model),
+        ("fallback model", f"{current_model}-fallback"),
+        ("served from cache", None),
+    ]
+    ids = [uuid.uuid4() for _ in rows]
+    sync_engine = create_engine(url, poolclass=NullPool)
+    with sync_engine.begin() as connection:
+        params_id = connection.execute(
+            text(
+                "INSERT INTO prompt_params (params_hash, params_json) VALUES (:hash, CAST(:json AS json)) "
+                "ON CONFLICT (params_hash) DO UPDATE SET params_hash = EXCLUDED.params_hash RETURNING id"
+            ),
+            {"hash": hash_params(stored), "json": json.dumps(stored)},
+        ).scalar_one()
+        connection.execute(
+            text(
+                "INSERT INTO prompt_history (id, model_id, provider, input_prompt, enhanced_prompt, "
+                "gemini_model, params_id, created_at) VALUES (:id, 'gemini-advanced', 'gemini', :prompt, "
+                ":enhanced, :gemini_model, :params_id, :created_at)"
+            ),
+            [
+                {
+                    "id": row_id,
+                    "prompt": f"prewarm {label} {row_id}",
+                    "enhanced": label,
+                    "gemini_model": gemini_model,
+                    "params_id": params_id,
+                    "created_at": now - timedelta(minutes=1),
+                }
+                for row_id, (label, gemini_model) in zip(ids, rows)
+            ],
+        )
+
+    try:
+        assert asyncio.run(result_store.prewarm_result_store_from_history()) == 1
+        assert [(row["enhanced_prompt"], row["model_name"]) for row in written] == [("current model", current_model)]
+    finally:
+        with sync_engine.begin() as connection:
+            connection.execute(text("DELETE FROM prompt_history WHERE id = ANY(:ids)"), {"ids": ids})
+        sync_engine.dispose()
+
+
+def test_lookup_timeout_is_a_quiet_miss(monkeypatch, caplog):
+    async def slow_select(fingerprint):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(result_store, "_select_result", slow_select)
+    store = _store(lookup_timeout=0.01)
+
+    with caplog.at_level("DEBUG", logger=result_store.logger.name):
+        assert asyncio.run(store.get("fp")) is None
+
+    assert store.snapshot()["lookup_timeouts"] == 1
+    assert store.snapshot()["lookup_errors"] == 0
+    assert [(record.levelname, record.exc_info) for record in caplog.records] == [("DEBUG", None)]
+
+
+def test_lookup_errors_are_logged_at_most_once_per_interval(monkeypatch, caplog):
+    async def broken_select(fingerprint):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(result_store, "_select_result", broken_select)
+    store = _store()
+
+    async def scenario():
+        for _ in range(5):
+            assert await store.get("fp") is None
+
+    with caplog.at_level("WARNING", logger=result_store.logger.name):
+        asyncio.run(scenario())
+
+    assert store.snapshot()["lookup_errors"] == 5
+    assert len(caplog.records) == 1
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set")
+def test_lookup_ignores_answers_of_other_models(monkeypatch, settings_env):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.db import session as db_session
+
+    url = os.environ["TEST_DATABASE_URL"]
+    current_model = f"gemini-test-{uuid.uuid4().hex[:8]}"
+    settings_env(GEMINI_MODEL_NAME=current_model)
+    async_engine = create_async_engine(url, poolclass=NullPool)
+    monkeypatch.setattr(db_session, "get_async_session_factory", lambda: async_sessionmaker(async_engine))
+
+    fingerprints = {"current": uuid.uuid4().hex, "fallback": uuid.uuid4().hex}
+    sync_engine = create_engine(url, poolclass=NullPool)
+    with sync_engine.begin() as connection:
+        connection.execute(
+            text(
+                "INSERT INTO enhancement_results (fingerprint, model_name, enhanced_prompt, expires_at) "
+                "VALUES (:fingerprint, :model_name, :label, now() + interval '1 hour')"
+            ),
+            [
+                {"fingerprint": fingerprints["current"], "model_name": current_model, "label": "current"},
+                {"fingerprint": fingerprints["fallback"], "model_name": f"{current_model}-lite", "label": "fallback"},
+            ],
+        )
+
+    async def lookup():
+        try:
+            return [await result_store._select_result(fingerprint) for fingerprint in fingerprints.values()]
+        finally:
+            await async_engine.dispose()
+
+    try:
+        assert asyncio.run(lookup()) == ["current", None]
+    finally:
+        with sync_engine.begin() as connection:
+            connection.execute(
+                text("DELETE FROM enhancement_results WHERE fingerprint = ANY(:fingerprints)"),
+                {"fingerprints": list(fingerprints.values())},
+            )
+        sync_engine.dispose()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from app.middleware import server_timing
+from app.middleware.server_timing import ServerTimingMiddleware
+
+
+async def _ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def _run(middleware, headers):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "path": "/api/v1/enhance", "headers": headers}
+
+    async def scenario():
+        await middleware(scope, receive, send)
+        return threading.get_ident()
+
+    return asyncio.run(scenario()), messages
+
+
+def test_server_timing_header_is_added(settings_env):
+    settings_env(SERVER_TIMING_ENABLED="true", PROFILING_ENABLED="false")
+
+    _, messages = _run(ServerTimingMiddleware(_ok_app), [])
+
+    header_names = [name for name, _ in messages[0]["headers"]]
+    assert b"server-timing" in header_names
+
+
+def test_profile_is_saved_outside_event_loop(settings_env, tmp_path, monkeypatch):
+    settings_env(
+        PROFILING_ENABLED="true",
+        PROFILING_API_KEYS="profiler",
+        PROFILING_OUTPUT_DIR=str(tmp_path),
+    )
+    finished_in = []
+    original_finish = server_timing.finish_profile
+
+    def recording_finish(profiler, output_dir):
+        finished_in.append(threading.get_ident())
+        return original_finish(profiler, output_dir)
+
+    monkeypatch.setattr(server_timing, "finish_profile", recording_finish)
+
+    loop_thread, messages = _run(
+        ServerTimingMiddleware(_ok_app),
+        [(b"x-profile", b"1"), (b"x-api-key", b"profiler")],
+    )
+
+    profile_id = dict(messages[0]["headers"])[b"x-profile-id"].decode()
+    assert (tmp_path / f"{profile_id}.folded").is_file()
+    assert finished_in and finished_in[0] != loop_thread
@@ -0,0 +1,138 @@
+import asyncio
+import types
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas.enhancement import EnhanceRequest
+from app.services import gemini_client, resilience, result_cache
+from app.services.resilience import Deadline
+
+REQUEST = dict(
+    initialPrompt="a cat",
+    targetAiModel="gemini-advanced",
+    styleOrTone="Default",
+    detailLevel="Default",
+    keywordsToAdd="",
+    negativePrompts="",
+    artisticMedium="Default",
+    cameraAngle="Default",
+    lighting="Default",
+    colorPalette="Default",
+    specificInstructions="",
+    promptLanguage="en",
+)
+
+
+class FakeModels:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return types.SimpleNamespace(text="A cat in space")
+
+
+@pytest.fixture
+def fake_gemini(monkeypatch, settings_env):
+    settings_env(RESULT_CACHE_MAX_ENTRIES="0", UPSTREAM_DEADLINE_SECONDS="5")
+    models = FakeModels(delay=0.2)
+    monkeypatch.setattr(gemini_client, "_client", types.SimpleNamespace(aio=types.SimpleNamespace(models=models)))
+    monkeypatch.setattr(gemini_client, "_inflight", {})
+    monkeypatch.setattr(gemini_client, "_semaphore", None, raising=False)
+    monkeypatch.setattr(resilience, "_circuit_breaker", None)
+    monkeypatch.setattr(gemini_client, "_single_flight_stats", {"leaders": 0, "coalesced": 0})
+    return models
+
+
+async def _enhance(deadline_seconds: float) -> str:
+    resilience._current_deadline.set(Deadline(deadline_seconds))
+    return await gemini_client.enhance_prompt_with_gemini_async(EnhanceRequest(**REQUEST), use_cache=False)
+
+
+def test_identical_requests_share_one_call(fake_gemini):
+    async def scenario():
+        return await asyncio.gather(*(_enhance(5) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["A cat in space"] * 5
+    assert fake_gemini.calls == 1
+    assert gemini_client.get_single_flight_stats() == {"leaders": 1, "coalesced": 4, "inflight": 0}
+
+
+def test_short_leader_deadline_does_not_fail_waiters(fake_gemini):
+    async def scenario():
+        leader = asyncio.ensure_future(_enhance(0.05))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(_enhance(5))
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader_result, waiter_result = asyncio.run(scenario())
+
+    assert isinstance(leader_result, HTTPException) and leader_result.status_code == 504
+    assert waiter_result == "A cat in space"
+    assert fake_gemini.calls == 1
+
+
+def test_waiter_enforces_its_own_deadline(fake_gemini):
+    async def scenario():
+        leader = asyncio.ensure_future(_enhance(5))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(_enhance(0.05))
+        return await asyncio.gather(leader, waiter, return_exceptions=True)
+
+    leader_result, waiter_result = asyncio.run(scenario())
+
+    assert leader_result == "A cat in space"
+    assert isinstance(waiter_result, HTTPException) and waiter_result.status_code == 504
+
+
+def test_generated_by_reports_model_for_fresh_answers_only(fake_gemini, settings_env, monkeypatch):
+    settings_env(RESULT_CACHE_MAX_ENTRIES="10", UPSTREAM_DEADLINE_SECONDS="5", GEMINI_MODEL_NAME="gemini-test")
+    monkeypatch.setattr(result_cache, "_result_cache", None)
+
+    async def scenario():
+        resilience._current_deadline.set(Deadline(5))
+        request = EnhanceRequest(**REQUEST)
+        await gemini_client.enhance_prompt_with_gemini_async(request)
+        fresh = gemini_client.generated_by()
+        await gemini_client.enhance_prompt_with_gemini_async(request)
+        return fresh, gemini_client.generated_by()
+
+    assert asyncio.run(scenario()) == ("gemini-test", None)
+    assert fake_gemini.calls == 1
+
+
+def test_fallback_model_answers_are_not_cached(fake_gemini, settings_env, monkeypatch):
+    settings_env(
+        RESULT_CACHE_MAX_ENTRIES="10",
+        UPSTREAM_DEADLINE_SECONDS="5",
+        GEMINI_MODEL_NAME="gemini-test",
+        GEMINI_FALLBACK_MODEL_NAME="gemini-test-lite",
+        GEMINI_HEDGE_ENABLED="true",
+        GEMINI_HEDGE_INITIAL_DELAY_SECONDS="0.01",
+    )
+    monkeypatch.setattr(result_cache, "_result_cache", None)
+    monkeypatch.setattr(gemini_client, "_hedge_policy", None)
+    called_models = []
+
+    async def generate_content(model, contents, config=None):
+        called_models.append(model)
+        # Основная модель медленная, поэтому хедж в запасную выигрывает.
+        await asyncio.sleep(1 if model == "gemini-test" else 0.01)
+        return types.SimpleNamespace(text=f"answer of {model}")
+
+    monkeypatch.setattr(fake_gemini, "generate_content", generate_content)
+
+    async def scenario():
+        resilience._current_deadline.set(Deadline(5))
+        request = EnhanceRequest(**REQUEST)
+        first = await gemini_client.enhance_prompt_with_gemini_async(request)
+        first_model = gemini_client.generated_by()
+        await gemini_client.enhance_prompt_with_gemini_async(request)
+        return first, first_model
+
+    assert asyncio.run(scenario()) == ("answer of gemini-test-lite", "gemini-test-lite")
+    # Ответ запасной модели не попал в кэш: повторный запрос снова идёт в Gemini.
+    assert called_models.count("gemini-test") == 2
@@ -0,0 +1,118 @@
+import gzip
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.services.content_encoding import brotli
+from app.services.static_assets import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, FrontendStaticFiles
+
+INDEX_HTML = b"<!doctype html><html><body>" + b"<div>Prompt Enhancer Pro</div>" * 50 + b"</body></html>"
+APP_JS = b"console.log('prompt enhancer');\n" * 100
+
+
+@pytest.fixture
+def client(tmp_path):
+    (tmp_path / "index.html").write_bytes(INDEX_HTML)
+    (tmp_path / "favicon.svg").write_bytes(b"<svg></svg>")
+    assets = tmp_path / "assets"
+    assets.mkdir()
+    script = assets / "index-BkD3x9aZ.js"
+    script.write_bytes(APP_JS)
+    (assets / "index-BkD3x9aZ.js.gz").write_bytes(gzip.compress(APP_JS))
+    if brotli is not None:
+        (assets / "index-BkD3x9aZ.js.br").write_bytes(brotli.compress(APP_JS))
+    # Предсжатые копии не старше исходника.
+    stat = script.stat()
+    for copy in assets.glob("*.js.*"):
+        os.utime(copy, (stat.st_atime, stat.st_mtime + 1))
+    return TestClient(FrontendStaticFiles(tmp_path))
+
+
+def _get(client, path, **headers):
+    headers.setdefault("Accept-Encoding", "identity")
+    return client.get(path, headers=headers)
+
+
+def test_strong_etag_and_if_none_match(client):
+    first = _get(client, "/assets/index-BkD3x9aZ.js")
+    etag = first.headers["etag"]
+
+    assert first.status_code == 200
+    assert etag.startswith('"') and not etag.startswith("W/")
+
+    cached = _get(client, "/assets/index-BkD3x9aZ.js", **{"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    weak = _get(client, "/assets/index-BkD3x9aZ.js", **{"If-None-Match": f"W/{etag}"})
+    assert weak.status_code == 304
+
+    stale = _get(client, "/assets/index-BkD3x9aZ.js", **{"If-None-Match": '"other"'})
+    assert stale.status_code == 200
+
+
+@pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+def test_encoding_negotiation(client):
+    path = "/assets/index-BkD3x9aZ.js"
+
+    brotli_response = _get(client, path, **{"Accept-Encoding": "gzip, br"})
+    assert brotli_response.headers["content-encoding"] == "br"
+    assert brotli_response.headers["vary"] == "Accept-Encoding"
+    assert brotli_response.content == APP_JS
+
+    gzip_response = _get(client, path, **{"Accept-Encoding": "gzip, br;q=0"})
+    assert gzip_response.headers["content-encoding"] == "gzip"
+    assert gzip_response.content == APP_JS
+
+    identity_response = _get(client, path, **{"Accept-Encoding": "br;q=0, gzip;q=0"})
+    assert "content-encoding" not in identity_response.headers
+    assert identity_response.content == APP_JS
+
+    # ETag у каждого варианта свой: иначе кэш отдал бы сжатое тело клиенту без поддержки сжатия.
+    etags = {response.headers["etag"] for response in (brotli_response, gzip_response, identity_response)}
+    assert len(etags) == 3
+
+
+def test_immutable_only_for_hashed_assets(client):
+    assert _get(client, "/assets/index-BkD3x9aZ.js").headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert _get(client, "/favicon.svg").headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert _get(client, "/").headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+
+def test_deep_link_falls_back_to_index(client):
+    index = _get(client, "/")
+    deep_link = _get(client, "/history/some-entry")
+
+    assert deep_link.status_code == 200
+    assert deep_link.headers["content-type"] == "text/html; charset=utf-8"
+    assert deep_link.content == INDEX_HTML
+    assert deep_link.headers["etag"] == index.headers["etag"]
+
+    compressed = _get(client, "/history/some-entry", **{"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == INDEX_HTML
+
+
+def test_missing_files_are_not_served_as_index(client):
+    assert _get(client, "/assets/index-Missing1.js").status_code == 404
+    api_response = _get(client, "/api/v1/unknown")
+    assert api_response.status_code == 404
+    assert api_response.json() == {"detail": "Not Found"}
+
+
+def test_head_has_headers_without_body(client):
+    response = client.head("/", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(INDEX_HTML))
+
+
+def test_head_of_file_asset_has_no_body(client):
+    response = client.head("/assets/index-BkD3x9aZ.js", headers={"Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["content-length"] == str(len(APP_JS))
@@ -0,0 +1,39 @@
+from app.services.token_budget import TRUNCATION_MARKER, estimate_tokens, truncate_to_tokens
+
+
+def test_estimate_counts_non_latin_text_as_more_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("кошка") > estimate_tokens("koshka")
+
+
+def test_text_within_budget_is_unchanged():
+    assert truncate_to_tokens("A short prompt.", 100) == "A short prompt."
+
+
+def test_truncation_keeps_head_and_tail_around_marker():
+    sentences = [f"Sentence number {index} about a cat in space." for index in range(60)]
+    text = " ".join(sentences)
+
+    truncated = truncate_to_tokens(text, 60)
+
+    head, tail = truncated.split(TRUNCATION_MARKER)
+    assert text.startswith(head)
+    assert text.endswith(tail)
+    assert head.startswith("Sentence number 0 ")
+    assert tail.endswith("Sentence number 59 about a cat in space.")
+    # Края режутся по границам предложений, а голова длиннее хвоста.
+    assert head.endswith(".") and tail.startswith("Sentence number ")
+    assert len(head) > len(tail)
+    assert estimate_tokens(truncated) <= 60
+
+
+def test_truncation_respects_budget_for_mixed_scripts():
+    text = "latin words first. " * 40 + "а потом кириллица, которая дороже. " * 40
+
+    for max_tokens in (10, 25, 50, 100, 200):
+        assert estimate_tokens(truncate_to_tokens(text, max_tokens)) <= max_tokens
+
+
+def test_budget_smaller_than_marker_gives_empty_text():
+    assert truncate_to_tokens("word " * 100, 1) == ""